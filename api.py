@@ -1,17 +1,40 @@
 # ---------------------------
 # api.py
 # ---------------------------
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Request, Depends, Query
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 from fastapi import Response
-from pydantic import BaseModel, Field
-from typing import Dict, List, Any, Optional
+from pydantic import BaseModel, Field, ValidationError
+from datetime import date, datetime, timezone
+from typing import Dict, List, Any, Optional, Tuple
+from collections import OrderedDict
+from urllib.parse import urlsplit
+import asyncio
+import bisect
+import cProfile
+import functools
+import hashlib
+import hmac
+import io
+import json
+import marshal
+import math
 import os
+import pstats
+import re
 import shutil
+import sys
+import threading
+import time
 
 import fleet_db
+from scheduler import Scheduler, format_ts
+from webhooks import WebhookDeliverer
 from fleet_db import (
     init_db,
     list_assets,
@@ -20,6 +43,7 @@ from fleet_db import (
     archive_asset,
     restore_asset,
     list_maintenance_tasks,
+    list_due_by_date,
     upsert_task,
     log_service,
     log_trip,
@@ -30,14 +54,15 @@ from fleet_db import (
     list_documents,
     get_document,
     generate_maintenance_alerts,
+    generate_due_date_alerts,
     list_alerts,
     resolve_alert,
     calculate_asset_health,
     fleet_health_summary,
     explain_asset_health,
+    explain_fleet_health,
     predict_maintenance_window,
     fleet_maintenance_forecast,
-    fleet_ai_brief,
     fleet_dashboard,
     ensure_default_api_key,
     get_api_key_record,
@@ -47,6 +72,8 @@ from fleet_db import (
     revoke_api_key,
     set_api_key_scope,
     set_api_key_admin,
+    list_feature_scopes,
+    update_feature_scopes,
     list_audit_logs,
 )
 
@@ -55,6 +82,11 @@ try:
 except Exception:
     Fernet = None
 
+try:
+    import orjson
+except Exception:
+    orjson = None
+
 DOCS_DIR = "docs_store"
 DOC_ENCRYPTION_ENV = "DOC_ENCRYPTION_ENABLED"
 DOC_ENCRYPTION_KEY_ENV = "DOC_ENCRYPTION_KEY"
@@ -63,10 +95,520 @@ DEFAULT_CONTENT_TYPE = "application/octet-stream"
 DEFAULT_ASSET_TYPE = "unknown"
 DEFAULT_CATEGORY = "General"
 VALID_SCOPES = {"read", "write", "admin"}
+ADMIN_SCOPE = "admin"
 OPEN_PATHS = {"/v1/health"}
-WRITE_METHODS = {"POST", "PUT", "PATCH", "DELETE"}
 
-app = FastAPI(title="Fleet Ops API", version="0.1")
+
+# ---------------------------
+# Route permission policy table
+# (method, route path) -> (base scope, feature scope), None = open route.
+# Resolved against the router once at startup; see compile_route_policies.
+# ---------------------------
+ROUTE_POLICIES: Dict[Tuple[str, str], Optional[Tuple[str, Optional[str]]]] = {
+    ("GET", "/v1/health"): None,
+    ("GET", "/v1/whoami"): ("read", None),
+    # Fleet
+    ("GET", "/v1/fleet/health"): ("read", "fleet:read"),
+    ("GET", "/v1/fleet/health/explain"): ("read", "fleet:read"),
+    ("GET", "/v1/fleet/ai_brief"): ("read", "fleet:read"),
+    ("GET", "/v1/fleet/maintenance/forecast"): ("read", "fleet:read"),
+    ("GET", "/v1/fleet/dashboard"): ("read", "fleet:read"),
+    ("GET", "/v1/fleet/maintenance/due"): ("read", "fleet:read"),
+    ("GET", "/v1/fleet/maintenance/upcoming"): ("read", "fleet:read"),
+    # Assets
+    ("GET", "/v1/assets"): ("read", "assets:read"),
+    ("POST", "/v1/assets"): ("write", "assets:write"),
+    ("GET", "/v1/assets/{asset_id}"): ("read", "assets:read"),
+    ("POST", "/v1/assets/{asset_id}/archive"): ("write", "assets:write"),
+    ("POST", "/v1/assets/{asset_id}/restore"): ("write", "assets:write"),
+    ("GET", "/v1/assets/{asset_id}/health"): ("read", "assets:read"),
+    ("GET", "/v1/assets/{asset_id}/health/explain"): ("read", "assets:read"),
+    # Maintenance
+    ("GET", "/v1/assets/{asset_id}/maintenance"): ("read", "maintenance:read"),
+    ("POST", "/v1/assets/{asset_id}/maintenance"): ("write", "maintenance:write"),
+    ("POST", "/v1/assets/{asset_id}/maintenance/complete"): ("write", "maintenance:write"),
+    ("POST", "/v1/assets/{asset_id}/maintenance/seed"): ("write", "maintenance:write"),
+    ("GET", "/v1/assets/{asset_id}/maintenance/forecast"): ("read", "maintenance:read"),
+    ("GET", "/v1/assets/{asset_id}/service"): ("read", "maintenance:read"),
+    # Trips
+    ("GET", "/v1/assets/{asset_id}/trips"): ("read", "trips:read"),
+    ("POST", "/v1/assets/{asset_id}/trips"): ("write", "trips:write"),
+    # Documents
+    ("GET", "/v1/documents"): ("read", "documents:read"),
+    ("POST", "/v1/documents"): ("write", "documents:write"),
+    ("GET", "/v1/documents/{doc_id}/download"): ("read", "documents:read"),
+    # Alerts
+    ("GET", "/v1/alerts"): ("read", "alerts:read"),
+    ("POST", "/v1/assets/{asset_id}/alerts/generate"): ("write", "alerts:write"),
+    ("POST", "/v1/alerts/generate-due"): ("write", "alerts:write"),
+    ("POST", "/v1/alerts/{alert_id}/resolve"): ("write", "alerts:write"),
+    ("GET", "/v1/stream"): ("read", "fleet:read"),
+    ("GET", "/v1/sync"): ("read", "fleet:read"),
+    # Each batch operation is checked against its own route's policy
+    ("POST", "/v1/batch"): ("read", None),
+    # Admin
+    ("GET", "/v1/admin/api-keys"): ("admin", None),
+    ("POST", "/v1/admin/api-keys"): ("admin", None),
+    ("POST", "/v1/admin/api-keys/{key_id}/revoke"): ("admin", None),
+    ("POST", "/v1/admin/api-keys/{key_id}/scope"): ("admin", None),
+    ("POST", "/v1/admin/api-keys/{key_id}/admin"): ("admin", None),
+    ("GET", "/v1/admin/api-keys/{key_id}/feature-scopes"): ("admin", None),
+    ("POST", "/v1/admin/api-keys/{key_id}/feature-scopes"): ("admin", None),
+    ("GET", "/v1/admin/audit-logs"): ("admin", None),
+    ("GET", "/v1/admin/diagnostics"): ("admin", None),
+    ("GET", "/v1/admin/db-stats"): ("admin", None),
+    ("GET", "/v1/admin/metrics"): ("admin", None),
+    ("POST", "/v1/admin/profile"): ("admin", None),
+    ("GET", "/v1/admin/jobs"): ("admin", None),
+    ("POST", "/v1/admin/jobs/{name}/run"): ("admin", None),
+    ("GET", "/v1/admin/webhooks"): ("admin", None),
+    ("POST", "/v1/admin/webhooks"): ("admin", None),
+    ("POST", "/v1/admin/webhooks/{endpoint_id}/active"): ("admin", None),
+    ("GET", "/v1/admin/webhooks/outbox"): ("admin", None),
+    ("POST", "/v1/admin/webhooks/outbox/{delivery_id}/retry"): ("admin", None),
+}
+
+# Compiled at startup from ROUTE_POLICIES + app.routes
+_ROUTE_POLICY_INDEX: Dict[Tuple[str, str], Optional[Tuple[str, Optional[str]]]] = {}
+
+
+def enforce_route_policy(request: Request):
+    """
+    App-wide dependency. Runs after routing, so the matched route is on the
+    scope and the policy is a single dict lookup.
+    """
+    if getattr(request.state, "metrics_scrape", False):
+        return  # Token-authenticated, and only ever set for METRICS_PATH
+    route = request.scope.get("route")
+    check_route_policy(request, (request.method, getattr(route, "path", "")))
+
+
+def check_route_policy(request: Request, key: Tuple[str, str]):
+    if key not in _ROUTE_POLICY_INDEX:
+        raise HTTPException(
+            status_code=403, detail="No permission policy for route")
+    policy = _ROUTE_POLICY_INDEX[key]
+    if policy is None:
+        return
+    scope, feature = policy
+    if scope == ADMIN_SCOPE:
+        require_admin_scope(request, scope)
+    else:
+        require_scope(request, scope)
+    if feature and FEATURE_SCOPES_ENFORCED:
+        require_feature_scope(request, feature)
+
+
+# ---------------------------
+# ETag scopes: GET route path -> fleet_db change-counter scopes its body
+# depends on. "{param}" is filled from the (integer) path params.
+# ---------------------------
+FLEET_ETAG_SCOPES = ("assets", "maintenance_tasks",
+                     "trip_events", "service_events", "alerts")
+ETAG_SCOPES: Dict[str, Tuple[str, ...]] = {
+    "/v1/assets": ("assets",),
+    "/v1/assets/{asset_id}": ("asset:{asset_id}",),
+    "/v1/assets/{asset_id}/health": ("asset:{asset_id}",),
+    "/v1/assets/{asset_id}/health/explain": ("asset:{asset_id}",),
+    "/v1/assets/{asset_id}/maintenance": ("asset:{asset_id}",),
+    "/v1/assets/{asset_id}/maintenance/forecast": ("asset:{asset_id}",),
+    "/v1/assets/{asset_id}/service": ("asset:{asset_id}",),
+    "/v1/assets/{asset_id}/trips": ("asset:{asset_id}",),
+    "/v1/alerts": ("alerts",),
+    "/v1/documents": ("documents",),
+    "/v1/documents/{doc_id}/download": ("documents",),
+    "/v1/fleet/health": FLEET_ETAG_SCOPES,
+    "/v1/fleet/health/explain": FLEET_ETAG_SCOPES,
+    "/v1/fleet/dashboard": FLEET_ETAG_SCOPES,
+    "/v1/fleet/maintenance/forecast": FLEET_ETAG_SCOPES,
+    "/v1/fleet/maintenance/due": ("assets", "maintenance_tasks"),
+    "/v1/fleet/maintenance/upcoming": ("assets", "maintenance_tasks"),
+}
+
+
+# Build part of every ETag: a deploy that changes the schema or a payload
+# shape (fleet_db.PAYLOAD_VERSION) invalidates tags held by clients
+ETAG_BUILD = "s{}p{}".format(fleet_db.SCHEMA_VERSION, fleet_db.PAYLOAD_VERSION)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    # Weak comparison (RFC 9110 13.1.2)
+    if if_none_match.strip() == "*":
+        return True
+    target = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == target:
+            return True
+    return False
+
+
+def etag_precondition(request: Request):
+    """
+    App-wide dependency, after enforce_route_policy. Builds the ETag from
+    change counters (never from the body) and answers 304 before the handler
+    runs when If-None-Match matches. etag_header attaches it to the 200.
+    """
+    if request.method != "GET":
+        return
+    route = request.scope.get("route")
+    scopes = ETAG_SCOPES.get(getattr(route, "path", ""))
+    if not scopes:
+        return
+    params = {}
+    for name, value in request.path_params.items():
+        try:
+            params[name] = int(value)
+        except (TypeError, ValueError):
+            return
+    counters = fleet_db.get_change_counters(
+        [s.format(**params) for s in scopes])
+    # Day-based tasks turn due at midnight UTC without any write
+    etag = 'W/"{}-{}-{}-{}"'.format(app.version, ETAG_BUILD,
+                                    "-".join(str(v) for v in counters.values()),
+                                    fleet_db.today_iso())
+    if _etag_matches(request.headers.get("If-None-Match", ""), etag):
+        raise HTTPException(status_code=304, headers={"ETag": etag})
+    request.state.etag = etag
+
+
+def _json_default(obj: Any):
+    # fleet_db rows become dicts only here, at serialization time
+    if isinstance(obj, fleet_db.Record):
+        return fleet_db.record_to_dict(obj)
+    if isinstance(obj, (set, frozenset)):
+        return sorted(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class FleetJSONResponse(JSONResponse):
+    """
+    JSON response for the {"data", "meta", "error"} envelope. Our payloads are
+    already primitive (row records, lists, numbers), so api_response returns
+    this directly and FastAPI skips jsonable_encoder. Uses orjson when
+    installed; output matches Starlette's compact JSONResponse either way.
+    """
+
+    def render(self, content: Any) -> bytes:
+        if orjson is not None:
+            return orjson.dumps(content, default=_json_default,
+                                option=orjson.OPT_NON_STR_KEYS)
+        return json.dumps(
+            content,
+            ensure_ascii=False,
+            allow_nan=False,
+            indent=None,
+            separators=(",", ":"),
+            default=_json_default,
+        ).encode("utf-8")
+
+
+# ---------------------------
+# Prometheus text exposition
+# ---------------------------
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+METRICS_PATH = "/v1/admin/metrics"
+# Scrapers can send "Authorization: Bearer <METRICS_TOKEN>" instead of an
+# admin key: one constant-time compare rather than the PBKDF2 key lookup,
+# no last_used_at touch and no rate-limit bucket. Admin keys still work.
+# Metrics scrapes are never audited.
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+
+
+def is_metrics_scrape(request: Request) -> bool:
+    if not METRICS_TOKEN or request.url.path != METRICS_PATH:
+        return False
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(
+        token.strip().encode("utf-8"), METRICS_TOKEN.encode("utf-8"))
+
+
+def _prom_escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _prom_sample(name: str, value: Any, labels: Optional[Dict[str, Any]] = None) -> str:
+    if labels:
+        body = ",".join(f'{k}="{_prom_escape(v)}"' for k, v in labels.items())
+        return f"{name}{{{body}}} {value}"
+    return f"{name} {value}"
+
+
+def _prom_header(name: str, kind: str, help_text: str) -> List[str]:
+    return [f"# HELP {name} {help_text}", f"# TYPE {name} {kind}"]
+
+
+# ---------------------------
+# Request metrics (in process, per worker)
+# Keyed by (method, route template, scope) so ids in paths never add
+# series. request_metrics (outermost middleware) records latency to
+# response headers and Content-Length sizes; track_in_flight (first app
+# dependency) counts requests from routing until the response is built.
+# Both run on the event loop, so the dicts need no lock.
+# ---------------------------
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+UNMATCHED_ROUTE = "unmatched"
+ANONYMOUS_SCOPE = "anonymous"
+METRICS_CACHE_SECONDS = 1.0
+
+
+class RouteMetrics:
+    __slots__ = ("buckets", "count", "sum_s", "request_bytes", "response_bytes", "statuses")
+
+    def __init__(self):
+        self.buckets = [0] * (len(LATENCY_BUCKETS) + 1)  # last = +Inf
+        self.count = 0
+        self.sum_s = 0.0
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.statuses: Dict[str, int] = {}
+
+    def observe(self, seconds: float, status_code: int, request_bytes: int, response_bytes: int):
+        self.buckets[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum_s += seconds
+        self.request_bytes += request_bytes
+        self.response_bytes += response_bytes
+        status = f"{status_code // 100}xx"
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+
+
+_REQUEST_METRICS: Dict[Tuple[str, str, str], RouteMetrics] = {}
+_IN_FLIGHT: Dict[Tuple[str, str, str], int] = {}
+_METRICS_RENDERED = {"at": float("-inf"), "body": ""}
+
+
+def _metrics_key(request: Request) -> Tuple[str, str, str]:
+    route = request.scope.get("route")
+    rec = getattr(request.state, "api_key_record", None)
+    scope = (rec.get("scope") if rec else None) or ANONYMOUS_SCOPE
+    return (request.method, getattr(route, "path", UNMATCHED_ROUTE), scope)
+
+
+def observe_request(request: Request, seconds: float, status_code: int, response_bytes: int):
+    key = _metrics_key(request)
+    metrics = _REQUEST_METRICS.get(key)
+    if metrics is None:
+        metrics = _REQUEST_METRICS[key] = RouteMetrics()
+    request_bytes = int(request.headers.get("content-length") or 0)
+    metrics.observe(seconds, status_code, request_bytes, response_bytes)
+
+
+async def track_in_flight(request: Request):
+    key = _metrics_key(request)
+    _IN_FLIGHT[key] = _IN_FLIGHT.get(key, 0) + 1
+    try:
+        yield
+    finally:
+        _IN_FLIGHT[key] -= 1
+
+
+def http_metrics_lines() -> List[str]:
+    items = sorted(_REQUEST_METRICS.items())
+    bounds = [f"{b:g}" for b in LATENCY_BUCKETS] + ["+Inf"]
+
+    lines = _prom_header("fleet_http_request_duration_seconds", "histogram",
+                         "Request latency to response headers, by route template and scope.")
+    for (method, route, scope), m in items:
+        labels = {"method": method, "route": route, "scope": scope}
+        cumulative = 0
+        for le, n in zip(bounds, m.buckets):
+            cumulative += n
+            lines.append(_prom_sample("fleet_http_request_duration_seconds_bucket",
+                                      cumulative, dict(labels, le=le)))
+        lines.append(_prom_sample(
+            "fleet_http_request_duration_seconds_sum", round(m.sum_s, 6), labels))
+        lines.append(_prom_sample(
+            "fleet_http_request_duration_seconds_count", m.count, labels))
+
+    for name, field, help_text in (
+        ("fleet_http_request_size_bytes_total", "request_bytes",
+         "Request body bytes (Content-Length)."),
+        ("fleet_http_response_size_bytes_total", "response_bytes",
+         "Response body bytes (Content-Length)."),
+    ):
+        lines += _prom_header(name, "counter", help_text)
+        for (method, route, scope), m in items:
+            lines.append(_prom_sample(name, getattr(m, field),
+                                      {"method": method, "route": route, "scope": scope}))
+
+    lines += _prom_header("fleet_http_responses_total", "counter",
+                          "Responses by status class.")
+    for (method, route, scope), m in items:
+        for status, n in sorted(m.statuses.items()):
+            lines.append(_prom_sample("fleet_http_responses_total", n, {
+                "method": method, "route": route, "scope": scope, "status": status}))
+
+    lines += _prom_header("fleet_http_requests_in_flight", "gauge",
+                          "Requests between routing and response.")
+    for (method, route, scope), n in sorted(_IN_FLIGHT.items()):
+        lines.append(_prom_sample("fleet_http_requests_in_flight", n,
+                                  {"method": method, "route": route, "scope": scope}))
+    return lines
+
+
+# ---------------------------
+# On-demand profiling (POST /v1/admin/profile)
+# ProfiledRoute wraps every sync endpoint so a capture runs in the
+# handler's own threadpool thread (cProfile is per thread). With no
+# capture running the wrapper costs one global read. Captures cover the
+# handler body (DB calls + response rendering), not middleware or auth.
+# ---------------------------
+PROFILE_MODES = {"sample": {"collapsed"}, "cprofile": {"pstats", "text"}}
+PROFILE_MAX_SECONDS = 120.0
+PROFILE_SAMPLE_INTERVAL = 0.005
+PROFILE_TEXT_LINES = 60
+
+
+class ProfileSession:
+    def __init__(self, mode: str, route: Optional[str], max_requests: Optional[int]):
+        self.mode = mode
+        self.route = route
+        self.max_requests = max_requests
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+        self.started = 0
+        self.completed = 0
+        self.stats = pstats.Stats()
+        self.samples: Dict[str, int] = {}
+        self.sample_count = 0
+        self._active: Dict[int, str] = {}  # thread ident -> route template
+        self._sampler: Optional[threading.Thread] = None
+
+    def start(self):
+        if self.mode == "sample":
+            self._sampler = threading.Thread(
+                target=self._sample_loop, name="profile-sampler", daemon=True)
+            self._sampler.start()
+
+    def stop(self):
+        self.done.set()
+        if self._sampler is not None:
+            self._sampler.join()
+
+    def run(self, route: str, endpoint, args, kwargs):
+        if self.done.is_set() or (self.route and self.route != route):
+            return endpoint(*args, **kwargs)
+        with self.lock:
+            if self.max_requests and self.started >= self.max_requests:
+                return endpoint(*args, **kwargs)
+            self.started += 1
+        try:
+            if self.mode == "cprofile":
+                prof = cProfile.Profile()
+                try:
+                    return prof.runcall(endpoint, *args, **kwargs)
+                finally:
+                    with self.lock:
+                        self.stats.add(prof)
+            ident = threading.get_ident()
+            with self.lock:
+                self._active[ident] = route
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                with self.lock:
+                    self._active.pop(ident, None)
+        finally:
+            with self.lock:
+                self.completed += 1
+                if self.max_requests and self.completed >= self.max_requests:
+                    self.done.set()
+
+    def _sample_loop(self):
+        while not self.done.wait(PROFILE_SAMPLE_INTERVAL):
+            with self.lock:
+                active = list(self._active.items())
+            if not active:
+                continue
+            frames = sys._current_frames()
+            for ident, route in active:
+                frame = frames.get(ident)
+                stack = []
+                # Walk up to the route wrapper; threadpool frames above it are noise
+                while frame is not None and frame.f_code not in _PROFILE_STOP_CODES:
+                    code = frame.f_code
+                    stack.append(
+                        f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                    frame = frame.f_back
+                if not stack:
+                    continue
+                key = ";".join([route] + stack[::-1])
+                with self.lock:
+                    self.samples[key] = self.samples.get(key, 0) + 1
+                    self.sample_count += 1
+
+    def collapsed(self) -> str:
+        with self.lock:
+            return "".join(f"{k} {n}\n" for k, n in sorted(self.samples.items()))
+
+    def pstats_dump(self) -> bytes:
+        # Same bytes Stats.dump_stats writes; load with pstats.Stats(path)
+        with self.lock:
+            return marshal.dumps(self.stats.stats)
+
+    def pstats_text(self) -> str:
+        buf = io.StringIO()
+        with self.lock:
+            if self.stats.stats:
+                self.stats.stream = buf
+                self.stats.sort_stats("cumulative").print_stats(PROFILE_TEXT_LINES)
+        return buf.getvalue()
+
+
+_PROFILE_SESSION: Optional[ProfileSession] = None
+
+
+def _profiled_call(route: str, endpoint, args, kwargs):
+    session = _PROFILE_SESSION
+    if session is None:
+        return endpoint(*args, **kwargs)
+    return session.run(route, endpoint, args, kwargs)
+
+
+_PROFILE_STOP_CODES = {_profiled_call.__code__, ProfileSession.run.__code__}
+
+
+class ProfiledRoute(APIRoute):
+    def __init__(self, path: str, endpoint, **kwargs):
+        if not asyncio.iscoroutinefunction(endpoint):
+            original = endpoint
+
+            # functools.wraps keeps the signature FastAPI introspects
+            @functools.wraps(original)
+            def endpoint(*args, **kw):
+                return _profiled_call(path, original, args, kw)
+        super().__init__(path, endpoint, **kwargs)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    startup()
+    if DB_SINGLE_WRITER:
+        fleet_db.start_writer(DB_WRITER_MAX_DELAY_MS, DB_WRITER_MAX_BATCH)
+    if SCHEDULER_ENABLED:
+        SCHEDULER.start()
+    yield
+    SCHEDULER.stop()
+    WEBHOOKS.close()
+    fleet_db.stop_writer()
+
+
+app = FastAPI(
+    title="Fleet Ops API",
+    lifespan=lifespan,
+    version="0.1",
+    default_response_class=FleetJSONResponse,
+    dependencies=[
+        Depends(track_in_flight),
+        Depends(enforce_route_policy),
+        Depends(etag_precondition),
+    ],
+)
+app.router.route_class = ProfiledRoute
 
 app.add_middleware(
     CORSMiddleware,
@@ -80,14 +622,18 @@ app.add_middleware(
 # ---------------------------
 # Response helpers
 # ---------------------------
-def api_response(data=None, meta=None, error=None):
+def envelope(data=None, meta=None, error=None) -> Dict[str, Any]:
     return {"data": data, "meta": meta or {}, "error": error}
 
 
+def api_response(data=None, meta=None, error=None):
+    return FleetJSONResponse(content=envelope(data=data, meta=meta, error=error))
+
+
 def api_error(status_code: int, code: str, message: str):
-    return JSONResponse(
+    return FleetJSONResponse(
         status_code=status_code,
-        content=api_response(
+        content=envelope(
             data=None,
             meta={},
             error={"code": code, "message": message},
@@ -104,6 +650,7 @@ def env_flag(name: str, default: bool = False) -> bool:
 
 DOC_ENCRYPTION_ENABLED = env_flag(DOC_ENCRYPTION_ENV, default=False)
 DOC_FERNET = None
+FEATURE_SCOPES_ENFORCED = env_flag("FEATURE_SCOPES_ENFORCED", default=True)
 
 
 def _init_doc_encryption():
@@ -123,11 +670,12 @@ def _init_doc_encryption():
 # ---------------------------
 # STARTUP
 # ---------------------------
-@app.on_event("startup")
 def startup():
     init_db()
+    fleet_db.rebuild_due_index()
     os.makedirs(DOCS_DIR, exist_ok=True)
     _init_doc_encryption()
+    compile_route_policies()
 
     print("\n--- Fleet Ops API Startup ---")
     try:
@@ -145,17 +693,22 @@ def startup():
 # ---------------------------
 # Global error handling
 # ---------------------------
+ERROR_CODES = {
+    400: "BAD_REQUEST",
+    401: "UNAUTHORIZED",
+    403: "FORBIDDEN",
+    404: "NOT_FOUND",
+    409: "CONFLICT",
+    422: "VALIDATION_ERROR",
+    429: "RATE_LIMITED",
+}
+
+
 @app.exception_handler(HTTPException)
 async def http_exception_handler(request: Request, exc: HTTPException):
-    status_map = {
-        400: "BAD_REQUEST",
-        401: "UNAUTHORIZED",
-        403: "FORBIDDEN",
-        404: "NOT_FOUND",
-        409: "CONFLICT",
-        422: "VALIDATION_ERROR",
-    }
-    code = status_map.get(exc.status_code, "ERROR")
+    if exc.status_code == 304:
+        return Response(status_code=304, headers=exc.headers)
+    code = ERROR_CODES.get(exc.status_code, "ERROR")
     return api_error(exc.status_code, code, str(exc.detail))
 
 
@@ -166,6 +719,7 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 
 @app.exception_handler(Exception)
 async def unhandled_exception_handler(request: Request, exc: Exception):
+    fleet_db.note_db_error(exc)
     return api_error(500, "INTERNAL_ERROR", "Internal server error")
 
 
@@ -175,13 +729,16 @@ async def unhandled_exception_handler(request: Request, exc: Exception):
 PERMISSION_MAP = {"read": 1, "write": 2, "admin": 3}
 
 
-def require_scope(request: Request, required: str):
+def _verified_record(request: Request) -> Dict[str, Any]:
+    # Set by api_key_auth; never re-read the key here
     rec = getattr(request.state, "api_key_record", None)
-    if rec is None:
-        api_key = request.headers.get("X-API-Key", "")
-        rec = get_api_key_record(api_key)
     if rec is None:
         raise HTTPException(status_code=401, detail="Invalid API key")
+    return rec
+
+
+def require_scope(request: Request, required: str):
+    rec = _verified_record(request)
     scope = rec.get("scope")
     if PERMISSION_MAP.get(scope, 0) < PERMISSION_MAP.get(required, 0):
         raise HTTPException(
@@ -192,8 +749,8 @@ def require_scope(request: Request, required: str):
 # Lesson 38: Feature-scope guard
 # ---------------------------
 def require_feature_scope(request: Request, required: str):
-    api_key = request.headers.get("X-API-Key", "")
-    if not fleet_db.has_scope(api_key, required):
+    rec = _verified_record(request)
+    if not fleet_db.record_has_scope(rec, required):
         raise HTTPException(
             status_code=403, detail=f"Scope '{required}' required")
 
@@ -203,21 +760,55 @@ def require_feature_scope(request: Request, required: str):
 # ---------------------------
 def require_admin_scope(request: Request, required_scope: str) -> bool:
     rec = getattr(request.state, "api_key_record", None)
-    if rec is None:
-        api_key = request.headers.get("X-API-Key", "")
-        rec = get_api_key_record(api_key)
     if rec is None or rec.get("scope") != required_scope:
         raise HTTPException(
             status_code=403, detail=f"Admin scope '{required_scope}' required")
     return True
 
 
+def compile_route_policies():
+    """
+    Resolve ROUTE_POLICIES against the registered /v1 routes. Fails startup
+    if a route has no policy so nothing ships unguarded.
+    """
+    index: Dict[Tuple[str, str], Optional[Tuple[str, Optional[str]]]] = {}
+    for route in app.routes:
+        if not isinstance(route, APIRoute) or not route.path.startswith("/v1/"):
+            continue
+        for method in route.methods:
+            key = (method, route.path)
+            if key not in ROUTE_POLICIES:
+                raise RuntimeError(
+                    f"No route policy for {method} {route.path}")
+            policy = ROUTE_POLICIES[key]
+            if policy and policy[1] and policy[1] not in fleet_db.FEATURE_SCOPES:
+                raise RuntimeError(
+                    f"Unknown feature scope {policy[1]} for {method} {route.path}")
+            index[key] = ROUTE_POLICIES[key]
+    _ROUTE_POLICY_INDEX.clear()
+    _ROUTE_POLICY_INDEX.update(index)
+
+
 # ---------------------------
-# ✅ Middleware ORDER
-# 1) audit_logger
-# 2) api_key_auth
-# 3) scope_enforcer
+# ✅ Middleware ORDER (outermost first)
+# 1) request_metrics
+# 2) rate_limiter
+# 3) api_key_auth
+# 4) audit_logger
+# 5) etag_header
+# Scope checks run in enforce_route_policy (app dependency) after routing.
 # ---------------------------
+@app.middleware("http")
+async def etag_header(request: Request, call_next):
+    # Handlers return Response objects, so dependency-set headers are not
+    # merged; copy the ETag computed by etag_precondition here instead.
+    response = await call_next(request)
+    etag = getattr(request.state, "etag", None)
+    if etag and response.status_code == 200:
+        response.headers["ETag"] = etag
+    return response
+
+
 @app.middleware("http")
 async def audit_logger(request: Request, call_next):
     if not request.url.path.startswith("/v1/"):
@@ -233,12 +824,15 @@ async def audit_logger(request: Request, call_next):
         success = False
         raise
     finally:
-        if request.url.path != "/v1/health":
+        if request.url.path not in ("/v1/health", METRICS_PATH):
             try:
                 rec = getattr(request.state, "api_key_record", None)
                 api_key_id = rec.get("id") if rec else None
                 scope = rec.get("scope") if rec else None
-                fleet_db.write_audit_log(
+                # Off the event loop: with DB_SINGLE_WRITER this waits for a
+                # group commit, which must not stall the whole worker
+                await run_in_threadpool(
+                    fleet_db.write_audit_log,
                     api_key_id=api_key_id,
                     scope=scope,
                     method=request.method,
@@ -246,8 +840,9 @@ async def audit_logger(request: Request, call_next):
                     status_code=status_code,
                     success=success,
                 )
-            except Exception:
-                pass
+            except Exception as exc:
+                # Swallowed (auditing must not fail the request), but counted
+                fleet_db.note_db_error(exc)
 
 
 @app.middleware("http")
@@ -258,45 +853,202 @@ async def api_key_auth(request: Request, call_next):
     if not request.url.path.startswith("/v1/"):
         return await call_next(request)
 
+    if is_metrics_scrape(request):
+        request.state.metrics_scrape = True
+        return await call_next(request)
+
     api_key = request.headers.get("X-API-Key", "")
     rec = get_api_key_record(api_key)
     if rec is None:
         return api_error(401, "UNAUTHORIZED", "Missing or invalid API key")
     request.state.api_key_record = rec
-    touch_api_key_last_used(int(rec["id"]))
+    await run_in_threadpool(touch_api_key_last_used, int(rec["id"]))
+    remember_rate_limit_key(request, rec)
 
     return await call_next(request)
 
 
+# ---------------------------
+# Rate limiting (per-key token buckets, in memory)
+# Registered last => outermost: runs before auth, PBKDF2 or any DB work.
+# Keys are tracked by a fast digest of the raw header; a key's scope is
+# learned from its first successful verification. Keys not yet verified
+# (including invalid ones) are limited per client IP, so one source
+# retrying a revoked key or spraying random keys cannot block other
+# clients' first requests; "unverified_global" only caps the total PBKDF2
+# work unverified traffic can cause. Behind a reverse proxy run uvicorn
+# with --proxy-headers so the client IP is the real one.
+# ---------------------------
+RATE_LIMIT_ENABLED = env_flag("RATE_LIMIT_ENABLED", default=True)
+# scope -> (tokens per second, burst capacity); override with
+# RATE_LIMIT_<SCOPE>="rate/burst", e.g. RATE_LIMIT_READ="20/40"
+RATE_LIMIT_DEFAULTS = {
+    "unverified": (5.0, 20.0),           # per client IP
+    "unverified_global": (50.0, 100.0),  # all unverified traffic, this worker
+    "read": (20.0, 40.0),
+    "write": (10.0, 20.0),
+    "admin": (50.0, 100.0),
+}
+RATE_LIMIT_MAX_KEYS = 10_000
+UNVERIFIED_BUCKET = "unverified"
+UNVERIFIED_GLOBAL_BUCKET = "unverified_global"
+
+
+def _rate_from_env(scope: str, default: Tuple[float, float]) -> Tuple[float, float]:
+    raw = os.getenv(f"RATE_LIMIT_{scope.upper()}", "").strip()
+    if not raw:
+        return default
+    rate, _, burst = raw.partition("/")
+    rate_f = float(rate)
+    return rate_f, float(burst) if burst else rate_f
+
+
+RATE_LIMITS = {scope: _rate_from_env(scope, d)
+               for scope, d in RATE_LIMIT_DEFAULTS.items()}
+
+
+class TokenBucket:
+    __slots__ = ("rate", "capacity", "tokens", "updated")
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def take(self) -> float:
+        """Take one token. Returns 0 if allowed, else seconds until one is free."""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens +
+                          (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        if self.rate <= 0:
+            return 60.0
+        return (1.0 - self.tokens) / self.rate
+
+
+# digest -> (key_id, scope) for keys that have verified at least once
+_RATE_LIMIT_KEYS: Dict[str, Tuple[int, str]] = {}
+# digest -> bucket
+_RATE_LIMIT_BUCKETS: Dict[str, TokenBucket] = {}
+# client IP -> bucket for not-yet-verified keys, least recently used first
+_UNVERIFIED_BUCKETS: "OrderedDict[str, TokenBucket]" = OrderedDict()
+_UNVERIFIED_GLOBAL = TokenBucket(*RATE_LIMITS[UNVERIFIED_GLOBAL_BUCKET])
+# key id (or UNVERIFIED_BUCKET) -> {"allowed": n, "limited": n}
+_RATE_LIMIT_COUNTERS: Dict[str, Dict[str, int]] = {}
+
+
+def _rate_key_digest(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode("utf-8")).hexdigest()
+
+
+def remember_rate_limit_key(request: Request, rec: Dict[str, Any]):
+    digest = getattr(request.state, "rate_key_digest", None)
+    if digest is None:
+        return
+    known = _RATE_LIMIT_KEYS.get(digest)
+    entry = (int(rec["id"]), str(rec.get("scope") or "read"))
+    if known == entry:
+        return
+    if len(_RATE_LIMIT_KEYS) >= RATE_LIMIT_MAX_KEYS:
+        oldest = next(iter(_RATE_LIMIT_KEYS))
+        _RATE_LIMIT_KEYS.pop(oldest, None)
+        _RATE_LIMIT_BUCKETS.pop(oldest, None)
+    _RATE_LIMIT_KEYS[digest] = entry
+    # Scope changed (or first sighting): start from a fresh bucket for it
+    _RATE_LIMIT_BUCKETS.pop(digest, None)
+
+
+def _unverified_wait(client_ip: str) -> float:
+    bucket = _UNVERIFIED_BUCKETS.get(client_ip)
+    if bucket is None:
+        if len(_UNVERIFIED_BUCKETS) >= RATE_LIMIT_MAX_KEYS:
+            _UNVERIFIED_BUCKETS.popitem(last=False)
+        bucket = TokenBucket(*RATE_LIMITS[UNVERIFIED_BUCKET])
+        _UNVERIFIED_BUCKETS[client_ip] = bucket
+    else:
+        _UNVERIFIED_BUCKETS.move_to_end(client_ip)
+    wait = bucket.take()
+    if wait > 0:
+        return wait
+    return _UNVERIFIED_GLOBAL.take()
+
+
+def check_rate_limit(api_key: str, client_ip: str = "") -> Tuple[str, float]:
+    digest = _rate_key_digest(api_key)
+    known = _RATE_LIMIT_KEYS.get(digest)
+    if known is None:
+        counter_key = UNVERIFIED_BUCKET
+        wait = _unverified_wait(client_ip)
+    else:
+        counter_key = str(known[0])
+        bucket = _RATE_LIMIT_BUCKETS.get(digest)
+        if bucket is None:
+            bucket = TokenBucket(*RATE_LIMITS.get(known[1], RATE_LIMITS["read"]))
+            _RATE_LIMIT_BUCKETS[digest] = bucket
+        wait = bucket.take()
+
+    counters = _RATE_LIMIT_COUNTERS.setdefault(
+        counter_key, {"allowed": 0, "limited": 0})
+    counters["limited" if wait > 0 else "allowed"] += 1
+    return digest, wait
+
+
+def rate_limit_stats() -> Dict[str, Any]:
+    return {
+        "enabled": RATE_LIMIT_ENABLED,
+        "limits": {scope: {"rate_per_sec": r, "burst": b}
+                   for scope, (r, b) in RATE_LIMITS.items()},
+        "tracked_keys": len(_RATE_LIMIT_KEYS),
+        "tracked_unverified_clients": len(_UNVERIFIED_BUCKETS),
+        "counters": {k: dict(v) for k, v in _RATE_LIMIT_COUNTERS.items()},
+    }
+
+
 @app.middleware("http")
-async def scope_enforcer(request: Request, call_next):
-    if not request.url.path.startswith("/v1/"):
+async def rate_limiter(request: Request, call_next):
+    if not RATE_LIMIT_ENABLED:
         return await call_next(request)
 
-    if request.url.path in OPEN_PATHS:
+    if not request.url.path.startswith("/v1/") or request.url.path in OPEN_PATHS:
         return await call_next(request)
-
-    # Admin routes are handled by require_admin_scope inside those endpoints
-    if request.url.path.startswith("/v1/admin/"):
+    if is_metrics_scrape(request):
         return await call_next(request)
 
-    required = "write" if request.method.upper() in WRITE_METHODS else "read"
-
-    try:
-        require_scope(request, required)
-    except HTTPException as e:
-        return api_error(
-            e.status_code,
-            "FORBIDDEN" if e.status_code == 403 else "UNAUTHORIZED",
-            str(e.detail),
-        )
+    client_ip = request.client.host if request.client else ""
+    digest, wait = check_rate_limit(request.headers.get("X-API-Key", ""), client_ip)
+    if wait > 0:
+        response = api_error(429, "RATE_LIMITED", "Rate limit exceeded")
+        response.headers["Retry-After"] = str(max(1, math.ceil(wait)))
+        return response
+    request.state.rate_key_digest = digest
 
     return await call_next(request)
 
 
+# Registered after rate_limiter => outermost, so 429s and 401s are timed too.
+@app.middleware("http")
+async def request_metrics(request: Request, call_next):
+    start = time.perf_counter()
+    try:
+        response = await call_next(request)
+    except Exception:
+        observe_request(request, time.perf_counter() - start, 500, 0)
+        raise
+    observe_request(request, time.perf_counter() - start, response.status_code,
+                    int(response.headers.get("content-length") or 0))
+    return response
+
+
 # ---------------------------
 # Models
 # ---------------------------
+BATCH_MAX_OPERATIONS = 50
+
+
 class AssetCreate(BaseModel):
     name: str = Field(min_length=1)
     type: str = Field(default=DEFAULT_ASSET_TYPE, min_length=1)
@@ -306,8 +1058,12 @@ class AssetCreate(BaseModel):
 class TaskUpsert(BaseModel):
     task: str = Field(min_length=1)
     interval_value: float = Field(gt=0)
-    last_done_value: float = Field(ge=0)
+    # Required for usage-based tasks; a day-based edit without it keeps the stored value
+    last_done_value: Optional[float] = Field(default=None, ge=0)
     category: str = Field(default=DEFAULT_CATEGORY, min_length=1)
+    # None/the asset's usage unit = usage-based; "days" = calendar trigger
+    trigger_unit: Optional[str] = None
+    last_done_date: Optional[date] = None
 
 
 class TaskComplete(BaseModel):
@@ -332,33 +1088,71 @@ class AdminUpdateAdmin(BaseModel):
     is_admin: bool = Field(default=False)
 
 
+class WebhookCreate(BaseModel):
+    url: str = Field(min_length=1)
+    # Optional: sign bodies with HMAC-SHA256 (X-Fleet-Signature)
+    secret: Optional[str] = None
+
+
+class WebhookActive(BaseModel):
+    is_active: bool
+
+
+class BatchOperation(BaseModel):
+    method: str = Field(default="POST", min_length=1)
+    path: str = Field(min_length=1)
+    body: Optional[Dict[str, Any]] = None
+
+
+class BatchRequest(BaseModel):
+    operations: List[BatchOperation] = Field(min_length=1, max_length=BATCH_MAX_OPERATIONS)
+    # True: the first failed operation rolls back the whole batch
+    atomic: bool = False
+
+
+class AdminProfileRequest(BaseModel):
+    mode: str = Field(default="sample")
+    seconds: float = Field(default=10.0, gt=0, le=PROFILE_MAX_SECONDS)
+    requests: Optional[int] = Field(default=None, gt=0)
+    route: Optional[str] = None
+    format: Optional[str] = None
+
+
+class AdminUpdateFeatureScopes(BaseModel):
+    grant: List[str] = Field(default_factory=list)
+    revoke: List[str] = Field(default_factory=list)
+
+
 # ---------------------------
 # Helpers
 # ---------------------------
 def group_tasks(asset: Dict[str, Any], tasks: List[Dict[str, Any]]):
-    current = float(asset.get("usage_value", asset.get("engine_hours", 0.0)))
+    current = float(asset.get("usage_value", 0.0))
     unit = asset.get("usage_unit") or fleet_db.default_usage_unit(
         asset.get("type", "unknown"))
 
     grouped: Dict[str, List[Dict[str, Any]]] = {}
+    today = fleet_db.today_iso()
 
     for t in tasks:
         interval = float(t.get("interval_value", 0))
         last_done = float(t.get("last_done_value", 0))
-        since_last = current - last_done
+        since_last = fleet_db.task_since_last(t, current, today)
         due = since_last >= interval if interval > 0 else False
 
         cat = t.get("category") or "General"
-        grouped.setdefault(cat, []).append(
-            {
-                "task": t["task"],
-                "interval_value": interval,
-                "last_done_value": last_done,
-                "since_last": since_last,
-                "due": due,
-                "unit": t.get("unit") or unit,
-            }
-        )
+        item = {
+            "task": t["task"],
+            "interval_value": interval,
+            "last_done_value": last_done,
+            "since_last": since_last,
+            "due": due,
+            "unit": t.get("unit") or unit,
+        }
+        if t.get("unit") == fleet_db.DAY_UNIT:
+            item["last_done_date"] = t.get("last_done_date")
+            item["next_due_date"] = t.get("next_due_date")
+        grouped.setdefault(cat, []).append(item)
 
     for cat in grouped:
         grouped[cat].sort(key=lambda x: x["task"].lower())
@@ -384,6 +1178,314 @@ def paginate(items: list, limit: int, offset: int):
     }
 
 
+# ---------------------------
+# Response cache (fleet read endpoints)
+# Entries are tagged with the shared change counters of the tables the body
+# reads (the same ones its ETag uses), so a write on any uvicorn worker
+# invalidates them and a body is never older than the ETag it is sent with.
+# A hit costs one indexed counter read. The TTL covers the date rollover.
+# ---------------------------
+RESPONSE_CACHE_ENABLED = env_flag("RESPONSE_CACHE_ENABLED", default=True)
+RESPONSE_CACHE_TTL_SECONDS = float(
+    os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+RESPONSE_CACHE_MAX_ENTRIES = 256
+
+# (endpoint, params) -> (counter values, stored_at, data)
+_RESPONSE_CACHE: Dict[Tuple[str, Tuple], Tuple[Tuple[int, ...], float, Any]] = {}
+_RESPONSE_CACHE_STATS = {"hits": 0, "misses": 0}
+
+
+def cached_data(endpoint: str, params: Tuple, build, scopes: Tuple[str, ...] = FLEET_ETAG_SCOPES):
+    if not RESPONSE_CACHE_ENABLED:
+        return build()
+
+    version = tuple(fleet_db.get_change_counters(list(scopes)).values())
+    now = time.monotonic()
+    key = (endpoint, params)
+    entry = _RESPONSE_CACHE.get(key)
+    if entry is not None and entry[0] == version and now - entry[1] < RESPONSE_CACHE_TTL_SECONDS:
+        _RESPONSE_CACHE_STATS["hits"] += 1
+        return entry[2]
+
+    _RESPONSE_CACHE_STATS["misses"] += 1
+    data = build()
+    if key not in _RESPONSE_CACHE and len(_RESPONSE_CACHE) >= RESPONSE_CACHE_MAX_ENTRIES:
+        for k in [k for k, e in _RESPONSE_CACHE.items() if e[0] != version]:
+            _RESPONSE_CACHE.pop(k, None)
+        if len(_RESPONSE_CACHE) >= RESPONSE_CACHE_MAX_ENTRIES:
+            _RESPONSE_CACHE.pop(next(iter(_RESPONSE_CACHE)), None)
+    _RESPONSE_CACHE[key] = (version, now, data)
+    return data
+
+
+# ---------------------------
+# Fleet brief snapshots (GET /v1/fleet/ai_brief)
+# fleet_ai_brief walks every active task, so the endpoint serves the stored
+# snapshot. The "brief_refresh" job rebuilds each BRIEF_HORIZONS entry when
+# the fleet fingerprint (change counters + date) moves, checked every
+# BRIEF_POLL_SECONDS, or when it is older than BRIEF_REFRESH_SECONDS.
+# Snapshots live in SQLite, so all workers share one per horizon. Other
+# horizons are built on request and kept in the response cache, keyed on the
+# same change counters as the fingerprint.
+# ---------------------------
+BRIEF_REFRESHER_ENABLED = env_flag("BRIEF_REFRESHER_ENABLED", default=True)
+BRIEF_HORIZONS = tuple(
+    int(h) for h in os.getenv("BRIEF_HORIZONS", "50").split(",") if h.strip())
+BRIEF_REFRESH_SECONDS = float(os.getenv("BRIEF_REFRESH_SECONDS", "300"))
+BRIEF_POLL_SECONDS = float(os.getenv("BRIEF_POLL_SECONDS", "5"))
+BRIEF_MAX_HORIZON_HOURS = 24 * 365
+if not BRIEF_HORIZONS or not all(1 <= h <= BRIEF_MAX_HORIZON_HOURS for h in BRIEF_HORIZONS):
+    raise RuntimeError(f"BRIEF_HORIZONS must be hours in 1..{BRIEF_MAX_HORIZON_HOURS}")
+
+_BRIEF_STATS: Dict[str, Any] = {"refreshes": 0}
+
+
+def _brief_is_current(snapshot: Optional[Dict[str, Any]], fingerprint: str) -> bool:
+    if snapshot is None or snapshot["fingerprint"] != fingerprint:
+        return False
+    generated = datetime.strptime(snapshot["generated_at"], "%Y-%m-%d %H:%M:%S")
+    age = datetime.now(timezone.utc) - generated.replace(tzinfo=timezone.utc)
+    return age.total_seconds() < BRIEF_REFRESH_SECONDS
+
+
+def refresh_fleet_briefs(force: bool = False) -> int:
+    """Rebuild stale BRIEF_HORIZONS snapshots; returns how many were rebuilt."""
+    fingerprint = fleet_db.brief_fingerprint()
+    refreshed = 0
+    for horizon in BRIEF_HORIZONS:
+        if force or not _brief_is_current(fleet_db.get_brief_snapshot(horizon), fingerprint):
+            fleet_db.refresh_brief_snapshot(horizon, fingerprint)
+            refreshed += 1
+    _BRIEF_STATS["refreshes"] += refreshed
+    return refreshed
+
+
+def brief_stats() -> Dict[str, Any]:
+    job = SCHEDULER.jobs.get("brief_refresh")
+    return {
+        "enabled": job is not None,
+        "running": job is not None and SCHEDULER.is_running(),
+        "horizons": list(BRIEF_HORIZONS),
+        "refresh_seconds": BRIEF_REFRESH_SECONDS,
+        "poll_seconds": BRIEF_POLL_SECONDS,
+        **_BRIEF_STATS,
+        "errors": job.stats["failures"] if job else 0,
+        "last_error": job.stats["last_error"] if job else None,
+    }
+
+
+# ---------------------------
+# Background jobs (scheduler.py)
+# One Scheduler per worker process, started from the lifespan. Jobs take a
+# job_leases row before running, so with N uvicorn workers each still runs
+# once per period; local_only jobs maintain per-process state and skip it.
+# Cron expressions are UTC.
+# ---------------------------
+SCHEDULER_ENABLED = env_flag("SCHEDULER_ENABLED", default=True)
+ALERT_JOB_SECONDS = float(os.getenv("ALERT_JOB_SECONDS", "600"))
+DUE_INDEX_REFRESH_SECONDS = float(os.getenv("DUE_INDEX_REFRESH_SECONDS", "5"))
+AUDIT_RETENTION_DAYS = int(os.getenv("AUDIT_RETENTION_DAYS", "90"))
+AUDIT_COMPACT_CRON = os.getenv("AUDIT_COMPACT_CRON", "30 3 * * *")
+DB_OPTIMIZE_CRON = os.getenv("DB_OPTIMIZE_CRON", "45 3 * * *")
+SNAPSHOT_PRUNE_CRON = os.getenv("SNAPSHOT_PRUNE_CRON", "15 * * * *")
+
+SCHEDULER = Scheduler()
+
+
+def _job_generate_alerts() -> None:
+    created = fleet_db.generate_fleet_alerts()
+    if created:
+        print(f"generate_alerts: {created} new alert(s)")
+
+
+def _job_compact_audit_logs() -> None:
+    deleted = fleet_db.compact_audit_logs(AUDIT_RETENTION_DAYS)
+    if deleted:
+        print(f"compact_audit_logs: deleted {deleted} row(s) older than {AUDIT_RETENTION_DAYS} days")
+
+
+def _job_prune_snapshots() -> None:
+    fleet_db.prune_brief_snapshots(list(BRIEF_HORIZONS))
+
+
+def _job_optimize_db() -> None:
+    planned = fleet_db.optimize_db()
+    if planned:
+        print("optimize_db:", "; ".join(planned))
+
+
+SCHEDULER.add_interval("generate_alerts", _job_generate_alerts, ALERT_JOB_SECONDS, jitter=30)
+if BRIEF_REFRESHER_ENABLED:
+    SCHEDULER.add_interval("brief_refresh", refresh_fleet_briefs, BRIEF_POLL_SECONDS,
+                           jitter=1, lease_seconds=120)
+SCHEDULER.add_cron("prune_brief_snapshots", _job_prune_snapshots, SNAPSHOT_PRUNE_CRON, jitter=60)
+SCHEDULER.add_cron("compact_audit_logs", _job_compact_audit_logs, AUDIT_COMPACT_CRON,
+                   jitter=300, lease_seconds=1800)
+SCHEDULER.add_cron("optimize_db", _job_optimize_db, DB_OPTIMIZE_CRON, jitter=300)
+# Reads catch the due index up from change_log themselves; this keeps the
+# backlog short so they rarely have to
+SCHEDULER.add_interval("refresh_due_index", fleet_db.refresh_due_index,
+                       DUE_INDEX_REFRESH_SECONDS, jitter=1, local_only=True)
+
+
+# ---------------------------
+# Webhook delivery (webhooks.py)
+# Alert creation writes webhook_outbox rows in its own transaction; the
+# deliver_webhooks job drains them. Single-flight, so with several workers
+# one process delivers at a time and rows are not sent twice; that holds
+# only while the lease outlives the slowest possible round.
+# ---------------------------
+WEBHOOKS_ENABLED = env_flag("WEBHOOKS_ENABLED", default=True)
+WEBHOOK_POLL_SECONDS = float(os.getenv("WEBHOOK_POLL_SECONDS", "2"))
+WEBHOOK_RETENTION_DAYS = int(os.getenv("WEBHOOK_RETENTION_DAYS", "7"))
+WEBHOOK_PURGE_CRON = os.getenv("WEBHOOK_PURGE_CRON", "40 3 * * *")
+# On top of the POSTs: reading the batch and recording the results
+WEBHOOK_LEASE_MARGIN_SECONDS = 60.0
+
+WEBHOOKS = WebhookDeliverer(
+    concurrency=int(os.getenv("WEBHOOK_CONCURRENCY", "8")),
+    per_endpoint=int(os.getenv("WEBHOOK_PER_ENDPOINT", "2")),
+    timeout=float(os.getenv("WEBHOOK_TIMEOUT_SECONDS", "5")),
+    batch=int(os.getenv("WEBHOOK_BATCH", "100")),
+    max_attempts=int(os.getenv("WEBHOOK_MAX_ATTEMPTS", "8")),
+)
+
+
+def _job_purge_webhook_outbox() -> None:
+    deleted = fleet_db.purge_webhook_outbox(WEBHOOK_RETENTION_DAYS)
+    if deleted:
+        print(f"purge_webhook_outbox: deleted {deleted} delivered row(s)")
+
+
+if WEBHOOKS_ENABLED:
+    # A round that outlived its lease would be taken over by another worker,
+    # resending the rows still in flight
+    SCHEDULER.add_interval("deliver_webhooks", WEBHOOKS.deliver_due, WEBHOOK_POLL_SECONDS,
+                           jitter=0.5,
+                           lease_seconds=WEBHOOKS.round_limit_seconds() + WEBHOOK_LEASE_MARGIN_SECONDS)
+SCHEDULER.add_cron("purge_webhook_outbox", _job_purge_webhook_outbox, WEBHOOK_PURGE_CRON,
+                   jitter=300)
+
+
+def webhook_stats() -> Dict[str, Any]:
+    return {
+        "enabled": WEBHOOKS_ENABLED,
+        "poll_seconds": WEBHOOK_POLL_SECONDS,
+        "outbox": fleet_db.webhook_outbox_counts(),
+        **WEBHOOKS.describe(),
+    }
+
+
+def scheduler_metrics_lines() -> List[str]:
+    jobs = SCHEDULER.describe()
+    lines: List[str] = []
+    for name, field, kind, help_text in (
+        ("fleet_job_runs_total", "runs", "counter", "Scheduled job runs in this process."),
+        ("fleet_job_failures_total", "failures", "counter", "Scheduled job runs that raised."),
+        ("fleet_job_skipped_total", "skipped", "counter",
+         "Due runs skipped because another worker held or had just run the job."),
+        ("fleet_job_running", "running", "gauge", "1 while the job runs in this process."),
+    ):
+        lines += _prom_header(name, kind, help_text)
+        for job in jobs:
+            lines.append(_prom_sample(name, int(job[field]), {"job": job["name"]}))
+
+    lines += _prom_header("fleet_job_duration_seconds", "summary",
+                          "Scheduled job run time in this process.")
+    for job in jobs:
+        lines.append(_prom_sample("fleet_job_duration_seconds_sum",
+                                  round(job["total_ms"] / 1000, 6), {"job": job["name"]}))
+        lines.append(_prom_sample("fleet_job_duration_seconds_count",
+                                  job["runs"], {"job": job["name"]}))
+    lines += _prom_header("fleet_job_max_duration_seconds", "gauge",
+                          "Longest scheduled job run in this process.")
+    for job in jobs:
+        lines.append(_prom_sample("fleet_job_max_duration_seconds",
+                                  round(job["max_ms"] / 1000, 6), {"job": job["name"]}))
+    return lines
+
+
+def response_cache_stats() -> Dict[str, Any]:
+    hits = _RESPONSE_CACHE_STATS["hits"]
+    misses = _RESPONSE_CACHE_STATS["misses"]
+    total = hits + misses
+    return {
+        "enabled": RESPONSE_CACHE_ENABLED,
+        "ttl_seconds": RESPONSE_CACHE_TTL_SECONDS,
+        "entries": len(_RESPONSE_CACHE),
+        "data_version": fleet_db.data_version(),
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / total, 4) if total else 0.0,
+    }
+
+
+# ---------------------------
+# DB query instrumentation (opt-in)
+# DB_QUERY_STATS_ENABLED=1 times every fleet_db statement;
+# DB_SLOW_QUERY_MS=<ms> also keeps EXPLAIN QUERY PLAN for slower ones.
+# ---------------------------
+DB_QUERY_STATS_ENABLED = env_flag("DB_QUERY_STATS_ENABLED", default=False)
+DB_SLOW_QUERY_MS = float(os.getenv("DB_SLOW_QUERY_MS", "0") or 0)
+fleet_db.configure_query_stats(
+    DB_QUERY_STATS_ENABLED, slow_query_ms=DB_SLOW_QUERY_MS or None)
+
+# DB_SINGLE_WRITER=1 sends fleet_db writes through one writer thread per
+# worker that group-commits them (see fleet_db SINGLE WRITER). The delay is
+# how long a write may wait for others to share its commit; 0 batches only
+# what queued up during the previous commit.
+DB_SINGLE_WRITER = env_flag("DB_SINGLE_WRITER", default=False)
+DB_WRITER_MAX_DELAY_MS = float(os.getenv("DB_WRITER_MAX_DELAY_MS", str(fleet_db.WRITER_MAX_DELAY_MS)))
+DB_WRITER_MAX_BATCH = int(os.getenv("DB_WRITER_MAX_BATCH", str(fleet_db.WRITER_MAX_BATCH)))
+
+
+def db_metrics_lines() -> List[str]:
+    stats = fleet_db.query_stats()
+    statements = stats["statements"]
+    lines = _prom_header("fleet_db_connections_opened_total", "counter",
+                         "SQLite connections opened by fleet_db.")
+    lines.append(_prom_sample(
+        "fleet_db_connections_opened_total", stats["connections_opened"]))
+    lines += _prom_header("fleet_db_locked_errors_total", "counter",
+                          "'database is locked' errors, including ones the API swallowed.")
+    lines.append(_prom_sample("fleet_db_locked_errors_total", stats["locked_errors"]))
+    # Counters are per worker process; the pid tells scrapes of different workers apart
+    lines += _prom_header("fleet_worker_info", "gauge", "Worker process serving this scrape.")
+    lines.append(_prom_sample("fleet_worker_info", 1, {"pid": os.getpid()}))
+
+    lines += _prom_header("fleet_db_statement_seconds", "summary",
+                          "fleet_db statement latency, execute through last fetch.")
+    for st in statements:
+        for quantile, field in (("0.5", "p50_ms"), ("0.95", "p95_ms"), ("0.99", "p99_ms")):
+            lines.append(_prom_sample(
+                "fleet_db_statement_seconds", st[field] / 1000,
+                {"statement": st["sql"], "quantile": quantile}))
+        lines.append(_prom_sample("fleet_db_statement_seconds_sum",
+                                  st["total_ms"] / 1000, {"statement": st["sql"]}))
+        lines.append(_prom_sample("fleet_db_statement_seconds_count",
+                                  st["count"], {"statement": st["sql"]}))
+
+    for name, field, help_text in (
+        ("fleet_db_statement_rows_total", "rows", "Rows returned by fleet_db statements."),
+        ("fleet_db_statement_errors_total", "errors", "fleet_db statements that raised."),
+    ):
+        lines += _prom_header(name, "counter", help_text)
+        for st in statements:
+            lines.append(_prom_sample(name, st[field], {"statement": st["sql"]}))
+
+    writer = fleet_db.writer_stats()
+    if writer is not None:
+        for name, field, kind, help_text in (
+            ("fleet_db_writer_calls_total", "calls", "counter", "Writes run by the single writer."),
+            ("fleet_db_writer_errors_total", "errors", "counter", "Writer calls that raised."),
+            ("fleet_db_writer_commits_total", "groups", "counter", "Group commits."),
+            ("fleet_db_writer_queued", "queued", "gauge", "Writes waiting for the writer."),
+        ):
+            lines += _prom_header(name, kind, help_text)
+            lines.append(_prom_sample(name, writer[field]))
+    return lines
+
+
 def safe_basename(filename: str) -> str:
     base = os.path.basename(filename or "")
     return base if base else "uploaded_file"
@@ -417,6 +1519,7 @@ def api_whoami(request: Request):
             "scope": rec.get("scope"),
             "is_admin": rec.get("is_admin"),
             "is_active": rec.get("is_active"),
+            "feature_scopes": sorted(rec.get("feature_scopes", ())),
             "created_at": rec.get("created_at"),
             "last_used_at": rec.get("last_used_at"),
         }
@@ -425,12 +1528,57 @@ def api_whoami(request: Request):
 
 @app.get("/v1/fleet/health")
 def api_fleet_health():
-    return api_response(data=fleet_health_summary())
+    return api_response(data=cached_data("fleet_health", (), fleet_health_summary))
+
+
+@app.get("/v1/fleet/health/explain")
+def api_fleet_health_explain(asset_ids: Optional[List[int]] = Query(default=None),
+                             top_n: int = 5, limit: int = 10):
+    # Explicit asset_ids come back in request order; otherwise the riskiest `limit`
+    top_n = max(0, min(int(top_n), 50))
+    if asset_ids:
+        if len(asset_ids) > 200:
+            raise HTTPException(status_code=400, detail="At most 200 asset_ids")
+        explained = explain_fleet_health(asset_ids, top_n=top_n)
+        data = [explained[i] for i in dict.fromkeys(asset_ids) if i in explained]
+    else:
+        limit = max(1, min(int(limit), 200))
+        data = sorted(explain_fleet_health(top_n=top_n).values(),
+                      key=lambda h: (h["score"], -h["overdue_tasks"], -h["warnings"]))[:limit]
+    return api_response(data=data)
 
 
 @app.get("/v1/fleet/ai_brief")
-def api_fleet_brief(horizon_hours: int = 50):
-    return api_response(data=fleet_ai_brief(horizon_hours=horizon_hours))
+def api_fleet_brief(request: Request, horizon_hours: int = 50):
+    if horizon_hours not in BRIEF_HORIZONS:
+        # Unscheduled: no snapshot row; built once per fleet change per worker.
+        # The fingerprint is read first, so the body is never older than its tag.
+        fingerprint = fleet_db.brief_fingerprint()
+        etag = 'W/"{}-{}-brief-{}-{}"'.format(app.version, ETAG_BUILD, horizon_hours, fingerprint)
+        if _etag_matches(request.headers.get("If-None-Match", ""), etag):
+            raise HTTPException(status_code=304, headers={"ETag": etag})
+        data = cached_data("fleet_brief", (horizon_hours, fleet_db.today_iso()),
+                           lambda: fleet_db.fleet_ai_brief(horizon_hours),
+                           scopes=tuple(fleet_db.BRIEF_FINGERPRINT_SCOPES))
+        request.state.etag = etag
+        return api_response(data=data)
+
+    snapshot = fleet_db.get_brief_snapshot(horizon_hours)
+    if snapshot is None:
+        # Cold start, before brief_refresh has run
+        snapshot = fleet_db.refresh_brief_snapshot(horizon_hours)
+
+    # The body is the snapshot, not live data: tag it with what it was built from
+    etag = 'W/"{}-{}-brief-{}-{}-{}"'.format(
+        app.version, ETAG_BUILD, horizon_hours, snapshot["fingerprint"],
+        snapshot["generated_at"].replace(" ", "T"))
+    if _etag_matches(request.headers.get("If-None-Match", ""), etag):
+        raise HTTPException(status_code=304, headers={"ETag": etag})
+    request.state.etag = etag
+    return api_response(data=snapshot["data"], meta={
+        "generated_at": snapshot["generated_at"],
+        "build_ms": round(snapshot["build_ms"], 2),
+    })
 
 
 # ---------------------------
@@ -449,13 +1597,32 @@ def api_fleet_maintenance_forecast(horizon_hours: int = 50, limit: int = 10):
     return api_response(data=fleet_maintenance_forecast(horizon_hours=horizon_hours, limit=limit))
 
 
+@app.get("/v1/fleet/maintenance/due")
+def api_fleet_maintenance_due(through: Optional[date] = None, since: Optional[date] = None,
+                              limit: int = 50, offset: int = 0):
+    # Day-based tasks only; usage-based ones have no date to queue on
+    due = list_due_by_date(
+        through=through.isoformat() if through else None,
+        since=since.isoformat() if since else None,
+    )
+    page = paginate(due, limit=limit, offset=offset)
+    return api_response(data=page["items"], meta=page["page"])
+
+
+@app.get("/v1/fleet/maintenance/upcoming")
+def api_fleet_maintenance_upcoming(limit: int = 50, trigger: str = "usage"):
+    if trigger not in ("usage", fleet_db.DAY_UNIT):
+        raise HTTPException(status_code=400, detail="trigger must be 'usage' or 'days'")
+    limit = max(1, min(int(limit), 200))
+    return api_response(data=fleet_db.upcoming_due(limit=limit, trigger=trigger),
+                        meta={"limit": limit, "trigger": trigger})
+
+
 # ---------------------------
 # Assets
 # ---------------------------
 @app.get("/v1/assets")
 def api_list_assets(include_archived: bool = False, limit: int = 50, offset: int = 0):
-    # Feature scope optional gate (only works for admin until you store feature scopes in DB)
-    # require_feature_scope(request, "assets:read")
     assets = list_assets(active_only=not include_archived)
     page = paginate(assets, limit=limit, offset=offset)
     return api_response(data=page["items"], meta=page["page"])
@@ -519,6 +1686,14 @@ def api_upsert_task(asset_id: int, payload: TaskUpsert):
 
     unit = asset.get("usage_unit") or fleet_db.default_usage_unit(
         asset.get("type", "unknown"))
+    if payload.trigger_unit == fleet_db.DAY_UNIT:
+        unit = fleet_db.DAY_UNIT
+    elif payload.trigger_unit not in (None, unit):
+        raise HTTPException(
+            status_code=400, detail=f"trigger_unit must be '{unit}' or '{fleet_db.DAY_UNIT}'")
+    if unit != fleet_db.DAY_UNIT and payload.last_done_value is None:
+        raise HTTPException(
+            status_code=422, detail="last_done_value is required for usage-based tasks")
 
     upsert_task(
         asset_id,
@@ -526,7 +1701,8 @@ def api_upsert_task(asset_id: int, payload: TaskUpsert):
         payload.interval_value,
         payload.last_done_value,
         payload.category,
-        unit
+        unit,
+        last_done_date=payload.last_done_date.isoformat() if payload.last_done_date else None,
     )
 
     return api_response(
@@ -718,14 +1894,12 @@ def api_download_document(doc_id: int):
 # Admin
 # ---------------------------
 @app.get("/v1/admin/api-keys")
-def api_admin_list_keys(request: Request, include_inactive: bool = False):
-    require_admin_scope(request, "admin")
+def api_admin_list_keys(include_inactive: bool = False):
     return api_response(data=list_api_keys(include_inactive=include_inactive))
 
 
 @app.post("/v1/admin/api-keys")
-def api_admin_create_key(request: Request, payload: AdminCreateKey):
-    require_admin_scope(request, "admin")
+def api_admin_create_key(payload: AdminCreateKey):
     scope = payload.scope.strip().lower()
     if scope not in VALID_SCOPES:
         raise HTTPException(status_code=400, detail="Invalid scope")
@@ -753,8 +1927,7 @@ def api_admin_create_key(request: Request, payload: AdminCreateKey):
 
 
 @app.post("/v1/admin/api-keys/{key_id}/revoke")
-def api_admin_revoke_key(request: Request, key_id: int):
-    require_admin_scope(request, "admin")
+def api_admin_revoke_key(key_id: int):
     ok = revoke_api_key(key_id)
     if not ok:
         raise HTTPException(status_code=404, detail="API key not found")
@@ -762,8 +1935,7 @@ def api_admin_revoke_key(request: Request, key_id: int):
 
 
 @app.post("/v1/admin/api-keys/{key_id}/scope")
-def api_admin_update_scope(request: Request, key_id: int, payload: AdminUpdateScope):
-    require_admin_scope(request, "admin")
+def api_admin_update_scope(key_id: int, payload: AdminUpdateScope):
     scope = payload.scope.strip().lower()
     if scope not in {"read", "write"}:
         raise HTTPException(
@@ -778,8 +1950,7 @@ def api_admin_update_scope(request: Request, key_id: int, payload: AdminUpdateSc
 
 
 @app.post("/v1/admin/api-keys/{key_id}/admin")
-def api_admin_update_admin(request: Request, key_id: int, payload: AdminUpdateAdmin):
-    require_admin_scope(request, "admin")
+def api_admin_update_admin(key_id: int, payload: AdminUpdateAdmin):
     ok, reason = set_api_key_admin(key_id, payload.is_admin)
     if not ok and reason == "not_found":
         raise HTTPException(status_code=404, detail="API key not found")
@@ -789,24 +1960,177 @@ def api_admin_update_admin(request: Request, key_id: int, payload: AdminUpdateAd
     return api_response(data={"status": "updated", "id": key_id, "is_admin": payload.is_admin})
 
 
+@app.get("/v1/admin/api-keys/{key_id}/feature-scopes")
+def api_admin_list_feature_scopes(key_id: int):
+    scopes = list_feature_scopes(key_id)
+    if scopes is None:
+        raise HTTPException(status_code=404, detail="API key not found")
+    return api_response(data={"id": key_id, "feature_scopes": scopes})
+
+
+@app.post("/v1/admin/api-keys/{key_id}/feature-scopes")
+def api_admin_update_feature_scopes(key_id: int, payload: AdminUpdateFeatureScopes):
+    grant = [f.strip().lower() for f in payload.grant]
+    revoke = [f.strip().lower() for f in payload.revoke]
+    ok, reason = update_feature_scopes(key_id, grant, revoke)
+    if not ok and reason == "invalid":
+        raise HTTPException(status_code=400, detail="Invalid feature scope")
+    if not ok and reason == "not_found":
+        raise HTTPException(status_code=404, detail="API key not found")
+    if not ok and reason == "conflict":
+        raise HTTPException(
+            status_code=409, detail="Admin keys have every feature scope")
+    return api_response(data={"id": key_id, "feature_scopes": list_feature_scopes(key_id)})
+
+
 @app.get("/v1/admin/audit-logs")
-def api_admin_audit_logs(request: Request, limit: int = 50, offset: int = 0):
-    require_admin_scope(request, "admin")
+def api_admin_audit_logs(limit: int = 50, offset: int = 0):
     out = list_audit_logs(limit=limit, offset=offset)
     return api_response(data=out["items"], meta=out["page"])
 
 
 @app.get("/v1/admin/diagnostics")
-def api_admin_diagnostics(request: Request):
-    require_admin_scope(request, "admin")
+def api_admin_diagnostics():
     return api_response(
         data={
             "doc_encryption_enabled": DOC_ENCRYPTION_ENABLED,
             "docs_dir": DOCS_DIR,
+            "rate_limits": rate_limit_stats(),
+            "response_cache": response_cache_stats(),
+            "brief_snapshots": brief_stats(),
+            "event_stream": fleet_db.event_stats(),
+            "webhooks": webhook_stats(),
+            "db_writer": fleet_db.writer_stats(),
         }
     )
 
 
+@app.get("/v1/admin/db-stats")
+def api_admin_db_stats():
+    return api_response(data=fleet_db.query_stats())
+
+
+@app.get("/v1/admin/metrics")
+async def api_admin_metrics():
+    # async: renders on the event loop, where request metrics are updated.
+    # Rendered text is reused for METRICS_CACHE_SECONDS so tight scrape
+    # loops cost a dict lookup, not a re-render.
+    now = time.monotonic()
+    if now - _METRICS_RENDERED["at"] >= METRICS_CACHE_SECONDS:
+        lines = (http_metrics_lines() + db_metrics_lines() + scheduler_metrics_lines()
+                 + stream_metrics_lines())
+        _METRICS_RENDERED["body"] = "\n".join(lines) + "\n"
+        _METRICS_RENDERED["at"] = now
+    return PlainTextResponse(_METRICS_RENDERED["body"], media_type=PROMETHEUS_CONTENT_TYPE)
+
+
+@app.post("/v1/admin/profile")
+async def api_admin_profile(payload: AdminProfileRequest):
+    global _PROFILE_SESSION
+    if payload.mode not in PROFILE_MODES:
+        raise HTTPException(status_code=400, detail="mode must be 'sample' or 'cprofile'")
+    fmt = payload.format or ("collapsed" if payload.mode == "sample" else "pstats")
+    if fmt not in PROFILE_MODES[payload.mode]:
+        raise HTTPException(
+            status_code=400, detail=f"format for {payload.mode} must be one of {sorted(PROFILE_MODES[payload.mode])}")
+    if payload.route and payload.route not in {path for _, path in _ROUTE_POLICY_INDEX}:
+        raise HTTPException(status_code=400, detail="Unknown route template")
+    if _PROFILE_SESSION is not None:
+        raise HTTPException(status_code=409, detail="A profile capture is already running")
+
+    # async: waits on the event loop instead of holding a threadpool thread
+    session = ProfileSession(payload.mode, payload.route, payload.requests)
+    _PROFILE_SESSION = session
+    session.start()
+    try:
+        deadline = time.monotonic() + payload.seconds
+        while not session.done.is_set() and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+    finally:
+        _PROFILE_SESSION = None
+        session.stop()
+
+    headers = {
+        "X-Profile-Requests": str(session.completed),
+        "X-Profile-Samples": str(session.sample_count),
+    }
+    if fmt == "collapsed":
+        return PlainTextResponse(session.collapsed(), headers=headers)
+    if fmt == "text":
+        return PlainTextResponse(session.pstats_text(), headers=headers)
+    headers["Content-Disposition"] = 'attachment; filename="profile.pstats"'
+    return Response(content=session.pstats_dump(), media_type="application/octet-stream",
+                    headers=headers)
+
+
+@app.get("/v1/admin/jobs")
+def api_admin_jobs():
+    # Local view (this worker) plus the shared lease row every worker sees
+    leases = fleet_db.list_job_leases()
+    jobs = []
+    for job in SCHEDULER.describe():
+        lease = leases.get(job["name"])
+        job["lease"] = lease and {
+            "owner": lease["owner"],
+            "held": bool(lease["owner"]) and lease["lease_until"] > time.time(),
+            "next_run_at": format_ts(lease["next_run_at"]),
+            "last_finished_at": format_ts(lease["last_finished_at"]),
+            "last_status": lease["last_status"],
+        }
+        jobs.append(job)
+    return api_response(
+        data=jobs,
+        meta={"owner": SCHEDULER.owner, "scheduler_running": SCHEDULER.is_running()},
+    )
+
+
+@app.post("/v1/admin/jobs/{name}/run")
+def api_admin_run_job(name: str):
+    if name not in SCHEDULER.jobs:
+        raise HTTPException(status_code=404, detail="Job not found")
+    ok, reason = SCHEDULER.trigger(name)
+    if not ok:
+        raise HTTPException(status_code=409, detail=reason)
+    return api_response(data={"name": name, "started": True})
+
+
+@app.get("/v1/admin/webhooks")
+def api_admin_list_webhooks():
+    return api_response(data=fleet_db.list_webhook_endpoints(), meta=webhook_stats())
+
+
+@app.post("/v1/admin/webhooks")
+def api_admin_create_webhook(payload: WebhookCreate):
+    parts = urlsplit(payload.url)
+    if parts.scheme not in ("http", "https") or not parts.hostname:
+        raise HTTPException(status_code=400, detail="url must be an absolute http(s) URL")
+    endpoint_id = fleet_db.create_webhook_endpoint(payload.url, payload.secret)
+    return api_response(data={"status": "created", "id": endpoint_id, "url": payload.url})
+
+
+@app.post("/v1/admin/webhooks/{endpoint_id}/active")
+def api_admin_set_webhook_active(endpoint_id: int, payload: WebhookActive):
+    if not fleet_db.set_webhook_endpoint_active(endpoint_id, payload.is_active):
+        raise HTTPException(status_code=404, detail="Webhook endpoint not found")
+    return api_response(data={"status": "updated", "id": endpoint_id, "is_active": payload.is_active})
+
+
+@app.get("/v1/admin/webhooks/outbox")
+def api_admin_webhook_outbox(status: Optional[str] = None, limit: int = 50, offset: int = 0):
+    if status is not None and status not in fleet_db.OUTBOX_STATUSES:
+        raise HTTPException(
+            status_code=400, detail=f"status must be one of {list(fleet_db.OUTBOX_STATUSES)}")
+    out = fleet_db.list_webhook_outbox(status=status, limit=limit, offset=offset)
+    return api_response(data=out["items"], meta=out["page"])
+
+
+@app.post("/v1/admin/webhooks/outbox/{delivery_id}/retry")
+def api_admin_retry_webhook(delivery_id: int):
+    if not fleet_db.retry_webhook_delivery(delivery_id):
+        raise HTTPException(status_code=404, detail="Dead-lettered delivery for an active endpoint not found")
+    return api_response(data={"status": "requeued", "id": delivery_id})
+
+
 # ---------------------------
 # Alerts
 # ---------------------------
@@ -826,6 +2150,12 @@ def api_generate_alerts(asset_id: int):
     return api_response(data={"status": "generated", "asset_id": asset_id})
 
 
+@app.post("/v1/alerts/generate-due")
+def api_generate_due_alerts():
+    created = generate_due_date_alerts()
+    return api_response(data={"status": "generated", "created": created})
+
+
 @app.post("/v1/alerts/{alert_id}/resolve")
 def api_resolve_alert(alert_id: int):
     ok = resolve_alert(alert_id)
@@ -834,9 +2164,218 @@ def api_resolve_alert(alert_id: int):
     return api_response(data={"status": "resolved", "alert_id": alert_id})
 
 
+# ---------------------------
+# Batch (POST /v1/batch)
+# Runs an ordered list of operations through the regular handlers in one
+# request: the key is verified once (by api_key_auth), each operation is
+# checked against its route's policy, and all of them share one
+# fleet_db.transaction(). Each operation gets a savepoint, so a failure
+# undoes only that operation; with atomic=true it rolls back the whole batch
+# and the rest are not run. One audit entry is written per operation.
+# ---------------------------
+# (method, route path) -> (handler, body model or None). Only routes listed
+# here can be batched; path params are integers.
+BATCH_OPERATIONS: Dict[Tuple[str, str], Tuple[Any, Optional[type]]] = {
+    ("GET", "/v1/assets/{asset_id}"): (api_get_asset, None),
+    ("POST", "/v1/assets/{asset_id}/archive"): (api_archive_asset, None),
+    ("POST", "/v1/assets/{asset_id}/restore"): (api_restore_asset, None),
+    ("GET", "/v1/assets/{asset_id}/maintenance"): (api_list_maintenance, None),
+    ("POST", "/v1/assets/{asset_id}/maintenance"): (api_upsert_task, TaskUpsert),
+    ("POST", "/v1/assets/{asset_id}/maintenance/complete"): (api_complete_task, TaskComplete),
+    ("POST", "/v1/assets/{asset_id}/trips"): (api_log_trip, TripCreate),
+    ("POST", "/v1/assets/{asset_id}/alerts/generate"): (api_generate_alerts, None),
+    ("POST", "/v1/alerts/{alert_id}/resolve"): (api_resolve_alert, None),
+}
+
+_BATCH_ROUTES = [
+    (method, re.compile("^" + re.sub(r"\{(\w+)\}", r"(?P<\1>[0-9]+)", path) + "$"), path)
+    for method, path in BATCH_OPERATIONS
+]
+
+
+def _resolve_batch_operation(op: BatchOperation) -> Tuple[Tuple[str, str], Dict[str, Any]]:
+    """(method, route path) and handler kwargs for op; HTTPException if unusable."""
+    method = op.method.upper()
+    path = op.path.split("?", 1)[0].rstrip("/") or "/"
+    for route_method, pattern, route_path in _BATCH_ROUTES:
+        match = pattern.match(path)
+        if match and route_method == method:
+            break
+    else:
+        raise HTTPException(status_code=404, detail=f"{method} {path} cannot be batched")
+    kwargs: Dict[str, Any] = {k: int(v) for k, v in match.groupdict().items()}
+    model = BATCH_OPERATIONS[(method, route_path)][1]
+    if model is not None:
+        try:
+            kwargs["payload"] = model(**(op.body or {}))
+        except ValidationError:
+            raise HTTPException(status_code=422, detail="Invalid request")
+    return (method, route_path), kwargs
+
+
+def _run_batch_operation(request: Request, op: BatchOperation) -> Dict[str, Any]:
+    try:
+        key, kwargs = _resolve_batch_operation(op)
+        check_route_policy(request, key)
+        response = BATCH_OPERATIONS[key][0](**kwargs)
+        return {"status": response.status_code, "data": json.loads(response.body)["data"],
+                "error": None}
+    except HTTPException as exc:
+        status, message = exc.status_code, str(exc.detail)
+    except Exception as exc:
+        print("batch operation failed:", repr(exc))
+        status, message = 500, "Internal server error"
+    return {"status": status, "data": None,
+            "error": {"code": ERROR_CODES.get(status, "ERROR"), "message": message}}
+
+
+@app.post("/v1/batch")
+def api_batch(request: Request, payload: BatchRequest):
+    rec = _verified_record(request)
+    results: List[Dict[str, Any]] = []
+    failed = False
+
+    with fleet_db.transaction() as tx:
+        for index, op in enumerate(payload.operations):
+            item = {"index": index, "method": op.method.upper(), "path": op.path}
+            if failed and payload.atomic:
+                item.update(status=424, data=None, error={
+                    "code": "NOT_EXECUTED", "message": "Skipped after an earlier failure"})
+                results.append(item)
+                continue
+            with tx.savepoint() as sp:
+                item.update(_run_batch_operation(request, op))
+                if item["status"] >= 400:
+                    sp.rollback_only = failed = True
+            results.append(item)
+
+        committed = not (failed and payload.atomic)
+        audit = [{
+            "api_key_id": rec.get("id"), "scope": rec.get("scope"),
+            "method": r["method"], "path": r["path"], "status_code": r["status"],
+            "success": committed and r["status"] < 400,
+        } for r in results if r["status"] != 424]
+        if committed:
+            fleet_db.write_audit_logs(audit)
+        else:
+            tx.rollback_only = True
+    if not committed:
+        fleet_db.write_audit_logs(audit)
+
+    applied = sum(1 for r in results if r["status"] < 400) if committed else 0
+    return api_response(data={
+        "atomic": payload.atomic,
+        "committed": committed,
+        "applied": applied,
+        "results": results,
+    })
+
+
+# ---------------------------
+# Event stream (SSE)
+# Pushes fleet_db change events so screens refetch on change instead of
+# polling on a timer. Each connection is a fleet_db subscription woken via
+# the event loop, so an idle one holds no thread and only sends a comment
+# every STREAM_HEARTBEAT_SECONDS to keep proxies from closing it.
+# Resume with Last-Event-ID (browsers send it on reconnect). Ids are per
+# worker: a reconnect to another worker, past the replay window, or after
+# falling behind gets a "reset" event, meaning refetch, then keep reading.
+# ---------------------------
+STREAM_HEARTBEAT_SECONDS = float(os.getenv("STREAM_HEARTBEAT_SECONDS", "15"))
+STREAM_RETRY_MS = 3000
+
+
+def stream_metrics_lines() -> List[str]:
+    stats = fleet_db.event_stats()
+    lines: List[str] = []
+    for name, field, kind, help_text in (
+        ("fleet_stream_subscribers", "subscribers", "gauge", "Open /v1/stream connections."),
+        ("fleet_stream_events_published_total", "published", "counter",
+         "Change events published in this process."),
+        ("fleet_stream_overflows_total", "overflows", "counter",
+         "Times a subscriber fell a full buffer behind and was sent a reset."),
+    ):
+        lines += _prom_header(name, kind, help_text)
+        lines.append(_prom_sample(name, stats[field]))
+    return lines
+
+
+def _sse(event_type: str, data: Dict[str, Any], event_id: Optional[str] = None) -> str:
+    head = f"id: {event_id}\n" if event_id else ""
+    return f"{head}event: {event_type}\ndata: {json.dumps(data, separators=(',', ':'))}\n\n"
+
+
+@app.get("/v1/stream")
+async def api_stream(request: Request, types: Optional[str] = None,
+                     asset_id: Optional[int] = None, last_event_id: Optional[str] = None):
+    wanted = [t.strip() for t in types.split(",") if t.strip()] if types else None
+    if wanted and not set(wanted) <= set(fleet_db.EVENT_TYPES):
+        raise HTTPException(
+            status_code=400, detail=f"types must be among {list(fleet_db.EVENT_TYPES)}")
+
+    loop = asyncio.get_running_loop()
+    wake = asyncio.Event()
+    resume_from = request.headers.get("last-event-id") or last_event_id
+    # Publishers run in threadpool threads; hop onto the loop to wake us
+    sub, resumed = fleet_db.subscribe_events(
+        wanted, asset_id, lambda: loop.call_soon_threadsafe(wake.set), resume_from)
+
+    async def events():
+        try:
+            yield f"retry: {STREAM_RETRY_MS}\n\n"
+            if resume_from and not resumed:
+                yield _sse("reset", {"reason": "resume_unavailable"})
+            while True:
+                batch, overflowed = sub.drain()
+                # One chunk per wake-up: every send crosses the middleware stack
+                chunk = "".join(
+                    [_sse("reset", {"reason": "overflow"})] * overflowed
+                    + [_sse(e["type"], {**e["data"], "at": e["at"]}, e["id"]) for e in batch])
+                if chunk:
+                    yield chunk
+                    continue
+                try:
+                    await asyncio.wait_for(wake.wait(), STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                wake.clear()
+        finally:
+            fleet_db.unsubscribe_events(sub)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no",
+    })
+
+
+# ---------------------------
+# Delta sync (offline clients)
+# Keep next_since from each response and pass it back as since; repeat while
+# has_more. since=0 downloads everything. On reset, drop local data and
+# start again from 0.
+# ---------------------------
+@app.get("/v1/sync")
+def api_sync(request: Request, since: int = 0, limit: int = fleet_db.SYNC_DEFAULT_LIMIT):
+    if since < 0:
+        raise HTTPException(status_code=400, detail="since must be >= 0")
+    # Only the tables this key could read through their own routes
+    tables = None
+    if FEATURE_SCOPES_ENFORCED:
+        tables = fleet_db.sync_tables_for(_verified_record(request))
+    out = fleet_db.sync_changes(since=since, limit=limit, tables=tables)
+    meta = {k: out.pop(k) for k in ("since", "next_since", "latest_seq", "has_more", "reset")}
+    return api_response(data=out, meta=meta)
+
+
 # ---------------------------
 # Dashboard
 # ---------------------------
 @app.get("/v1/fleet/dashboard")
 def api_fleet_dashboard(limit_assets: int = 5, limit_tasks: int = 10):
-    return api_response(data=fleet_dashboard(limit_assets=limit_assets, limit_tasks=limit_tasks))
+    data = cached_data(
+        "fleet_dashboard",
+        (limit_assets, limit_tasks),
+        lambda: fleet_dashboard(
+            limit_assets=limit_assets, limit_tasks=limit_tasks),
+    )
+    return api_response(data=data)
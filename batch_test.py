@@ -0,0 +1,205 @@
+"""
+Grouped writes: POST /v1/batch, the fleet_db.transaction() it runs in, and
+the single-writer group commit.
+
+    python batch_test.py        (or: python -m pytest batch_test.py)
+"""
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from concurrent.futures import Future
+from unittest import mock
+
+os.environ.setdefault("SCHEDULER_ENABLED", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import api  # noqa: E402
+import fleet_db  # noqa: E402
+
+
+class BatchTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._old_db = fleet_db.DB_FILE
+        fleet_db.DB_FILE = os.path.join(self._tmp.name, "batch.db")
+        self.client = TestClient(api.app)
+        self.client.__enter__()
+        self.key = fleet_db.create_api_key("batch", scope="write")
+        self.asset_id = fleet_db.create_asset("Batch Check", "yacht", 0)
+        fleet_db.upsert_task(self.asset_id, "Oil", 10, 0, "Engine", "engine_hours")
+        fleet_db.upsert_task(self.asset_id, "Impeller", 10, 0, "Engine", "engine_hours")
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+        fleet_db.DB_FILE = self._old_db
+        self._tmp.cleanup()
+
+    def batch(self, operations, atomic=False, key=None):
+        resp = self.client.post("/v1/batch", json={"operations": operations, "atomic": atomic},
+                                headers={"X-API-Key": key or self.key})
+        self.assertEqual(resp.status_code, 200, resp.text)
+        return resp.json()["data"]
+
+    def technician_visit(self):
+        base = f"/v1/assets/{self.asset_id}"
+        return [
+            {"path": base + "/trips", "body": {"usage_added": 25}},
+            {"path": base + "/alerts/generate"},
+            {"path": base + "/maintenance/complete", "body": {"task": "Oil"}},
+            {"method": "GET", "path": base},
+        ]
+
+    def test_operations_share_one_transaction(self):
+        version = fleet_db.data_version()
+        out = self.batch(self.technician_visit())
+        self.assertTrue(out["committed"])
+        self.assertEqual([r["status"] for r in out["results"]], [200] * 4)
+        # Later operations see earlier writes
+        self.assertEqual(out["results"][3]["data"]["usage_value"], 25.0)
+        self.assertEqual({a["task"] for a in fleet_db.list_alerts(self.asset_id)}, {"Oil", "Impeller"})
+        self.assertGreater(fleet_db.data_version(), version)
+
+        audit = fleet_db.list_audit_logs(limit=10)["items"]
+        paths = [row["path"] for row in audit]
+        self.assertEqual(paths.count("/v1/batch"), 1)
+        self.assertIn(f"/v1/assets/{self.asset_id}/maintenance/complete", paths)
+
+    def test_failed_operation_rolls_back_alone(self):
+        ops = self.technician_visit()
+        ops[2]["body"] = {"task": "No Such Task"}
+        out = self.batch(ops)
+        self.assertTrue(out["committed"])
+        self.assertEqual([r["status"] for r in out["results"]], [200, 200, 404, 200])
+        self.assertEqual(out["results"][2]["error"]["code"], "NOT_FOUND")
+        self.assertEqual(float(fleet_db.get_asset(self.asset_id)["usage_value"]), 25.0)
+
+    def test_atomic_failure_rolls_back_everything(self):
+        version = fleet_db.data_version()
+        ops = self.technician_visit()
+        ops[2]["body"] = {}
+        out = self.batch(ops, atomic=True)
+        self.assertFalse(out["committed"])
+        self.assertEqual([r["status"] for r in out["results"]], [200, 200, 422, 424])
+        self.assertEqual(float(fleet_db.get_asset(self.asset_id)["usage_value"]), 0.0)
+        self.assertEqual(fleet_db.list_alerts(self.asset_id), [])
+        # Post-commit effects of rolled-back work never ran
+        self.assertEqual(fleet_db.data_version(), version)
+
+    def test_each_operation_checks_its_own_scope(self):
+        reader = fleet_db.create_api_key("reader", scope="read")
+        out = self.batch(self.technician_visit(), key=reader)
+        self.assertEqual([r["status"] for r in out["results"]], [403, 403, 403, 200])
+
+    def test_unknown_operations_are_rejected(self):
+        out = self.batch([{"method": "DELETE", "path": f"/v1/assets/{self.asset_id}"},
+                          {"path": "/v1/admin/api-keys", "body": {}}])
+        self.assertEqual([r["status"] for r in out["results"]], [404, 404])
+
+    def test_swallowed_lock_errors_are_counted(self):
+        before = fleet_db.db_locked_errors()
+        locked = sqlite3.OperationalError("database is locked")
+        with mock.patch.object(fleet_db, "write_audit_log", side_effect=locked):
+            self.batch([{"method": "GET", "path": f"/v1/assets/{self.asset_id}"}])
+        self.assertEqual(fleet_db.db_locked_errors(), before + 1)
+        with mock.patch.object(api, "METRICS_TOKEN", "scrape"):
+            resp = self.client.get("/v1/admin/metrics", headers={"Authorization": "Bearer scrape"})
+        self.assertIn(f"fleet_db_locked_errors_total {before + 1}", resp.text)
+
+
+class SingleWriterTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._old_db = fleet_db.DB_FILE
+        fleet_db.DB_FILE = os.path.join(self._tmp.name, "writer.db")
+        fleet_db.init_db()
+        self.asset_id = fleet_db.create_asset("Writer Check", "yacht", 0)
+
+    def tearDown(self):
+        fleet_db.stop_writer()
+        fleet_db.DB_FILE = self._old_db
+        self._tmp.cleanup()
+
+    def concurrently(self, calls):
+        results = [None] * len(calls)
+
+        def run(i, fn):
+            try:
+                results[i] = fn()
+            except Exception as exc:
+                results[i] = exc
+
+        threads = [threading.Thread(target=run, args=(i, fn)) for i, fn in enumerate(calls)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return results
+
+    def test_concurrent_writes_group_commit(self):
+        version = fleet_db.data_version()
+        fleet_db.start_writer(max_delay_ms=50)
+        results = self.concurrently([lambda: fleet_db.log_trip(self.asset_id, 2)] * 20)
+        self.assertEqual(results, [True] * 20)
+        self.assertEqual(float(fleet_db.get_asset(self.asset_id)["usage_value"]), 40.0)
+        stats = fleet_db.writer_stats()
+        self.assertEqual(stats["calls"], 20)
+        self.assertLess(stats["groups"], 20)
+        # Post-commit work ran once per call, not once per group
+        self.assertEqual(fleet_db.data_version(), version + 20)
+
+    def test_each_caller_gets_its_own_error(self):
+        fleet_db.create_api_key("admin", is_admin=True, scope="admin")
+        fleet_db.start_writer(max_delay_ms=50)
+        results = self.concurrently([
+            lambda: fleet_db.log_trip(self.asset_id, 5),
+            lambda: fleet_db.create_api_key("second admin", is_admin=True, scope="admin"),
+            lambda: fleet_db.seed_maintenance_from_template(self.asset_id, "yacht"),
+        ])
+        self.assertIs(results[0], True)
+        self.assertIsInstance(results[1], ValueError)
+        self.assertTrue(results[2]["ok"])
+        self.assertEqual(float(fleet_db.get_asset(self.asset_id)["usage_value"]), 5.0)
+        self.assertEqual(len(fleet_db.list_maintenance_tasks(self.asset_id)), results[2]["seeded"])
+        self.assertEqual(fleet_db.writer_stats()["errors"], 1)
+
+    def test_failing_hook_does_not_fail_committed_write(self):
+        version = fleet_db.data_version()
+        fleet_db.start_writer()
+        with mock.patch.object(fleet_db, "publish_event", side_effect=RuntimeError("boom")):
+            self.assertTrue(fleet_db.log_trip(self.asset_id, 3))
+        self.assertEqual(float(fleet_db.get_asset(self.asset_id)["usage_value"]), 3.0)
+        # The hooks after the failing one still ran
+        self.assertEqual(fleet_db.data_version(), version + 1)
+        self.assertEqual(fleet_db.writer_stats()["errors"], 0)
+
+    def test_stopped_writer_runs_inline(self):
+        fleet_db.start_writer()
+        writer = fleet_db._WRITER
+        fleet_db.stop_writer()
+        self.assertIsNone(fleet_db.writer_stats())
+        self.assertIsNone(writer.submit(fleet_db.log_trip, (self.asset_id, 1), {}))
+        self.assertTrue(fleet_db.log_trip(self.asset_id, 1))
+
+    def test_dead_writer_fails_queued_calls(self):
+        fleet_db.start_writer()
+        writer = fleet_db._WRITER
+        with mock.patch.object(writer, "_run_group", side_effect=SystemExit):
+            futures = [Future() for _ in range(3)]
+            with writer._lock:  # all three queued before the loop can close
+                for fut in futures:
+                    writer.queue.put((fleet_db.log_trip, (self.asset_id, 1), {}, fut, 0.0))
+            writer._thread.join(5)
+        self.assertFalse(writer._thread.is_alive())
+        self.assertTrue(writer.closed)
+        # The failed group and anything queued behind it are resolved, not left hanging
+        for fut in futures:
+            self.assertIsInstance(fut.exception(timeout=1), RuntimeError)
+        # Later calls run inline instead of queueing to the dead thread
+        self.assertTrue(fleet_db.log_trip(self.asset_id, 1))
+
+
+if __name__ == "__main__":
+    unittest.main()
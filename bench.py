@@ -0,0 +1,565 @@
+# ---------------------------
+# bench.py
+# Reproducible benchmarks for API / DB hot paths against a synthetic fleet.
+#
+#   python bench.py                          # run every benchmark
+#   python bench.py dashboard list_pagination
+#   python bench.py --assets 1000 --trips 200 --output after.json
+#   python bench.py --compare before.json after.json
+#
+# Prints one JSON object per benchmark on stdout; --output also writes the
+# whole run as one JSON document so runs can be compared between commits.
+# ---------------------------
+import argparse
+import contextlib
+import gc
+import json
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+import fleet_db
+
+BENCHMARKS: Dict[str, Callable[[], Dict[str, Any]]] = {}
+
+# Synthetic fleet shape; overridden from the command line.
+FLEET_SIZE = {
+    "assets": 200,
+    "trips_per_asset": 50,
+    "services_per_asset": 10,
+    "keys": 5,
+    "seed": 1,
+}
+ASSET_TYPES = ("yacht", "center_console", "jet_ski", "helicopter", "car", "jet")
+
+
+def benchmark(name: str):
+    def register(fn):
+        BENCHMARKS[name] = fn
+        return fn
+    return register
+
+
+def time_op(fn: Callable[[], Any], number: int = 200, repeat: int = 5) -> Dict[str, float]:
+    """Per-call timings in microseconds over `repeat` batches of `number` calls."""
+    fn()  # warm-up
+    per_call = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        per_call.append((time.perf_counter() - start) / number * 1e6)
+    return {
+        "min_us": round(min(per_call), 2),
+        "median_us": round(statistics.median(per_call), 2),
+        "mean_us": round(statistics.mean(per_call), 2),
+        "calls": number * repeat,
+    }
+
+
+def measure_memory(fn: Callable[[], Any]) -> Dict[str, int]:
+    """Peak/retained bytes and retained allocation count for one call of fn."""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    diff = after.compare_to(before, "filename")
+    out = {
+        "peak_bytes": peak,
+        "retained_bytes": sum(d.size_diff for d in diff),
+        "retained_blocks": sum(d.count_diff for d in diff),
+    }
+    del result
+    return out
+
+
+@contextlib.contextmanager
+def temp_db():
+    """Point fleet_db at a fresh SQLite file for the duration of a benchmark."""
+    old = fleet_db.DB_FILE
+    with tempfile.TemporaryDirectory() as tmp:
+        fleet_db.DB_FILE = os.path.join(tmp, "bench.db")
+        try:
+            fleet_db.init_db()
+            yield fleet_db.DB_FILE
+        finally:
+            fleet_db.DB_FILE = old
+
+
+@contextlib.contextmanager
+def api_client():
+    """
+    TestClient over the current temp DB. Rate limiting is switched off so it
+    doesn't throttle the loop; startup output goes to stderr to keep stdout
+    machine-readable. Documents are stored next to the temp DB.
+    """
+    from fastapi.testclient import TestClient
+
+    import api
+
+    old = (api.RATE_LIMIT_ENABLED, api.DOCS_DIR)
+    api.RATE_LIMIT_ENABLED = False
+    api.DOCS_DIR = os.path.join(os.path.dirname(fleet_db.DB_FILE), "docs_store")
+    try:
+        with contextlib.redirect_stdout(sys.stderr):
+            client = TestClient(api.app)
+            client.__enter__()
+        try:
+            yield client
+        finally:
+            client.__exit__(None, None, None)
+    finally:
+        api.RATE_LIMIT_ENABLED, api.DOCS_DIR = old
+
+
+# ---------------------------
+# Synthetic fleet
+# ---------------------------
+def _timestamp(base: datetime, rng: random.Random, days: int = 365) -> str:
+    return (base - timedelta(seconds=rng.randrange(days * 86400))).strftime("%Y-%m-%d %H:%M:%S")
+
+
+def generate_fleet(assets: int, trips_per_asset: int, services_per_asset: int,
+                   keys: int, seed: int = 1) -> Dict[str, Any]:
+    """
+    Populate the current fleet_db.DB_FILE. Tasks come from
+    maintenance_template; roughly a quarter of them end up overdue, and
+    alerts are raised through generate_maintenance_alerts like the API does.
+    Returns the asset ids and raw API keys (first is admin).
+    """
+    rng = random.Random(seed)
+    now = datetime(2026, 1, 1)
+    asset_ids: List[int] = []
+
+    conn = fleet_db.get_conn()
+    cur = conn.cursor()
+    for i in range(assets):
+        asset_type = ASSET_TYPES[i % len(ASSET_TYPES)]
+        unit = fleet_db.default_usage_unit(asset_type)
+        template = fleet_db.maintenance_template(asset_type)
+        max_interval = max(float(t["interval_value"]) for t in template)
+        usage = round(rng.uniform(0, 3 * max_interval), 1)
+
+        cur.execute("""
+            INSERT INTO assets (name, type, usage_unit, usage_value, is_active)
+            VALUES (?, ?, ?, ?, 1)
+        """, (f"{asset_type}-{i:05d}", asset_type, unit, usage))
+        asset_id = int(cur.lastrowid)
+        asset_ids.append(asset_id)
+
+        cur.executemany("""
+            INSERT INTO maintenance_tasks (asset_id, task, category, interval_value, last_done_value, unit)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, [
+            (asset_id, t["task"], t["category"], float(t["interval_value"]),
+             max(0.0, round(usage - rng.uniform(0, 1.3 * float(t["interval_value"])), 1)), unit)
+            for t in template
+        ])
+        cur.executemany("""
+            INSERT INTO trip_events (asset_id, usage_added, unit, created_at)
+            VALUES (?, ?, ?, ?)
+        """, [
+            (asset_id, round(rng.uniform(0.5, max_interval / 10), 1), unit, _timestamp(now, rng))
+            for _ in range(trips_per_asset)
+        ])
+        cur.executemany("""
+            INSERT INTO service_events (asset_id, task, service_value, unit, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        """, [
+            (asset_id, rng.choice(template)["task"], round(rng.uniform(0, usage), 1),
+             unit, _timestamp(now, rng))
+            for _ in range(services_per_asset)
+        ])
+    conn.commit()
+    conn.close()
+
+    for asset_id in asset_ids:
+        fleet_db.generate_maintenance_alerts(asset_id)
+
+    raw_keys = [fleet_db.create_api_key(label="bench-admin", is_admin=True, scope="admin")]
+    for i in range(max(0, keys - 1)):
+        scope = ("read", "write")[i % 2]
+        raw_keys.append(fleet_db.create_api_key(label=f"bench-{scope}-{i}", scope=scope))
+
+    return {"asset_ids": asset_ids, "keys": raw_keys}
+
+
+@contextlib.contextmanager
+def synthetic_fleet():
+    with temp_db():
+        yield generate_fleet(**FLEET_SIZE)
+
+
+# ---------------------------
+# Serialization
+# ---------------------------
+def _sample_rows(n: int) -> List[Dict[str, Any]]:
+    return [
+        {
+            "id": i,
+            "asset_id": i % 40 + 1,
+            "task": f"Engine Oil Change #{i}",
+            "alert_type": "maintenance_due",
+            "severity": "CRITICAL",
+            "message": f"Engine Oil Change #{i} overdue",
+            "usage_added": 12.5 + i,
+            "unit": "engine_hours",
+            "created_at": "2026-02-12 17:00:00",
+            "resolved": 0,
+        }
+        for i in range(n)
+    ]
+
+
+@benchmark("serialization")
+def bench_serialization(rows: int = 200) -> Dict[str, Any]:
+    from fastapi.encoders import jsonable_encoder
+    from fastapi.responses import JSONResponse
+
+    import api
+
+    body = api.envelope(
+        data=_sample_rows(rows),
+        meta={"limit": rows, "offset": 0, "total": rows, "has_more": False},
+    )
+    baseline = time_op(lambda: JSONResponse(jsonable_encoder(body)).body)
+    fast = time_op(lambda: api.FleetJSONResponse(body).body)
+    return {
+        "rows": rows,
+        "encoder": "orjson" if api.orjson is not None else "json",
+        "byte_identical": JSONResponse(jsonable_encoder(body)).body == api.FleetJSONResponse(body).body,
+        "jsonable_encoder+JSONResponse": baseline,
+        "FleetJSONResponse": fast,
+        "speedup": round(baseline["median_us"] / fast["median_us"], 2),
+    }
+
+
+# ---------------------------
+# Row representation
+# ---------------------------
+@benchmark("listing_memory")
+def bench_listing_memory(rows: int = 100_000) -> Dict[str, Any]:
+    import sqlite3
+
+    with temp_db() as path:
+        asset_id = fleet_db.create_asset("Bench", "yacht", 0)
+        conn = fleet_db.get_conn()
+        conn.executemany(
+            "INSERT INTO trip_events (asset_id, usage_added, unit) VALUES (?, ?, ?)",
+            [(asset_id, 1.5, "engine_hours") for _ in range(rows)],
+        )
+        conn.commit()
+        conn.close()
+
+        def dict_rows():
+            # Previous representation: sqlite3.Row -> dict per row
+            c = sqlite3.connect(path)
+            c.row_factory = sqlite3.Row
+            cur = c.cursor()
+            cur.execute("""
+                SELECT usage_added, unit, created_at
+                FROM trip_events
+                WHERE asset_id = ?
+                ORDER BY created_at DESC
+            """, (asset_id,))
+            out = [dict(r) for r in cur.fetchall()]
+            c.close()
+            return out
+
+        return {
+            "rows": rows,
+            "dict_rows": measure_memory(dict_rows),
+            "records": measure_memory(lambda: fleet_db.list_trip_events(asset_id)),
+        }
+
+
+# ---------------------------
+# Auth
+# ---------------------------
+@benchmark("api_key_lookup")
+def bench_api_key_lookup() -> Dict[str, Any]:
+    # One PBKDF2 per active key until the match, so cost grows with key count
+    with synthetic_fleet() as fleet:
+        keys = fleet["keys"]
+        return {
+            "active_keys": len(keys),
+            "first_key": time_op(lambda: fleet_db.get_api_key_record(keys[0]), number=3, repeat=3),
+            "last_key": time_op(lambda: fleet_db.get_api_key_record(keys[-1]), number=3, repeat=3),
+            "invalid_key": time_op(lambda: fleet_db.get_api_key_record("not-a-key"), number=3, repeat=3),
+        }
+
+
+# ---------------------------
+# Fleet-wide reads / writes
+# ---------------------------
+@benchmark("dashboard")
+def bench_dashboard() -> Dict[str, Any]:
+    with synthetic_fleet():
+        return {
+            "fleet_dashboard": time_op(fleet_db.fleet_dashboard, number=5, repeat=3),
+            "fleet_health_summary": time_op(fleet_db.fleet_health_summary, number=20, repeat=3),
+        }
+
+
+@benchmark("generate_alerts")
+def bench_generate_alerts() -> Dict[str, Any]:
+    with synthetic_fleet() as fleet:
+        ids = fleet["asset_ids"]
+
+        def fleet_pass():
+            for asset_id in ids:
+                fleet_db.generate_maintenance_alerts(asset_id)
+
+        # Alerts already exist from generation, so this is the steady-state pass
+        return {
+            "open_alerts": len(fleet_db.list_alerts()),
+            "per_asset": time_op(lambda: fleet_db.generate_maintenance_alerts(ids[len(ids) // 2]),
+                                 number=50, repeat=3),
+            "fleet_pass": time_op(fleet_pass, number=1, repeat=3),
+        }
+
+
+@benchmark("upcoming_due")
+def bench_upcoming_due() -> Dict[str, Any]:
+    with synthetic_fleet():
+        fleet_db.rebuild_due_index()
+        return {
+            "rebuild": time_op(fleet_db.rebuild_due_index, number=1, repeat=3),
+            "top_50": time_op(lambda: fleet_db.upcoming_due(50)),
+            "top_overdue_10": time_op(lambda: fleet_db.top_overdue_tasks(10)),
+        }
+
+
+@benchmark("list_pagination")
+def bench_list_pagination() -> Dict[str, Any]:
+    import api
+
+    with synthetic_fleet() as fleet:
+        asset_id = fleet["asset_ids"][len(fleet["asset_ids"]) // 2]
+        for _ in range(500):
+            fleet_db.write_audit_log(1, "admin", "GET", "/v1/assets", 200, True)
+
+        def page(fetch, offset):
+            return lambda: api.paginate(fetch(), limit=50, offset=offset)
+
+        trips = lambda: fleet_db.list_trip_events(asset_id)
+        services = lambda: fleet_db.list_service_events(asset_id)
+        last_trip_page = max(0, len(trips()) - 50)
+        return {
+            "assets_first_page": time_op(page(lambda: fleet_db.list_assets(True), 0), number=50),
+            "trips_first_page": time_op(page(trips, 0)),
+            "trips_last_page": time_op(page(trips, last_trip_page)),
+            "services_first_page": time_op(page(services, 0)),
+            "alerts_open": time_op(fleet_db.list_alerts, number=50),
+            "alerts_for_asset": time_op(lambda: fleet_db.list_alerts(asset_id)),
+            "audit_logs_first_page": time_op(lambda: fleet_db.list_audit_logs(50, 0)),
+            "audit_logs_deep_page": time_op(lambda: fleet_db.list_audit_logs(50, 450)),
+        }
+
+
+@benchmark("trip_ingestion")
+def bench_trip_ingestion(trips: int = 500) -> Dict[str, Any]:
+    with synthetic_fleet() as fleet:
+        ids = fleet["asset_ids"]
+        start = time.perf_counter()
+        for i in range(trips):
+            fleet_db.log_trip(ids[i % len(ids)], 1.5)
+        elapsed = time.perf_counter() - start
+        return {
+            "trips": trips,
+            "per_trip_us": round(elapsed / trips * 1e6, 2),
+            "trips_per_sec": round(trips / elapsed, 1),
+        }
+
+
+def _write_burst(threads: int, writes: int, ids: List[int]) -> Dict[str, Any]:
+    """threads x writes log_trip + write_audit_log pairs, like API request threads."""
+    latencies: List[float] = []
+    errors: List[str] = []
+    lock = threading.Lock()
+
+    def worker(n: int):
+        mine, failed = [], []
+        for i in range(writes):
+            start = time.perf_counter()
+            try:
+                fleet_db.log_trip(ids[(n * writes + i) % len(ids)], 1.5)
+                fleet_db.write_audit_log(1, "write", "POST", "/v1/assets/1/trips", 200, True)
+            except sqlite3.OperationalError as exc:
+                failed.append(str(exc))
+            mine.append(time.perf_counter() - start)
+        with lock:
+            latencies.extend(mine)
+            errors.extend(failed)
+
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    start = time.perf_counter()
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "requests_per_sec": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 2),
+        "p99_ms": round(latencies[int(len(latencies) * 0.99)] * 1000, 2),
+        "errors": len(errors),
+    }
+
+
+@benchmark("concurrent_writes")
+def bench_concurrent_writes(threads: int = 16, writes: int = 50) -> Dict[str, Any]:
+    # Per-call connections + commits vs the single writer at a few budgets
+    out: Dict[str, Any] = {"threads": threads, "requests": threads * writes}
+    with synthetic_fleet() as fleet:
+        ids = fleet["asset_ids"]
+        out["per_call_commit"] = _write_burst(threads, writes, ids)
+        for delay_ms in (0.0, 2.0, 5.0):
+            fleet_db.start_writer(max_delay_ms=delay_ms)
+            try:
+                result = _write_burst(threads, writes, ids)
+                stats = fleet_db.writer_stats()
+            finally:
+                fleet_db.stop_writer()
+            result["mean_group"] = stats["mean_group"]
+            out[f"single_writer_{delay_ms:g}ms"] = result
+    return out
+
+
+# ---------------------------
+# HTTP (TestClient, full middleware stack incl. API key verification)
+# ---------------------------
+@benchmark("documents_api")
+def bench_documents_api(file_bytes: int = 64 * 1024) -> Dict[str, Any]:
+    with synthetic_fleet() as fleet, api_client() as client:
+        headers = {"X-API-Key": fleet["keys"][0]}
+        payload = os.urandom(file_bytes)
+
+        def upload():
+            r = client.post("/v1/documents", data={"title": "bench"},
+                            files={"file": ("bench.bin", payload)}, headers=headers)
+            assert r.status_code == 200, r.text
+
+        upload()
+        doc_id = client.get("/v1/documents", headers=headers).json()["data"][0]["id"]
+
+        def download():
+            r = client.get(f"/v1/documents/{doc_id}/download", headers=headers)
+            assert r.status_code == 200 and len(r.content) == file_bytes
+
+        return {
+            "file_bytes": file_bytes,
+            # Baseline for the auth + audit share of every authenticated request
+            "whoami": time_op(lambda: client.get("/v1/whoami", headers=headers), number=5, repeat=3),
+            "upload": time_op(upload, number=5, repeat=3),
+            "download": time_op(download, number=5, repeat=3),
+        }
+
+
+# ---------------------------
+# Runner
+# ---------------------------
+def run_env() -> Dict[str, Any]:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5,
+        ).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    return {"python": platform.python_version(), "platform": platform.platform(), "commit": commit}
+
+
+def _timings(result: Any, path: str = "") -> Dict[str, float]:
+    """Flatten a result into {metric path: median_us} for every time_op entry."""
+    out: Dict[str, float] = {}
+    if isinstance(result, dict):
+        if "median_us" in result:
+            out[path] = result["median_us"]
+        else:
+            for k, v in result.items():
+                out.update(_timings(v, f"{path}.{k}" if path else k))
+    return out
+
+
+def compare(old_path: str, new_path: str) -> int:
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    for name, result in new["results"].items():
+        before = _timings(old["results"].get(name))
+        for metric, new_us in _timings(result).items():
+            old_us = before.get(metric)
+            print(json.dumps({
+                "benchmark": name,
+                "metric": metric,
+                "old_median_us": old_us,
+                "new_median_us": new_us,
+                "ratio": round(new_us / old_us, 3) if old_us else None,
+            }))
+    return 0
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Fleet Ops benchmarks")
+    parser.add_argument("names", nargs="*", help="benchmarks to run (default: all)")
+    parser.add_argument("--assets", type=int, default=FLEET_SIZE["assets"])
+    parser.add_argument("--trips", type=int, default=FLEET_SIZE["trips_per_asset"],
+                        help="trips per asset")
+    parser.add_argument("--services", type=int, default=FLEET_SIZE["services_per_asset"],
+                        help="service events per asset")
+    parser.add_argument("--keys", type=int, default=FLEET_SIZE["keys"],
+                        help="active API keys (first is admin)")
+    parser.add_argument("--seed", type=int, default=FLEET_SIZE["seed"])
+    parser.add_argument("--output", help="also write the run as one JSON document")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"),
+                        help="compare two --output files instead of running")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        return compare(*args.compare)
+
+    names = args.names or list(BENCHMARKS)
+    unknown = [n for n in names if n not in BENCHMARKS]
+    if unknown:
+        print(f"Unknown benchmark(s): {', '.join(unknown)}", file=sys.stderr)
+        print(f"Available: {', '.join(BENCHMARKS)}", file=sys.stderr)
+        return 2
+
+    FLEET_SIZE.update(
+        assets=max(1, args.assets),
+        trips_per_asset=max(0, args.trips),
+        services_per_asset=max(0, args.services),
+        keys=max(1, args.keys),
+        seed=args.seed,
+    )
+    env = run_env()
+    results: Dict[str, Any] = {}
+    for name in names:
+        result = BENCHMARKS[name]()
+        results[name] = result
+        print(json.dumps({"benchmark": name, "env": env, "fleet": FLEET_SIZE, "result": result}))
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"env": env, "fleet": FLEET_SIZE, "results": results}, f, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
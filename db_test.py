@@ -1,13 +1,23 @@
-from fleet_db import init_db, list_assets, get_due_maintenance
+from fleet_db import init_db, list_assets, list_maintenance_tasks, task_state
 
-init_db()
 
-assets = list_assets()
-print("Assets")
-for a in assets:
-    print(a)
+def get_due_maintenance(asset):
+    current = float(asset["usage_value"])
+    return [
+        t for t in list_maintenance_tasks(asset["id"])
+        if task_state(t, current) == "overdue"
+    ]
 
-print("\nMaintenance Due check:")
-for a in assets:
-    due = get_due_maintenance(a["id"])
-    print(a["name"], "due:", [d["task"] for d in due] or "None")
+
+if __name__ == "__main__":
+    init_db()
+
+    assets = list_assets()
+    print("Assets")
+    for a in assets:
+        print(dict(a))
+
+    print("\nMaintenance Due check:")
+    for a in assets:
+        due = get_due_maintenance(a)
+        print(a["name"], "due:", [d["task"] for d in due] or "None")
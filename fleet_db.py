@@ -1,10 +1,23 @@
 # ---------------------------
 # fleet_db.py (CLEAN: scopes + admin + feature scopes + audit log)
 # ---------------------------
+import functools
 import hashlib
+import heapq
 import hmac
+import itertools
+import json
+import queue
 import secrets
 import sqlite3
+import threading
+import time
+import weakref
+from collections import deque
+from collections.abc import Mapping
+from concurrent.futures import Future
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone
 from typing import Optional, List, Dict, Any, Tuple
 DB_FILE = "fleet.db"
 
@@ -17,6 +30,14 @@ ADMIN_SCOPE = "admin"
 HASH_ALGORITHM = "sha256"
 HASH_ITERATIONS = 200_000
 SALT_BYTES = 16
+FEATURE_SCOPES = (
+    "assets:read", "assets:write",
+    "maintenance:read", "maintenance:write",
+    "trips:read", "trips:write",
+    "documents:read", "documents:write",
+    "alerts:read", "alerts:write",
+    "fleet:read",
+)
 
 # ===========================
 # MIGRATION HELPERS
@@ -30,6 +51,13 @@ def _column_exists(conn, table: str, col: str) -> bool:
     return col in cols
 
 
+def _table_exists(conn, table: str) -> bool:
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (table,))
+    return cur.fetchone() is not None
+
+
 def _new_salt() -> str:
     return secrets.token_hex(SALT_BYTES)
 
@@ -59,7 +87,6 @@ def _migrate_api_keys_to_hashed(conn) -> None:
             "UPDATE api_keys SET api_key = ?, api_key_salt = ? WHERE id = ?",
             (hashed, salt, int(row["id"])),
         )
-    conn.commit()
 
 
 def _enforce_single_active_admin(conn) -> None:
@@ -79,7 +106,6 @@ def _enforce_single_active_admin(conn) -> None:
             "UPDATE api_keys SET is_active = 0 WHERE id = ?",
             (int(key_id),),
         )
-    conn.commit()
 
 
 def _dedupe_unresolved_alerts(conn) -> None:
@@ -94,14 +120,13 @@ def _dedupe_unresolved_alerts(conn) -> None:
             GROUP BY asset_id, task, alert_type
         );
     """)
-    conn.commit()
 
-def migrate_db():
+
+def _migration_2_unit_columns(conn) -> None:
     """
     Safe, additive migration.
     Adds new unit-aware columns while keeping legacy columns for compatibility.
     """
-    conn = get_conn()
     cur = conn.cursor()
 
     # ---------- assets: usage_unit + usage_value ----------
@@ -226,27 +251,869 @@ def migrate_db():
                 WHERE timestamp IS NULL;
             """)
 
-    conn.commit()
-    conn.close()
+
+def _migration_3_feature_scopes(conn) -> None:
+    cur = conn.cursor()
+
+    # ---------- api_key_feature_scopes: per-key feature scopes ----------
+    # Existing keys get the defaults for their base scope exactly once, when
+    # the table is first created, so later revocations stick.
+    if not _table_exists(conn, "api_key_feature_scopes"):
+        cur.execute("""
+            CREATE TABLE api_key_feature_scopes (
+                api_key_id INTEGER NOT NULL,
+                feature_scope TEXT NOT NULL,
+                PRIMARY KEY(api_key_id, feature_scope),
+                FOREIGN KEY(api_key_id) REFERENCES api_keys(id) ON DELETE CASCADE
+            );
+        """)
+        cur.execute("SELECT id, scope FROM api_keys WHERE COALESCE(is_admin, 0) = 0")
+        for row in cur.fetchall():
+            _insert_feature_scopes(
+                conn, int(row["id"]), default_feature_scopes(row["scope"]))
+
+
+# ===========================
+# QUERY INSTRUMENTATION (opt-in)
+# ===========================
+# Off by default: get_conn() hands out plain sqlite3 connections. When
+# enabled, statements are timed from execute() until the cursor is
+# exhausted, re-executed or its connection is closed, so lazily stepped
+# SELECTs include their fetch time.
+QUERY_STATS_ENABLED = False
+SLOW_QUERY_MS: Optional[float] = None
+SLOW_QUERY_LOG_SIZE = 100
+QUERY_SAMPLE_SIZE = 1024
+QUERY_STATS_MAX_STATEMENTS = 500
+
+_QUERY_STATS: Dict[str, Dict[str, Any]] = {}
+_QUERY_STATS_LOCK = threading.Lock()
+_SLOW_QUERIES: deque = deque(maxlen=SLOW_QUERY_LOG_SIZE)
+_CONNECTIONS_OPENED = 0
+_EXPLAINABLE = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH", "REPLACE")
+
+
+def configure_query_stats(enabled: bool, slow_query_ms: Optional[float] = None) -> None:
+    global QUERY_STATS_ENABLED, SLOW_QUERY_MS
+    QUERY_STATS_ENABLED = bool(enabled)
+    SLOW_QUERY_MS = float(slow_query_ms) if slow_query_ms else None
+
+
+def reset_query_stats() -> None:
+    global _CONNECTIONS_OPENED
+    with _QUERY_STATS_LOCK:
+        _QUERY_STATS.clear()
+        _SLOW_QUERIES.clear()
+        _CONNECTIONS_OPENED = 0
+
+
+def _statement_key(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+def _record_statement(sql: str, seconds: float, rows: int, error: bool = False) -> None:
+    key = _statement_key(sql)
+    with _QUERY_STATS_LOCK:
+        st = _QUERY_STATS.get(key)
+        if st is None:
+            if len(_QUERY_STATS) >= QUERY_STATS_MAX_STATEMENTS:
+                return
+            st = _QUERY_STATS[key] = {
+                "count": 0, "errors": 0, "rows": 0, "total_s": 0.0, "max_s": 0.0,
+                "samples": deque(maxlen=QUERY_SAMPLE_SIZE),
+            }
+        st["count"] += 1
+        st["errors"] += 1 if error else 0
+        st["rows"] += rows
+        st["total_s"] += seconds
+        st["max_s"] = max(st["max_s"], seconds)
+        st["samples"].append(seconds)
+
+
+def _record_slow_query(conn, sql: str, params, seconds: float) -> None:
+    plan = None
+    if _statement_key(sql).upper().startswith(_EXPLAINABLE):
+        try:
+            # Plain cursor: the EXPLAIN itself must not be instrumented
+            cur = sqlite3.Cursor(conn)
+            cur.row_factory = None
+            cur.execute("EXPLAIN QUERY PLAN " + sql, params)
+            plan = [r[3] for r in cur.fetchall()]
+        except sqlite3.Error:
+            plan = None
+    with _QUERY_STATS_LOCK:
+        _SLOW_QUERIES.append({
+            "sql": _statement_key(sql),
+            "ms": round(seconds * 1000, 3),
+            "plan": plan,
+            "at": time.time(),
+        })
+
+
+def _percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def query_stats() -> Dict[str, Any]:
+    with _QUERY_STATS_LOCK:
+        snapshot = [(k, dict(v, samples=sorted(v["samples"])))
+                    for k, v in _QUERY_STATS.items()]
+        slow = list(_SLOW_QUERIES)
+        opened = _CONNECTIONS_OPENED
+    statements = []
+    for sql, st in snapshot:
+        samples = st["samples"]
+        statements.append({
+            "sql": sql,
+            "count": st["count"],
+            "errors": st["errors"],
+            "rows": st["rows"],
+            "total_ms": round(st["total_s"] * 1000, 3),
+            "mean_ms": round(st["total_s"] * 1000 / st["count"], 3),
+            "p50_ms": round(_percentile(samples, 50) * 1000, 3),
+            "p95_ms": round(_percentile(samples, 95) * 1000, 3),
+            "p99_ms": round(_percentile(samples, 99) * 1000, 3),
+            "max_ms": round(st["max_s"] * 1000, 3),
+        })
+    statements.sort(key=lambda x: x["total_ms"], reverse=True)
+    return {
+        "enabled": QUERY_STATS_ENABLED,
+        "slow_query_ms": SLOW_QUERY_MS,
+        "connections_opened": opened,
+        "locked_errors": _DB_LOCKED_ERRORS,
+        "statements": statements,
+        "slow_queries": slow,
+    }
+
+
+class _InstrumentedCursor(sqlite3.Cursor):
+    _pending = None  # [sql, params, seconds, rows] of the statement in flight
+
+    def _finish(self):
+        pending, self._pending = self._pending, None
+        if pending is None:
+            return
+        sql, params, seconds, rows = pending
+        _record_statement(sql, seconds, rows)
+        if SLOW_QUERY_MS is not None and seconds * 1000 >= SLOW_QUERY_MS and params is not None:
+            _record_slow_query(self.connection, sql, params, seconds)
+
+    def _fetched(self, start: float, rows: int):
+        if self._pending is not None:
+            self._pending[2] += time.perf_counter() - start
+            self._pending[3] += rows
+
+    def execute(self, sql, parameters=()):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            super().execute(sql, parameters)
+        except sqlite3.Error as exc:
+            _record_statement(sql, time.perf_counter() - start, 0, error=True)
+            note_db_error(exc)
+            raise
+        self._pending = [sql, parameters, time.perf_counter() - start, 0]
+        return self
+
+    def executemany(self, sql, seq_of_parameters):
+        self._finish()
+        start = time.perf_counter()
+        try:
+            super().executemany(sql, seq_of_parameters)
+        except sqlite3.Error as exc:
+            _record_statement(sql, time.perf_counter() - start, 0, error=True)
+            note_db_error(exc)
+            raise
+        # No single parameter set to EXPLAIN with
+        self._pending = [sql, None, time.perf_counter() - start, 0]
+        return self
+
+    def fetchone(self):
+        start = time.perf_counter()
+        row = super().fetchone()
+        self._fetched(start, 0 if row is None else 1)
+        if row is None:
+            self._finish()
+        return row
+
+    def fetchmany(self, size=None):
+        start = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        self._fetched(start, len(rows))
+        if not rows:
+            self._finish()
+        return rows
+
+    def fetchall(self):
+        start = time.perf_counter()
+        rows = super().fetchall()
+        self._fetched(start, len(rows))
+        self._finish()
+        return rows
+
+    def __next__(self):
+        start = time.perf_counter()
+        try:
+            row = super().__next__()
+        except StopIteration:
+            self._fetched(start, 0)
+            self._finish()
+            raise
+        self._fetched(start, 1)
+        return row
+
+    def close(self):
+        self._finish()
+        super().close()
+
+
+class _InstrumentedConnection(sqlite3.Connection):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cursors = weakref.WeakSet()
+
+    def cursor(self, factory=_InstrumentedCursor):
+        cur = super().cursor(factory)
+        self._cursors.add(cur)
+        return cur
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def close(self):
+        # Flush statements whose cursors were never exhausted
+        for cur in list(self._cursors):
+            cur._finish()
+        super().close()
 
 
 # ===========================
 # DB CONNECTION
 # ===========================
+# "database is locked" errors, counted once each wherever they surface
+# (instrumented cursors, the API's audit writer and error handler), so
+# lock contention is visible even where the error is swallowed. Always on.
+_DB_LOCKED_ERRORS = 0
+
+
+def note_db_error(exc: BaseException) -> None:
+    global _DB_LOCKED_ERRORS
+    if not isinstance(exc, sqlite3.OperationalError) or "locked" not in str(exc):
+        return
+    if getattr(exc, "_fleet_counted", False):
+        return
+    exc._fleet_counted = True
+    with _QUERY_STATS_LOCK:
+        _DB_LOCKED_ERRORS += 1
+
+
+def db_locked_errors() -> int:
+    return _DB_LOCKED_ERRORS
 
 
 def get_conn():
-    conn = sqlite3.connect(DB_FILE)
+    global _CONNECTIONS_OPENED
+    tx = getattr(_TX, "tx", None)
+    if tx is not None:
+        return tx.shared
+    if QUERY_STATS_ENABLED:
+        conn = sqlite3.connect(DB_FILE, factory=_InstrumentedConnection)
+        with _QUERY_STATS_LOCK:
+            _CONNECTIONS_OPENED += 1
+    else:
+        conn = sqlite3.connect(DB_FILE)
     conn.row_factory = sqlite3.Row
     conn.execute("PRAGMA foreign_keys = ON;")
     return conn
 
 
 # ===========================
-# INIT + MIGRATIONS
+# SHARED TRANSACTIONS
 # ===========================
-def init_db():
+# Inside `with transaction() as tx:` every get_conn() on this thread returns
+# one shared connection whose commit()/close() do nothing, so the ordinary
+# write functions below run in a single transaction unchanged. Their
+# post-commit work (data version, due index, change events) goes through
+# _after_commit: it runs once the block commits and is dropped on rollback.
+# tx.savepoint() undoes one step on error and keeps the rest.
+_TX = threading.local()
+
+
+class _SharedConnection:
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def commit(self):
+        pass
+
+    def close(self):
+        pass
+
+    def rollback(self):
+        raise RuntimeError("rollback() inside transaction(); use tx.savepoint()")
+
+
+class Savepoint:
+    def __init__(self, name: str, mark: int):
+        self.name = name
+        self.mark = mark  # len(Transaction.pending) when it was opened
+        self.rollback_only = False
+
+
+class Transaction:
+    def __init__(self, conn):
+        self.conn = conn
+        self.shared = _SharedConnection(conn)
+        self.pending: List[Tuple[Any, tuple, Dict[str, Any]]] = []
+        self.rollback_only = False
+        self._savepoints = 0
+
+    @contextmanager
+    def savepoint(self):
+        """Undone on exit if the block raises or sets sp.rollback_only."""
+        sp = Savepoint(f"sp_{self._savepoints}", len(self.pending))
+        self._savepoints += 1
+        self.conn.execute(f"SAVEPOINT {sp.name}")
+        try:
+            yield sp
+        except BaseException:
+            self._undo(sp)
+            raise
+        if sp.rollback_only:
+            self._undo(sp)
+        else:
+            self.conn.execute(f"RELEASE {sp.name}")
+
+    def _undo(self, sp: "Savepoint") -> None:
+        self.conn.execute(f"ROLLBACK TO {sp.name}")
+        self.conn.execute(f"RELEASE {sp.name}")
+        del self.pending[sp.mark:]
+
+
+@contextmanager
+def transaction(conn=None):
+    """
+    One write transaction (BEGIN IMMEDIATE) for everything this thread does
+    inside the block. Commits on exit unless it raised or tx.rollback_only
+    was set. Pass conn to reuse a connection the caller keeps open.
+    """
+    if getattr(_TX, "tx", None) is not None:
+        raise RuntimeError("transaction() does not nest")
+    own = conn is None
+    if own:
+        conn = get_conn()
+    tx = Transaction(conn)
+    committed = False
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        _TX.tx = tx
+        try:
+            yield tx
+        finally:
+            _TX.tx = None
+        if tx.rollback_only:
+            conn.rollback()
+        else:
+            conn.commit()
+            committed = True
+    except BaseException:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+    finally:
+        if own:
+            conn.close()
+    if committed:
+        _run_after_commit(tx.pending)
+
+
+def _run_after_commit(hooks) -> None:
+    # The data is committed: a failing hook must not skip the others or
+    # turn the write into an error for its caller (who might then retry it)
+    for fn, args, kwargs in hooks:
+        try:
+            fn(*args, **kwargs)
+        except Exception as exc:
+            print(f"after-commit hook {getattr(fn, '__name__', fn)} failed:", repr(exc))
+
+
+def _after_commit(fn, *args, **kwargs) -> None:
+    """Run fn now, or after the enclosing transaction() commits."""
+    tx = getattr(_TX, "tx", None)
+    if tx is None:
+        fn(*args, **kwargs)
+    else:
+        tx.pending.append((fn, args, kwargs))
+
+
+# ===========================
+# SINGLE WRITER (opt-in group commit)
+# ===========================
+# Off by default: each write function opens a connection and commits on its
+# own, so concurrent request threads take turns on SQLite's write lock (and
+# can hit "database is locked" after the busy timeout under bursts).
+# start_writer() routes every @_write_op call to one writer thread instead.
+# It keeps one connection open, runs queued calls back to back, each in its
+# own savepoint inside one transaction(), and commits the group once it has
+# WRITER_MAX_BATCH calls or the first has waited max_delay_ms (0: only
+# what queued during the previous commit). Each caller blocks for its own
+# return value or exception. Calls made inside a transaction() (the
+# writer's own, or /v1/batch) run inline, as do calls made once the
+# writer is closed.
+WRITER_MAX_DELAY_MS = 0.0
+WRITER_MAX_BATCH = 64
+_WRITER = None  # type: Optional[_Writer]
+_WRITER_STOP = object()
+
+
+class _Writer:
+    def __init__(self, max_delay_ms: float, max_batch: int):
+        self.max_delay = max(0.0, float(max_delay_ms)) / 1000.0
+        self.max_batch = max(1, int(max_batch))
+        self.queue: "queue.Queue" = queue.Queue()
+        self.stats: Dict[str, Any] = {
+            "calls": 0, "errors": 0, "groups": 0, "group_errors": 0,
+            "max_group": 0, "commit_ms": 0.0, "wait_ms": 0.0,
+        }
+        self._conn = None
+        self._db_file = None
+        # Guards closed + the queue: nothing can be queued behind _WRITER_STOP
+        self._lock = threading.Lock()
+        self.closed = False
+        self._thread = threading.Thread(target=self._loop, name="db-writer", daemon=True)
+        self._thread.start()
+
+    def submit(self, fn, args, kwargs) -> Optional[Future]:
+        """Queue a call; None once the writer is closed (run it inline then)."""
+        with self._lock:
+            if self.closed:
+                return None
+            fut: Future = Future()
+            self.queue.put((fn, args, kwargs, fut, time.perf_counter()))
+        return fut
+
+    def _connection(self):
+        # Tests and benchmarks repoint DB_FILE; follow them
+        if self._conn is None or self._db_file != DB_FILE:
+            if self._conn is not None:
+                self._conn.close()
+            self._conn, self._db_file = get_conn(), DB_FILE
+        return self._conn
+
+    def _loop(self) -> None:
+        stopping = False
+        try:
+            while not stopping:
+                item = self.queue.get()
+                if item is _WRITER_STOP:
+                    break
+                group = [item]
+                deadline = item[4] + self.max_delay
+                while len(group) < self.max_batch:
+                    try:
+                        nxt = self.queue.get(timeout=max(0.0, deadline - time.perf_counter()))
+                    except queue.Empty:
+                        break
+                    if nxt is _WRITER_STOP:
+                        stopping = True
+                        break
+                    group.append(nxt)
+                try:
+                    self._run_group(group)
+                finally:
+                    _fail_unresolved(group, "DB writer failed")
+        except BaseException as exc:
+            print("DB writer stopped:", repr(exc))
+        finally:
+            # Normally empty (stop() queues _WRITER_STOP last); if the loop
+            # died, callers still waiting must not hang
+            with self._lock:
+                self.closed = True
+            leftover = []
+            while True:
+                try:
+                    item = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _WRITER_STOP:
+                    leftover.append(item)
+            _fail_unresolved(leftover, "DB writer stopped")
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def _run_group(self, group) -> None:
+        started = time.perf_counter()
+        results: List[Tuple[Any, Optional[BaseException]]] = []
+        try:
+            with transaction(self._connection()) as tx:
+                for fn, args, kwargs, _, _ in group:
+                    try:
+                        with tx.savepoint():
+                            results.append((fn(*args, **kwargs), None))
+                    except BaseException as exc:
+                        results.append((None, exc))
+            # Committed; after-commit hooks ran (and cannot raise)
+        except BaseException as exc:
+            # BEGIN, COMMIT or the savepoint machinery failed: nothing in
+            # the group was written
+            note_db_error(exc)
+            results = [(None, exc)] * len(group)
+            self.stats["group_errors"] += 1
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+        finally:
+            finished = time.perf_counter()
+            st = self.stats
+            st["groups"] += 1
+            st["calls"] += len(group)
+            st["max_group"] = max(st["max_group"], len(group))
+            st["commit_ms"] += (finished - started) * 1000
+            for (_, _, _, fut, queued), (result, error) in zip(group, results):
+                st["wait_ms"] += (started - queued) * 1000
+                if error is None:
+                    fut.set_result(result)
+                else:
+                    st["errors"] += 1
+                    fut.set_exception(error)
+
+    def stop(self, timeout: float) -> None:
+        with self._lock:
+            if not self.closed:
+                self.closed = True
+                self.queue.put(_WRITER_STOP)
+        self._thread.join(timeout=timeout)
+
+
+def _fail_unresolved(items, message: str) -> None:
+    for item in items:
+        if not item[3].done():
+            item[3].set_exception(RuntimeError(message))
+
+
+def start_writer(max_delay_ms: float = WRITER_MAX_DELAY_MS,
+                 max_batch: int = WRITER_MAX_BATCH) -> None:
+    global _WRITER
+    if _WRITER is None:
+        _WRITER = _Writer(max_delay_ms, max_batch)
+
+
+def stop_writer(timeout: float = 10.0) -> None:
+    """Stop routing writes to the writer; calls already queued still run."""
+    global _WRITER
+    writer, _WRITER = _WRITER, None
+    if writer is not None:
+        writer.stop(timeout)
+
+
+def writer_stats() -> Optional[Dict[str, Any]]:
+    writer = _WRITER
+    if writer is None:
+        return None
+    st = dict(writer.stats)
+    st["queued"] = writer.queue.qsize()
+    st["max_delay_ms"] = writer.max_delay * 1000
+    st["max_batch"] = writer.max_batch
+    st["mean_group"] = round(st["calls"] / st["groups"], 2) if st["groups"] else 0.0
+    st["commit_ms"] = round(st["commit_ms"], 2)
+    st["wait_ms"] = round(st["wait_ms"], 2)
+    return st
+
+
+def _write_op(fn):
+    """Route fn through the single writer when it is running."""
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        writer = _WRITER
+        if writer is None or getattr(_TX, "tx", None) is not None:
+            return fn(*args, **kwargs)
+        fut = writer.submit(fn, args, kwargs)
+        if fut is None:
+            return fn(*args, **kwargs)
+        return fut.result()
+    return wrapper
+
+
+# ===========================
+# ROW RECORDS
+# ===========================
+class Record(Mapping):
+    """
+    Read-only, tuple-backed row. Column names live on a per-query subclass,
+    so a row costs one small object plus SQLite's value tuple instead of a
+    full dict. Supports r["col"], r.get(), keys(), dict(r) and == dict;
+    converted to a dict only when serialized (see record_to_dict).
+    """
+    __slots__ = ("_values",)
+    _fields: Tuple[str, ...] = ()
+    _index: Dict[str, int] = {}
+
+    def __init__(self, values: tuple):
+        self._values = values
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self._values[self._index[key]]
+        return self._values[key]
+
+    def get(self, key, default=None):
+        i = self._index.get(key)
+        return default if i is None else self._values[i]
+
+    def keys(self):
+        return self._fields
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __iter__(self):
+        return iter(self._fields)
+
+    def __len__(self):
+        return len(self._fields)
+
+    def __repr__(self):
+        return f"Record({dict(zip(self._fields, self._values))!r})"
+
+
+_RECORD_CLASSES: Dict[Tuple[str, ...], type] = {}
+
+
+def _record_class(fields: Tuple[str, ...]) -> type:
+    cls = _RECORD_CLASSES.get(fields)
+    if cls is None:
+        cls = type("Record", (Record,), {
+            "__slots__": (),
+            "_fields": fields,
+            "_index": {f: i for i, f in enumerate(fields)},
+        })
+        _RECORD_CLASSES[fields] = cls
+    return cls
+
+
+def record_to_dict(rec: Record) -> Dict[str, Any]:
+    return dict(zip(rec._fields, rec._values))
+
+
+def _record_cursor(conn):
+    # Plain tuples from SQLite; _fetch_records wraps them
+    cur = conn.cursor()
+    cur.row_factory = None
+    return cur
+
+
+def _fetch_records(cur) -> List[Record]:
+    cls = _record_class(tuple(d[0] for d in cur.description))
+    return [cls(r) for r in cur]
+
+
+def _fetch_record(cur) -> Optional[Record]:
+    row = cur.fetchone()
+    if row is None:
+        return None
+    return _record_class(tuple(d[0] for d in cur.description))(row)
+
+
+# ===========================
+# CHANGE COUNTERS (ETags)
+# ===========================
+# Per-table and per-asset ("asset:<id>") versions maintained by triggers, so
+# every writer (API, CLI, other workers) bumps them in its own transaction.
+CHANGE_COUNTER_TABLES = {
+    # table -> column holding the asset id (None = table-level only)
+    "assets": "id",
+    "maintenance_tasks": "asset_id",
+    "trip_events": "asset_id",
+    "service_events": "asset_id",
+    "alerts": "asset_id",
+    "documents": None,
+}
+CHANGE_EPOCH_SCOPE = "__epoch__"
+
+
+def _create_change_counter_triggers(conn, tables=None) -> None:
+    cur = conn.cursor()
+    for table in tables or CHANGE_COUNTER_TABLES:
+        asset_col = CHANGE_COUNTER_TABLES[table]
+        for op, row in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+            values = f"('{table}', 1)"
+            if asset_col:
+                values += f", ('asset:' || {row}.{asset_col}, 1)"
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{op.lower()}_cc
+                AFTER {op} ON {table}
+                BEGIN
+                    INSERT INTO change_counters (scope, version) VALUES {values}
+                    ON CONFLICT(scope) DO UPDATE SET version = version + 1;
+                END;
+            """)
+
+
+def _migration_4_change_counters(conn) -> None:
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS change_counters (
+            scope TEXT PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0
+        );
+    """)
+    # Random per-database epoch so a recreated DB never reuses old ETags
+    cur.execute(
+        "INSERT OR IGNORE INTO change_counters (scope, version) VALUES (?, ?)",
+        (CHANGE_EPOCH_SCOPE, secrets.randbits(31)),
+    )
+    _create_change_counter_triggers(conn)
+
+
+def get_change_counters(scopes: List[str]) -> Dict[str, int]:
+    """Versions for the given scopes plus the DB epoch; missing scopes are 0."""
+    wanted = [CHANGE_EPOCH_SCOPE] + list(scopes)
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute(
+        f"SELECT scope, version FROM change_counters WHERE scope IN ({', '.join('?' * len(wanted))})",
+        wanted,
+    )
+    found = {r["scope"]: int(r["version"]) for r in cur.fetchall()}
+    conn.close()
+    return {s: found.get(s, 0) for s in wanted}
+
+
+# ===========================
+# CHANGE LOG (delta sync)
+# ===========================
+# One change_log row per synced row, holding the seq of its latest change:
+# triggers delete the row's old entry and append a new one, so the log
+# stays one entry per live row (plus delete tombstones) and "changed since
+# seq N" is a range read on the primary key. AUTOINCREMENT keeps seqs
+# monotonic even when the newest entry is the one replaced.
+SYNC_TABLES = {
+    # table -> columns clients receive (documents: metadata only)
+    "assets": "id, name, type, is_active, usage_unit, usage_value",
+    "maintenance_tasks": "id, asset_id, task, category, interval_value, last_done_value, unit, "
+                         "last_done_date, next_due_date",
+    "trip_events": "id, asset_id, usage_added, unit, created_at",
+    "service_events": "id, asset_id, task, service_value, unit, created_at",
+    "alerts": "id, asset_id, task, alert_type, severity, message, created_at, resolved",
+    "documents": "id, title, filename, is_encrypted, original_filename, content_type, created_at",
+}
+# table -> feature scopes that may read it (any one is enough); mirrors the
+# read routes that serve the same rows
+SYNC_TABLE_SCOPES = {
+    "assets": ("assets:read",),
+    "maintenance_tasks": ("maintenance:read",),
+    "trip_events": ("trips:read",),
+    "service_events": ("trips:read", "maintenance:read"),
+    "alerts": ("alerts:read",),
+    "documents": ("documents:read",),
+}
+SYNC_DEFAULT_LIMIT = 500
+SYNC_MAX_LIMIT = 5000
+
+
+def _create_change_log_triggers(conn, tables=None) -> None:
+    cur = conn.cursor()
+    for table in tables or SYNC_TABLES:
+        for op, row, kind in (("INSERT", "NEW", "upsert"), ("UPDATE", "NEW", "upsert"),
+                              ("DELETE", "OLD", "delete")):
+            cur.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS trg_{table}_{op.lower()}_log
+                AFTER {op} ON {table}
+                BEGIN
+                    DELETE FROM change_log WHERE table_name = '{table}' AND row_id = {row}.id;
+                    INSERT INTO change_log (table_name, row_id, op) VALUES ('{table}', {row}.id, '{kind}');
+                END;
+            """)
+
+
+def sync_tables_for(rec: Optional[Dict[str, Any]]) -> List[str]:
+    """SYNC_TABLES the verified key record may read, per SYNC_TABLE_SCOPES."""
+    return [t for t in SYNC_TABLES
+            if any(record_has_scope(rec, f) for f in SYNC_TABLE_SCOPES[t])]
+
+
+def sync_changes(since: int = 0, limit: int = SYNC_DEFAULT_LIMIT,
+                 tables: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Rows changed after change seq `since`, at most `limit` changes, read in
+    one snapshot. Page with next_since until has_more is false. reset means
+    `since` is ahead of this database (e.g. it was recreated): start over
+    from 0. `tables` limits both changes and deleted to those SYNC_TABLES
+    (None = all of them).
+    """
+    since = max(0, int(since))
+    limit = max(1, min(int(limit), SYNC_MAX_LIMIT))
+    if tables is None:
+        tables = list(SYNC_TABLES)
+    tables = [t for t in tables if t in SYNC_TABLES]
     conn = get_conn()
+    try:
+        conn.execute("BEGIN")
+        # The newest entry is only ever replaced by a newer one, so MAX is the last seq issued
+        latest = int(conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0])
+        if since > latest:
+            return {"changes": {}, "deleted": {}, "since": since, "next_since": 0,
+                    "latest_seq": latest, "has_more": True, "reset": True}
+
+        table_filter = ""
+        if len(tables) < len(SYNC_TABLES):
+            # +table_name: filter while walking seq in order, never via idx_change_log_row
+            table_filter = "AND +table_name IN ({})".format(",".join("?" * len(tables)) or "NULL")
+        entries = conn.execute(f"""
+            SELECT seq, table_name, row_id, op FROM change_log
+            WHERE seq > ? {table_filter}
+            ORDER BY seq
+            LIMIT ?
+        """, (since, *(tables if table_filter else ()), limit + 1)).fetchall()
+        has_more = len(entries) > limit
+        entries = entries[:limit]
+
+        upserts: Dict[str, List[int]] = {}
+        deleted: Dict[str, List[int]] = {}
+        for e in entries:
+            target = upserts if e["op"] == "upsert" else deleted
+            target.setdefault(e["table_name"], []).append(int(e["row_id"]))
+
+        changes: Dict[str, List[Record]] = {}
+        cur = _record_cursor(conn)
+        for table, ids in upserts.items():
+            rows: List[Record] = []
+            for chunk in _chunks(ids):
+                cur.execute(f"""
+                    SELECT {SYNC_TABLES[table]} FROM {table}
+                    WHERE id IN ({",".join("?" * len(chunk))})
+                """, chunk)
+                rows.extend(_fetch_records(cur))
+            changes[table] = rows
+    finally:
+        conn.rollback()
+        conn.close()
+
+    return {
+        "changes": changes,
+        "deleted": deleted,
+        "since": since,
+        "next_since": int(entries[-1]["seq"]) if entries else since,
+        "latest_seq": latest,
+        "has_more": has_more,
+        "reset": False,
+    }
+
+
+# ===========================
+# INIT + MIGRATIONS
+# ===========================
+def _migration_1_base_schema(conn) -> None:
     cur = conn.cursor()
 
     # ---------- Core ----------
@@ -350,8 +1217,6 @@ def init_db():
         );
     """)
 
-    conn.commit()
-
     # ---------- indexes ----------
     cur.execute(
         "CREATE INDEX IF NOT EXISTS idx_tasks_asset ON maintenance_tasks(asset_id);")
@@ -374,74 +1239,560 @@ def init_db():
     cur.execute(
         "CREATE INDEX IF NOT EXISTS idx_audit_created ON audit_logs(timestamp);")
 
-    conn.commit()
-    conn.close()
-
-    migrate_db()
 
+def _rebuild_table(conn, table: str, create_sql: str, columns: List[str]) -> None:
+    """
+    SQLite table rebuild (create new, copy, drop, rename). Foreign keys are
+    off during migrations, so dropping a parent does not cascade. Indexes and
+    triggers go with the old table and must be recreated by the caller.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT seq FROM sqlite_sequence WHERE name = ?", (table,))
+    row = cur.fetchone()
+    seq = row[0] if row else None
+    cols = ", ".join(columns)
+    cur.execute(create_sql.format(name=f"{table}_new"))
+    cur.execute(f"INSERT INTO {table}_new ({cols}) SELECT {cols} FROM {table}")
+    cur.execute(f"DROP TABLE {table}")
+    cur.execute(f"ALTER TABLE {table}_new RENAME TO {table}")
+    if seq is not None:
+        # Keep AUTOINCREMENT from reusing ids of deleted rows
+        cur.execute(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, ?) WHERE name = ?", (seq, table))
 
-# ===========================
-# USAGE UNIT LOGIC
-# ===========================
 
+def _migration_5_drop_legacy_columns(conn) -> None:
+    """
+    Drop the legacy hour columns the unit-aware ones replaced. Old readers
+    can use the *_legacy views, which alias the unit-aware values back.
+    """
+    cur = conn.cursor()
+    _rebuild_table(conn, "assets", """
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            type TEXT NOT NULL DEFAULT 'unknown',
+            is_active INTEGER NOT NULL DEFAULT 1,
+            usage_unit TEXT NOT NULL DEFAULT 'engine_hours',
+            usage_value REAL NOT NULL DEFAULT 0
+        );
+    """, ["id", "name", "type", "is_active", "usage_unit", "usage_value"])
+    _rebuild_table(conn, "maintenance_tasks", """
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            asset_id INTEGER NOT NULL,
+            task TEXT NOT NULL,
+            category TEXT NOT NULL DEFAULT 'General',
+            interval_value REAL NOT NULL DEFAULT 0,
+            last_done_value REAL NOT NULL DEFAULT 0,
+            unit TEXT NOT NULL DEFAULT 'engine_hours',
+            UNIQUE(asset_id, task),
+            FOREIGN KEY(asset_id) REFERENCES assets(id) ON DELETE CASCADE
+        );
+    """, ["id", "asset_id", "task", "category", "interval_value", "last_done_value", "unit"])
+    _rebuild_table(conn, "trip_events", """
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            asset_id INTEGER NOT NULL,
+            usage_added REAL NOT NULL DEFAULT 0,
+            unit TEXT NOT NULL DEFAULT 'engine_hours',
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(asset_id) REFERENCES assets(id) ON DELETE CASCADE
+        );
+    """, ["id", "asset_id", "usage_added", "unit", "created_at"])
+    _rebuild_table(conn, "service_events", """
+        CREATE TABLE {name} (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            asset_id INTEGER NOT NULL,
+            task TEXT NOT NULL,
+            service_value REAL NOT NULL DEFAULT 0,
+            unit TEXT NOT NULL DEFAULT 'engine_hours',
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY(asset_id) REFERENCES assets(id) ON DELETE CASCADE
+        );
+    """, ["id", "asset_id", "task", "service_value", "unit", "created_at"])
 
-def default_usage_unit(asset_type: str) -> str:
-    t = (asset_type or "unknown").strip().lower()
+    # ---------- indexes + change-counter triggers (dropped with the tables) ----------
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_tasks_asset ON maintenance_tasks(asset_id);")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_trips_asset ON trip_events(asset_id);")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_services_asset ON service_events(asset_id);")
+    cur.execute(
+        "CREATE INDEX IF NOT EXISTS idx_assets_active ON assets(is_active);")
+    _create_change_counter_triggers(
+        conn, ["assets", "maintenance_tasks", "trip_events", "service_events"])
 
-    if t in {"car", "vehicle"}:
-        return "miles"
+    # ---------- compatibility views for old readers ----------
+    cur.execute("""
+        CREATE VIEW IF NOT EXISTS assets_legacy AS
+        SELECT *, usage_value AS engine_hours FROM assets;
+    """)
+    cur.execute("""
+        CREATE VIEW IF NOT EXISTS maintenance_tasks_legacy AS
+        SELECT *, interval_value AS interval_hours, last_done_value AS last_done_hours
+        FROM maintenance_tasks;
+    """)
+    cur.execute("""
+        CREATE VIEW IF NOT EXISTS trip_events_legacy AS
+        SELECT *, usage_added AS hours_added FROM trip_events;
+    """)
+    cur.execute("""
+        CREATE VIEW IF NOT EXISTS service_events_legacy AS
+        SELECT *, service_value AS service_hours FROM service_events;
+    """)
 
-    if t in {"jet", "aircraft", "plane"}:
-        return "flight_hours"
 
-    if t in {"helicopter"}:
-        return "flight_hours"
+def _migration_6_history_indexes(conn) -> None:
+    """
+    Composite indexes that return per-asset history, task and alert listings
+    already in their display order, so reads skip the temp B-tree sort.
+    created_at/timestamp are CURRENT_TIMESTAMP text, which sorts
+    chronologically without datetime(). Trip/service indexes also carry the
+    listed columns so those pages never touch the table.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_trips_asset_created
+        ON trip_events(asset_id, created_at DESC, id DESC, usage_added, unit);
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_services_asset_created
+        ON service_events(asset_id, created_at DESC, id DESC, task, service_value, unit);
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_alerts_asset_created
+        ON alerts(asset_id, created_at DESC, id DESC);
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_alerts_open_created
+        ON alerts(created_at DESC, id DESC) WHERE resolved = 0;
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_alerts_created
+        ON alerts(created_at DESC, id DESC);
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_audit_timestamp
+        ON audit_logs(timestamp DESC, id DESC);
+    """)
 
-    return "engine_hours"
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tasks_asset_category
+        ON maintenance_tasks(asset_id, category, task);
+    """)
 
-# ===========================
-# ASSETS
-# ===========================
+    # Superseded: every lookup they served is a prefix of an index above
+    for name in ("idx_trips_asset", "idx_services_asset", "idx_alerts_asset",
+                 "idx_alerts_resolved", "idx_audit_created", "idx_tasks_asset"):
+        cur.execute(f"DROP INDEX IF EXISTS {name};")
 
 
-def list_assets(active_only: bool = True) -> List[Dict[str, Any]]:
-    conn = get_conn()
+def _migration_7_calendar_triggers(conn) -> None:
+    """
+    Calendar maintenance triggers (unit = 'days'). last_done_date is the UTC
+    date a task was last serviced; next_due_date is kept for day-based tasks
+    only, so the partial index over it is the fleet-wide due queue.
+    """
     cur = conn.cursor()
-    sql = "SELECT * FROM assets"
-    if active_only:
-        sql += " WHERE is_active = 1"
-    cur.execute(sql)
-    rows = [dict(r) for r in cur.fetchall()]
-    conn.close()
-    return rows
+    if not _column_exists(conn, "maintenance_tasks", "last_done_date"):
+        cur.execute(
+            "ALTER TABLE maintenance_tasks ADD COLUMN last_done_date TEXT;")
+    if not _column_exists(conn, "maintenance_tasks", "next_due_date"):
+        cur.execute(
+            "ALTER TABLE maintenance_tasks ADD COLUMN next_due_date TEXT;")
+    cur.execute("""
+        UPDATE maintenance_tasks
+        SET next_due_date = date(last_done_date, '+' || CAST(interval_value AS INTEGER) || ' days')
+        WHERE unit = 'days' AND last_done_date IS NOT NULL;
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_tasks_next_due
+        ON maintenance_tasks(next_due_date, asset_id) WHERE next_due_date IS NOT NULL;
+    """)
 
 
-def get_asset(asset_id: int) -> Optional[Dict[str, Any]]:
-    conn = get_conn()
-    cur = conn.cursor()
-    cur.execute("SELECT * FROM assets WHERE id = ?", (asset_id,))
-    row = cur.fetchone()
-    conn.close()
-    return dict(row) if row else None
+def _migration_8_brief_snapshots(conn) -> None:
+    """
+    Precomputed fleet_ai_brief payloads, one row per horizon. fingerprint is
+    the fleet change-counter state (plus date) the payload was built from.
+    """
+    conn.cursor().execute("""
+        CREATE TABLE IF NOT EXISTS fleet_brief_snapshots (
+            horizon_hours INTEGER PRIMARY KEY,
+            fingerprint TEXT NOT NULL,
+            generated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            build_ms REAL NOT NULL DEFAULT 0,
+            payload TEXT NOT NULL
+        );
+    """)
 
 
-def create_asset(name: str, asset_type: str, starting_usage: float) -> int:
-    unit = default_usage_unit(asset_type)
+def _migration_9_job_leases(conn) -> None:
+    """
+    One row per scheduled job, shared by every worker process: who holds the
+    run lease and until when, and when the job is next due fleet-wide.
+    Times are unix seconds.
+    """
+    conn.cursor().execute("""
+        CREATE TABLE IF NOT EXISTS job_leases (
+            name TEXT PRIMARY KEY,
+            owner TEXT,
+            lease_until REAL NOT NULL DEFAULT 0,
+            next_run_at REAL NOT NULL DEFAULT 0,
+            last_started_at REAL,
+            last_finished_at REAL,
+            last_status TEXT
+        );
+    """)
 
-    conn = get_conn()
-    cur = conn.cursor()
 
+def _migration_10_webhook_outbox(conn) -> None:
+    """
+    Outbound webhooks: configured endpoints, and an outbox row per
+    (event, endpoint) written in the same transaction as the event itself.
+    status: pending -> delivered | dead. Times are unix seconds.
+    """
+    cur = conn.cursor()
     cur.execute("""
-        INSERT INTO assets (name, type, engine_hours, usage_unit, usage_value, is_active)
-        VALUES (?, ?, ?, ?, ?, 1)
-    """, (name, asset_type, float(starting_usage), unit, float(starting_usage)))
-
-    conn.commit()
-    asset_id = int(cur.lastrowid)
-    conn.close()
-    return asset_id
-
-
+        CREATE TABLE IF NOT EXISTS webhook_endpoints (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            url TEXT NOT NULL,
+            secret TEXT,
+            is_active INTEGER NOT NULL DEFAULT 1,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS webhook_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            endpoint_id INTEGER NOT NULL,
+            event_type TEXT NOT NULL,
+            payload TEXT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at REAL NOT NULL,
+            last_status_code INTEGER,
+            last_error TEXT,
+            created_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            delivered_at TEXT,
+            FOREIGN KEY(endpoint_id) REFERENCES webhook_endpoints(id)
+        );
+    """)
+    # The worker's poll: pending rows in due order
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_outbox_due
+        ON webhook_outbox(status, next_attempt_at);
+    """)
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_outbox_status
+        ON webhook_outbox(status, id);
+    """)
+
+
+def _migration_11_change_log(conn) -> None:
+    """
+    change_log for delta sync, backfilled with every existing synced row so
+    a client starting from seq 0 gets the full data set the same way.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            op TEXT NOT NULL DEFAULT 'upsert',
+            changed_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_change_log_row
+        ON change_log(table_name, row_id);
+    """)
+    for table in SYNC_TABLES:
+        cur.execute(f"""
+            INSERT OR IGNORE INTO change_log (table_name, row_id)
+            SELECT '{table}', id FROM {table} ORDER BY id
+        """)
+    _create_change_log_triggers(conn)
+
+
+# Ordered, append-only. PRAGMA user_version records the last applied step,
+# so a started-up database costs one PRAGMA read. Steps must stay idempotent:
+# databases created before versioning start at 0 and replay them once.
+MIGRATIONS = [
+    (1, _migration_1_base_schema),
+    (2, _migration_2_unit_columns),
+    (3, _migration_3_feature_scopes),
+    (4, _migration_4_change_counters),
+    (5, _migration_5_drop_legacy_columns),
+    (6, _migration_6_history_indexes),
+    (7, _migration_7_calendar_triggers),
+    (8, _migration_8_brief_snapshots),
+    (9, _migration_9_job_leases),
+    (10, _migration_10_webhook_outbox),
+    (11, _migration_11_change_log),
+]
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+# Bump whenever the shape of a read payload changes (API bodies, brief
+# snapshots): it is part of every ETag and brief fingerprint, so clients and
+# stored snapshots from an older build are never taken as current.
+PAYLOAD_VERSION = 1
+
+
+def _schema_version(conn) -> int:
+    return int(conn.execute("PRAGMA user_version").fetchone()[0])
+
+
+def migrate_db():
+    conn = get_conn()
+    if _schema_version(conn) >= SCHEMA_VERSION:
+        conn.close()
+        return
+
+    # Table rebuilds must not cascade; can only be toggled outside a transaction
+    conn.execute("PRAGMA foreign_keys = OFF;")
+    for version, step in MIGRATIONS:
+        # One write transaction per step; re-check under the lock so
+        # concurrently starting workers apply each step once.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            if _schema_version(conn) < version:
+                step(conn)
+                if conn.execute("PRAGMA foreign_key_check").fetchone() is not None:
+                    raise RuntimeError(
+                        f"Migration {version} left foreign key violations")
+                conn.execute(f"PRAGMA user_version = {int(version)}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            conn.close()
+            raise
+    conn.close()
+
+
+def init_db():
+    migrate_db()
+
+
+# ===========================
+# DATA VERSION
+# ===========================
+# Monotonic in-process counter bumped by every fleet-data write path (not by
+# api_keys/audit_logs). Readers use it to invalidate derived/cached results.
+_DATA_VERSION = 0
+_DATA_VERSION_LOCK = threading.Lock()
+
+
+def data_version() -> int:
+    return _DATA_VERSION
+
+
+def _bump_data_version() -> int:
+    global _DATA_VERSION
+    with _DATA_VERSION_LOCK:
+        _DATA_VERSION += 1
+        return _DATA_VERSION
+
+
+# ===========================
+# CHANGE EVENTS (in-process fan-out)
+# ===========================
+# Write paths publish small events after commit; subscribers (the SSE
+# stream) each get a bounded buffer and a notify callback, so an idle
+# subscriber costs one set entry and no polling. A subscriber that falls
+# more than EVENT_BUFFER_SIZE behind is marked overflowed and should
+# refetch state. The last EVENT_REPLAY_SIZE events are kept for resume.
+# Ids are "<process token>-<seq>": per process, like the response cache.
+EVENT_TYPES = ("alert_created", "alert_resolved", "trip_logged", "service_logged")
+EVENT_BUFFER_SIZE = 256
+EVENT_REPLAY_SIZE = 1000
+
+
+class EventSubscription:
+    __slots__ = ("types", "asset_id", "notify", "buffer", "overflowed")
+
+    def __init__(self, types, asset_id, notify):
+        self.types = frozenset(types) if types else None
+        self.asset_id = asset_id
+        self.notify = notify
+        self.buffer: deque = deque()
+        self.overflowed = False
+
+    def wants(self, event: Dict[str, Any]) -> bool:
+        if self.types is not None and event["type"] not in self.types:
+            return False
+        return self.asset_id is None or event["data"].get("asset_id") == self.asset_id
+
+    def drain(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """Buffered events and whether any were dropped since the last drain."""
+        with _EVENTS.lock:
+            events, overflowed = list(self.buffer), self.overflowed
+            self.buffer.clear()
+            self.overflowed = False
+        return events, overflowed
+
+
+class _EventBus:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.token = secrets.token_hex(4)
+        self.seq = 0
+        self.recent: deque = deque(maxlen=EVENT_REPLAY_SIZE)
+        self.subscribers: set = set()
+        self.published = 0
+        self.overflows = 0
+
+    def publish(self, event_type: str, data: Dict[str, Any]) -> None:
+        with self.lock:
+            self.seq += 1
+            event = {
+                "id": f"{self.token}-{self.seq}",
+                "seq": self.seq,
+                "type": event_type,
+                "at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+                "data": data,
+            }
+            self.recent.append(event)
+            self.published += 1
+            woken = []
+            for sub in self.subscribers:
+                if not sub.wants(event):
+                    continue
+                if len(sub.buffer) >= EVENT_BUFFER_SIZE:
+                    if not sub.overflowed:
+                        self.overflows += 1
+                    sub.buffer.clear()
+                    sub.overflowed = True
+                else:
+                    sub.buffer.append(event)
+                woken.append(sub)
+        for sub in woken:
+            sub.notify()
+
+    def subscribe(self, types=None, asset_id: Optional[int] = None, notify=None,
+                  last_event_id: Optional[str] = None) -> Tuple[EventSubscription, bool]:
+        """
+        Register a subscriber. With last_event_id, events after it are queued
+        first; returns (subscription, resumed) where resumed is False when
+        the id is unknown here (other process, restart, or aged out).
+        """
+        sub = EventSubscription(types, asset_id, notify or (lambda: None))
+        resumed = True
+        with self.lock:
+            if last_event_id:
+                token, _, seq_text = last_event_id.rpartition("-")
+                oldest = self.recent[0]["seq"] if self.recent else self.seq + 1
+                if token != self.token or not seq_text.isdigit() \
+                        or not oldest - 1 <= int(seq_text) <= self.seq:
+                    resumed = False
+                else:
+                    after = int(seq_text)
+                    sub.buffer.extend(
+                        e for e in self.recent if e["seq"] > after and sub.wants(e))
+            self.subscribers.add(sub)
+        return sub, resumed
+
+    def unsubscribe(self, sub: EventSubscription) -> None:
+        with self.lock:
+            self.subscribers.discard(sub)
+
+    def stats(self) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "subscribers": len(self.subscribers),
+                "published": self.published,
+                "overflows": self.overflows,
+                "last_event_id": f"{self.token}-{self.seq}" if self.seq else None,
+            }
+
+
+_EVENTS = _EventBus()
+
+
+def publish_event(event_type: str, **data) -> None:
+    _EVENTS.publish(event_type, data)
+
+
+def subscribe_events(types=None, asset_id: Optional[int] = None, notify=None,
+                     last_event_id: Optional[str] = None) -> Tuple[EventSubscription, bool]:
+    return _EVENTS.subscribe(types, asset_id, notify, last_event_id)
+
+
+def unsubscribe_events(sub: EventSubscription) -> None:
+    _EVENTS.unsubscribe(sub)
+
+
+def event_stats() -> Dict[str, Any]:
+    return _EVENTS.stats()
+
+
+# ===========================
+# USAGE UNIT LOGIC
+# ===========================
+
+
+def default_usage_unit(asset_type: str) -> str:
+    t = (asset_type or "unknown").strip().lower()
+
+    if t in {"car", "vehicle"}:
+        return "miles"
+
+    if t in {"jet", "aircraft", "plane"}:
+        return "flight_hours"
+
+    if t in {"helicopter"}:
+        return "flight_hours"
+
+    return "engine_hours"
+
+# ===========================
+# ASSETS
+# ===========================
+
+
+def list_assets(active_only: bool = True) -> List[Record]:
+    conn = get_conn()
+    cur = _record_cursor(conn)
+    sql = "SELECT * FROM assets"
+    if active_only:
+        sql += " WHERE is_active = 1"
+    cur.execute(sql)
+    rows = _fetch_records(cur)
+    conn.close()
+    return rows
+
+
+def get_asset(asset_id: int) -> Optional[Record]:
+    conn = get_conn()
+    cur = _record_cursor(conn)
+    cur.execute("SELECT * FROM assets WHERE id = ?", (asset_id,))
+    row = _fetch_record(cur)
+    conn.close()
+    return row
+
+
+@_write_op
+def create_asset(name: str, asset_type: str, starting_usage: float) -> int:
+    unit = default_usage_unit(asset_type)
+
+    conn = get_conn()
+    cur = conn.cursor()
+
+    cur.execute("""
+        INSERT INTO assets (name, type, usage_unit, usage_value, is_active)
+        VALUES (?, ?, ?, ?, 1)
+    """, (name, asset_type, unit, float(starting_usage)))
+
+    conn.commit()
+    asset_id = int(cur.lastrowid)
+    conn.close()
+    _after_commit(_bump_data_version)
+    return asset_id
+
+
+@_write_op
 def update_asset(asset_id: int, name: str, asset_type: str, usage_value: float) -> bool:
     unit = default_usage_unit(asset_type)
 
@@ -453,17 +1804,19 @@ def update_asset(asset_id: int, name: str, asset_type: str, usage_value: float)
         SET name = ?,
             type = ?,
             usage_unit = ?,
-            usage_value = ?,
-            engine_hours = ?
+            usage_value = ?
         WHERE id = ?
-    """, (name, asset_type, unit, float(usage_value), float(usage_value), int(asset_id)))
+    """, (name, asset_type, unit, float(usage_value), int(asset_id)))
 
     conn.commit()
     ok = cur.rowcount > 0
     conn.close()
+    if ok:
+        _after_commit(_bump_data_version)
     return ok
 
 
+@_write_op
 def archive_asset(asset_id: int) -> bool:
     conn = get_conn()
     cur = conn.cursor()
@@ -471,9 +1824,12 @@ def archive_asset(asset_id: int) -> bool:
     conn.commit()
     ok = cur.rowcount > 0
     conn.close()
+    if ok:
+        _after_commit(_bump_data_version)
     return ok
 
 
+@_write_op
 def restore_asset(asset_id: int) -> bool:
     conn = get_conn()
     cur = conn.cursor()
@@ -481,53 +1837,115 @@ def restore_asset(asset_id: int) -> bool:
     conn.commit()
     ok = cur.rowcount > 0
     conn.close()
+    if ok:
+        _after_commit(_bump_data_version)
     return ok
 
 
 # ===========================
 # MAINTENANCE
 # ===========================
-def upsert_task(asset_id: int, task: str, interval_value: float, last_done_value: float, category: str, unit: str):
+# Tasks are usage-based (interval in the asset's usage unit) unless their
+# unit is DAY_UNIT: then interval_value is a number of days counted from
+# last_done_date, and next_due_date feeds the date-indexed due queue.
+DAY_UNIT = "days"
+DUE_SOON_RATIO = 0.9  # usage tasks: warn from 90% of the interval
+DUE_SOON_DAYS = 7     # day tasks: warn within a week of the due date
+
+
+def today_iso() -> str:
+    # UTC, like the CURRENT_TIMESTAMP columns
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def next_due_date(unit: str, interval_value: float, last_done_date: Optional[str]) -> Optional[str]:
+    if unit != DAY_UNIT or not last_done_date:
+        return None
+    return (date.fromisoformat(last_done_date) + timedelta(days=int(interval_value))).isoformat()
+
+
+def task_since_last(task, current_usage: float, today: Optional[str] = None) -> float:
+    """Progress since the last service, in the task's own unit (usage or days)."""
+    if task.get("unit") == DAY_UNIT:
+        last = task.get("last_done_date")
+        if not last:
+            return 0.0
+        return float((date.fromisoformat(today or today_iso()) - date.fromisoformat(last)).days)
+    return current_usage - float(task["last_done_value"])
+
+
+def task_state(task, current_usage: float, today: Optional[str] = None) -> str:
+    """'overdue', 'due_soon' or 'ok' for one maintenance_tasks row."""
+    interval = float(task["interval_value"])
+    since = task_since_last(task, current_usage, today)
+    if since >= interval:
+        return "overdue"
+    if task.get("unit") == DAY_UNIT:
+        soon = interval - since <= DUE_SOON_DAYS
+    else:
+        soon = since >= interval * DUE_SOON_RATIO
+    return "due_soon" if soon else "ok"
+
+
+@_write_op
+def upsert_task(asset_id: int, task: str, interval_value: float, last_done_value: Optional[float],
+                category: str, unit: str, last_done_date: Optional[str] = None):
+    """
+    Create or edit a task. last_done_value/last_done_date of None keep the
+    stored values on edit; a new task starts at 0, and a new day-based task
+    as done today. next_due_date follows from the resulting date.
+    """
+    insert_date = last_done_date or (today_iso() if unit == DAY_UNIT else None)
     conn = get_conn()
     cur = conn.cursor()
+    # In DO UPDATE, bare columns are the stored row and excluded.* the insert values
     cur.execute("""
-        INSERT INTO maintenance_tasks(asset_id, task, interval_hours, last_done_hours, category, interval_value, last_done_value, unit)
-        VALUES(?, ?, ?, ?, ?, ?, ?, ?)
+        INSERT INTO maintenance_tasks(asset_id, task, category, interval_value, last_done_value, unit,
+                                      last_done_date, next_due_date)
+        VALUES(:asset_id, :task, :category, :interval_value, COALESCE(:last_done_value, 0.0), :unit,
+               :insert_date, :insert_due)
         ON CONFLICT(asset_id, task) DO UPDATE SET
-            interval_hours = excluded.interval_hours,
-            last_done_hours = excluded.last_done_hours,
             category = excluded.category,
             interval_value = excluded.interval_value,
-            last_done_value = excluded.last_done_value,
-            unit = excluded.unit;
-    """, (
-        int(asset_id),
-        str(task),
-        float(interval_value),
-        float(last_done_value),
-        str(category),
-        float(interval_value),
-        float(last_done_value),
-        str(unit),
-    ))
+            last_done_value = COALESCE(:last_done_value, last_done_value),
+            unit = excluded.unit,
+            last_done_date = COALESCE(:last_done_date, last_done_date, excluded.last_done_date),
+            next_due_date = CASE WHEN excluded.unit = :day_unit THEN
+                date(COALESCE(:last_done_date, last_done_date, excluded.last_done_date),
+                     '+' || CAST(excluded.interval_value AS INTEGER) || ' days')
+            END
+    """, {
+        "asset_id": int(asset_id),
+        "task": str(task),
+        "category": str(category),
+        "interval_value": float(interval_value),
+        "last_done_value": None if last_done_value is None else float(last_done_value),
+        "unit": str(unit),
+        "last_done_date": last_done_date,
+        "insert_date": insert_date,
+        "insert_due": next_due_date(unit, interval_value, insert_date),
+        "day_unit": DAY_UNIT,
+    })
     conn.commit()
     conn.close()
+    _after_commit(_bump_data_version)
 
 
 def list_maintenance_tasks(asset_id: int):
     conn = get_conn()
-    cur = conn.cursor()
+    cur = _record_cursor(conn)
     cur.execute("""
-        SELECT task, interval_value, last_done_value, unit, category
+        SELECT task, interval_value, last_done_value, unit, category, last_done_date, next_due_date
         FROM maintenance_tasks
         WHERE asset_id = ?
         ORDER BY category, task
     """, (int(asset_id),))
-    rows = [dict(r) for r in cur.fetchall()]
+    rows = _fetch_records(cur)
     conn.close()
     return rows
 
 
+@_write_op
 def log_service(asset_id: int, task: str) -> bool:
     asset = get_asset(asset_id)
     if not asset:
@@ -535,43 +1953,95 @@ def log_service(asset_id: int, task: str) -> bool:
     if int(asset.get("is_active", 1)) != 1:
         return False
 
-    current = float(asset.get("usage_value", asset.get("engine_hours", 0.0)))
+    current = float(asset.get("usage_value", 0.0))
     unit = asset.get("usage_unit") or default_usage_unit(
         asset.get("type", "unknown"))
 
+    today = today_iso()
+
     conn = get_conn()
     cur = conn.cursor()
 
     cur.execute("""
-        UPDATE maintenance_tasks
-        SET last_done_value = ?, last_done_hours = ?
+        SELECT unit, interval_value FROM maintenance_tasks
         WHERE asset_id = ? AND task = ?
-    """, (current, current, int(asset_id), str(task)))
-
-    if cur.rowcount == 0:
+    """, (int(asset_id), str(task)))
+    row = cur.fetchone()
+    if row is None:
         conn.close()
         return False
 
+    due_date = next_due_date(row[0], row[1], today)
     cur.execute("""
-        INSERT INTO service_events (asset_id, task, service_hours, service_value, unit)
-        VALUES (?, ?, ?, ?, ?)
-    """, (int(asset_id), str(task), current, current, str(unit)))
+        UPDATE maintenance_tasks
+        SET last_done_value = ?,
+            last_done_date = ?,
+            next_due_date = ?
+        WHERE asset_id = ? AND task = ?
+    """, (current, today, due_date, int(asset_id), str(task)))
+
+    cur.execute("""
+        INSERT INTO service_events (asset_id, task, service_value, unit)
+        VALUES (?, ?, ?, ?)
+    """, (int(asset_id), str(task), current, str(unit)))
 
     conn.commit()
     conn.close()
+    _after_commit(_bump_data_version)
+    _after_commit(publish_event, "service_logged", asset_id=int(asset_id), task=str(task),
+                  service_value=current, unit=str(unit))
     return True
 
 
+def list_due_by_date(through: Optional[str] = None, since: Optional[str] = None,
+                     limit: Optional[int] = None, unalerted: bool = False) -> List[Record]:
+    """
+    Day-based tasks on active assets whose next_due_date falls in
+    [since, through] (through defaults to today), soonest first. A range scan
+    of idx_tasks_next_due: the cost follows the due rows, not the fleet size.
+    CROSS JOIN keeps that index as the outer loop (SQLite never reorders it).
+    unalerted=True drops tasks that already have an open maintenance_due alert.
+    """
+    sql = """
+        SELECT t.asset_id, a.name AS asset_name, t.task, t.category,
+               t.interval_value, t.last_done_date, t.next_due_date
+        FROM maintenance_tasks t
+        CROSS JOIN assets a ON a.id = t.asset_id
+        WHERE t.next_due_date <= ?
+    """
+    params: List[Any] = [through or today_iso()]
+    if since:
+        sql += " AND t.next_due_date >= ?"
+        params.append(since)
+    if unalerted:
+        sql += """ AND NOT EXISTS (
+            SELECT 1 FROM alerts al
+            WHERE al.asset_id = t.asset_id AND al.task = t.task
+              AND al.alert_type = 'maintenance_due' AND al.resolved = 0
+        )"""
+    sql += " AND a.is_active = 1 ORDER BY t.next_due_date, t.asset_id"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+
+    conn = get_conn()
+    cur = _record_cursor(conn)
+    cur.execute(sql, params)
+    rows = _fetch_records(cur)
+    conn.close()
+    return rows
+
+
 def list_service_events(asset_id: int):
     conn = get_conn()
-    cur = conn.cursor()
+    cur = _record_cursor(conn)
     cur.execute("""
         SELECT task, service_value, unit, created_at
         FROM service_events
         WHERE asset_id = ?
-        ORDER BY created_at DESC
+        ORDER BY created_at DESC, id DESC
     """, (int(asset_id),))
-    rows = [dict(r) for r in cur.fetchall()]
+    rows = _fetch_records(cur)
     conn.close()
     return rows
 
@@ -579,6 +2049,7 @@ def list_service_events(asset_id: int):
 # ===========================
 # TRIPS
 # ===========================
+@_write_op
 def log_trip(asset_id: int, usage_added: float) -> bool:
     if float(usage_added) <= 0:
         return False
@@ -598,34 +2069,40 @@ def log_trip(asset_id: int, usage_added: float) -> bool:
 
     cur.execute("""
         UPDATE assets
-        SET usage_value = usage_value + ?, engine_hours = engine_hours + ?
+        SET usage_value = usage_value + ?
         WHERE id = ? AND is_active = 1
-    """, (float(usage_added), float(usage_added), int(asset_id)))
+    """, (float(usage_added), int(asset_id)))
 
     if cur.rowcount == 0:
         conn.close()
         return False
 
     cur.execute("""
-        INSERT INTO trip_events (asset_id, hours_added, usage_added, unit)
-        VALUES (?, ?, ?, ?)
-    """, (int(asset_id), float(usage_added), float(usage_added), str(unit)))
+        INSERT INTO trip_events (asset_id, usage_added, unit)
+        VALUES (?, ?, ?)
+    """, (int(asset_id), float(usage_added), str(unit)))
+    # Read back inside the transaction: concurrent trips may have added usage too
+    cur.execute("SELECT usage_value FROM assets WHERE id = ?", (int(asset_id),))
+    usage_value = float(cur.fetchone()[0])
 
     conn.commit()
     conn.close()
+    _after_commit(_bump_data_version)
+    _after_commit(publish_event, "trip_logged", asset_id=int(asset_id),
+                  usage_added=float(usage_added), usage_value=usage_value, unit=str(unit))
     return True
 
 
 def list_trip_events(asset_id: int):
     conn = get_conn()
-    cur = conn.cursor()
+    cur = _record_cursor(conn)
     cur.execute("""
         SELECT usage_added, unit, created_at
         FROM trip_events
         WHERE asset_id = ?
-        ORDER BY created_at DESC
+        ORDER BY created_at DESC, id DESC
     """, (int(asset_id),))
-    rows = [dict(r) for r in cur.fetchall()]
+    rows = _fetch_records(cur)
     conn.close()
     return rows
 
@@ -633,6 +2110,7 @@ def list_trip_events(asset_id: int):
 # ===========================
 # DOCUMENTS
 # ===========================
+@_write_op
 def add_document(title: str, filename: str, stored_path: str, is_encrypted: bool,
                  original_filename: str, content_type: str):
     conn = get_conn()
@@ -647,46 +2125,47 @@ def add_document(title: str, filename: str, stored_path: str, is_encrypted: bool
 
 def list_documents():
     conn = get_conn()
-    cur = conn.cursor()
+    cur = _record_cursor(conn)
     cur.execute("""
         SELECT id, title, filename, is_encrypted, original_filename, content_type, created_at
         FROM documents
         ORDER BY created_at DESC
     """)
-    rows = [dict(r) for r in cur.fetchall()]
+    rows = _fetch_records(cur)
     conn.close()
     return rows
 
 
 def list_documents_with_paths():
     conn = get_conn()
-    cur = conn.cursor()
+    cur = _record_cursor(conn)
     cur.execute("""
         SELECT id, title, filename, stored_path, is_encrypted, original_filename, content_type, created_at
         FROM documents
         ORDER BY created_at DESC
     """)
-    rows = [dict(r) for r in cur.fetchall()]
+    rows = _fetch_records(cur)
     conn.close()
     return rows
 
 
-def get_document(doc_id: int) -> Optional[Dict[str, Any]]:
+def get_document(doc_id: int) -> Optional[Record]:
     conn = get_conn()
-    cur = conn.cursor()
+    cur = _record_cursor(conn)
     cur.execute("""
         SELECT id, title, filename, stored_path, is_encrypted, original_filename, content_type, created_at
         FROM documents
         WHERE id = ?
     """, (int(doc_id),))
-    row = cur.fetchone()
+    row = _fetch_record(cur)
     conn.close()
-    return dict(row) if row else None
+    return row
 
 
 # ===========================
 # ALERTS
 # ===========================
+@_write_op
 def generate_maintenance_alerts(asset_id: int):
     asset = get_asset(asset_id)
     if not asset:
@@ -695,34 +2174,102 @@ def generate_maintenance_alerts(asset_id: int):
         return
 
     tasks = list_maintenance_tasks(asset_id)
-    current = float(asset.get("usage_value", asset.get("engine_hours", 0.0)))
+    current = float(asset.get("usage_value", 0.0))
+    today = today_iso()
 
     conn = get_conn()
     cur = conn.cursor()
+    created: List[Dict[str, Any]] = []
 
     for t in tasks:
-        if current - float(t["last_done_value"]) >= float(t["interval_value"]):
-            cur.execute("""
-                SELECT 1
-                FROM alerts
-                WHERE asset_id = ? AND task = ? AND alert_type = 'maintenance_due' AND resolved = 0
-                LIMIT 1
-            """, (asset_id, str(t["task"])))
-            exists = cur.fetchone() is not None
-            if exists:
-                continue
-            cur.execute("""
-                INSERT INTO alerts (asset_id, task, alert_type, severity, message, resolved)
-                VALUES (?, ?, 'maintenance_due', 'CRITICAL', ?, 0)
-            """, (asset_id, str(t["task"]), f"{t['task']} overdue"))
+        if task_state(t, current, today) == "overdue":
+            _insert_due_alert(cur, asset_id, str(t["task"]), created)
 
     conn.commit()
     conn.close()
+    _alerts_created(created)
 
 
-def list_alerts(asset_id: Optional[int] = None, include_resolved: bool = False):
+def _insert_due_alert(cur, asset_id: int, task: str, created: List[Dict[str, Any]]) -> None:
+    cur.execute("""
+        SELECT 1
+        FROM alerts
+        WHERE asset_id = ? AND task = ? AND alert_type = 'maintenance_due' AND resolved = 0
+        LIMIT 1
+    """, (asset_id, task))
+    if cur.fetchone() is not None:
+        return
+    message = f"{task} overdue"
+    cur.execute("""
+        INSERT INTO alerts (asset_id, task, alert_type, severity, message, resolved)
+        VALUES (?, ?, 'maintenance_due', 'CRITICAL', ?, 0)
+    """, (asset_id, task, message))
+    alert = {
+        "alert_id": cur.lastrowid, "asset_id": asset_id, "task": task,
+        "alert_type": "maintenance_due", "severity": "CRITICAL", "message": message,
+    }
+    _enqueue_webhooks(cur, "alert_created", alert)
+    created.append(alert)
+
+
+def _alerts_created(created: List[Dict[str, Any]]) -> int:
+    """Post-commit bookkeeping for new alerts; returns how many there were."""
+    if created:
+        _after_commit(_bump_data_version)
+    for alert in created:
+        _after_commit(publish_event, "alert_created", **alert)
+    return len(created)
+
+
+@_write_op
+def generate_due_date_alerts(today: Optional[str] = None) -> int:
+    """
+    Fleet-wide alerts for day-based tasks due on or before today, read from
+    the due queue. Returns the number of alerts created. Tasks already alerted
+    are filtered in the same query, so a run only touches newly due ones.
+    """
+    due = list_due_by_date(through=today, unalerted=True)
+    if not due:
+        return 0
+
     conn = get_conn()
     cur = conn.cursor()
+    created: List[Dict[str, Any]] = []
+    for t in due:
+        _insert_due_alert(cur, int(t["asset_id"]), str(t["task"]), created)
+    conn.commit()
+    conn.close()
+    return _alerts_created(created)
+
+
+@_write_op
+def generate_fleet_alerts() -> int:
+    """
+    generate_maintenance_alerts for every active asset, with the task reads
+    batched and all inserts in one transaction. Returns alerts created.
+    """
+    assets = list_assets()
+    if not assets:
+        return 0
+    tasks, _ = _fleet_task_data(assets)
+    today = today_iso()
+
+    conn = get_conn()
+    cur = conn.cursor()
+    created: List[Dict[str, Any]] = []
+    for a in assets:
+        current = float(a["usage_value"] or 0.0)
+        for t in tasks[int(a["id"])]:
+            if task_state(t, current, today) == "overdue":
+                _insert_due_alert(cur, int(a["id"]), str(t["task"]), created)
+    conn.commit()
+    conn.close()
+    return _alerts_created(created)
+
+
+def list_alerts(asset_id: Optional[int] = None, include_resolved: bool = False):
+    conn = get_conn()
+    cur = _record_cursor(conn)
     sql = "SELECT * FROM alerts"
     params: List[Any] = []
     where = []
@@ -737,27 +2284,311 @@ def list_alerts(asset_id: Optional[int] = None, include_resolved: bool = False):
     if where:
         sql += " WHERE " + " AND ".join(where)
 
-    sql += " ORDER BY datetime(created_at) DESC, id DESC"
+    sql += " ORDER BY created_at DESC, id DESC"
     cur.execute(sql, params)
 
-    rows = [dict(r) for r in cur.fetchall()]
+    rows = _fetch_records(cur)
     conn.close()
     return rows
 
 
+@_write_op
 def resolve_alert(alert_id: int) -> bool:
     conn = get_conn()
     cur = conn.cursor()
-    cur.execute("UPDATE alerts SET resolved = 1 WHERE id = ?", (alert_id,))
+    cur.execute("SELECT asset_id, task FROM alerts WHERE id = ?", (alert_id,))
+    row = cur.fetchone()
+    if row is None:
+        conn.close()
+        return False
+    # Resolving twice succeeds, but only the first call is a change
+    cur.execute("UPDATE alerts SET resolved = 1 WHERE id = ? AND resolved = 0", (alert_id,))
+    changed = cur.rowcount > 0
     conn.commit()
-    ok = cur.rowcount > 0
     conn.close()
-    return ok
+    if changed:
+        _after_commit(_bump_data_version)
+        _after_commit(publish_event, "alert_resolved", alert_id=int(alert_id),
+                      asset_id=int(row[0]), task=row[1])
+    return True
+
+
+# ===========================
+# DUE INDEX (in-memory)
+# ===========================
+# Fleet-wide priority queues of upcoming maintenance, built from
+# maintenance_tasks on first use (the API builds it at startup). Usage tasks
+# are keyed by the fraction of their interval still remaining, which only
+# moves when that asset's usage or the task itself changes; day tasks by
+# next_due_date. Superseded heap entries are dropped lazily, and top-K reads
+# walk the heap best-first without popping, so a query costs O(K log K)
+# whatever the fleet size.
+# Per process, but never stale: every read first catches up from change_log
+# (which sees writes from every worker and outside these functions),
+# reloading only the asset and task rows changed since the seq it last
+# applied. A long backlog falls back to a full rebuild.
+DUE_INDEX_CATCH_UP_LIMIT = 2000
+DUE_INDEX_TABLES = ("assets", "maintenance_tasks")
+
+
+class _DueIndex:
+    TASK_COLUMNS = "id, asset_id, task, category, interval_value, last_done_value, unit, next_due_date"
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        # Serializes rebuild / catch-up; readers only ever take self.lock
+        self.refresh_lock = threading.Lock()
+        self.db_file: Optional[str] = None
+        self.seq = 0  # change_log seq the index reflects
+        self.assets: Dict[int, Dict[str, Any]] = {}
+        self.tasks: Dict[Tuple[int, str], Dict[str, Any]] = {}
+        self.task_keys: Dict[int, Tuple[int, str]] = {}  # maintenance_tasks.id -> key
+        self.asset_tasks: Dict[int, set] = {}
+        # (sort key, entry id, task key); an entry is live while live[task key] == entry id
+        self.usage_heap: List[tuple] = []
+        self.day_heap: List[tuple] = []
+        self.live: Dict[Tuple[int, str], int] = {}
+        self.entry_ids = itertools.count()
+
+    def rebuild(self) -> None:
+        with self.refresh_lock:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        conn = get_conn()
+        try:
+            # Rows and seq from one snapshot, so catch-up resumes exactly here
+            conn.execute("BEGIN")
+            seq = int(conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0])
+            assets = conn.execute(
+                "SELECT id, name, usage_value, is_active FROM assets").fetchall()
+            tasks = conn.execute(f"SELECT {self.TASK_COLUMNS} FROM maintenance_tasks").fetchall()
+        finally:
+            conn.rollback()
+            conn.close()
+
+        with self.lock:
+            self.assets, self.tasks, self.task_keys, self.asset_tasks = {}, {}, {}, {}
+            for a in assets:
+                self._load_asset(a)
+            for t in tasks:
+                self._load_task(t)
+            self.usage_heap, self.day_heap, self.live = [], [], {}
+            for key in self.tasks:
+                self._entry(key, heap=None)
+            heapq.heapify(self.usage_heap)
+            heapq.heapify(self.day_heap)
+            self.db_file = DB_FILE
+            self.seq = seq
+
+    def ensure_fresh(self) -> None:
+        with self.refresh_lock:
+            if self.db_file != DB_FILE or not self._catch_up():
+                self._rebuild()
+
+    def _catch_up(self) -> bool:
+        """Apply rows changed since self.seq; False when a full rebuild is needed."""
+        conn = get_conn()
+        try:
+            conn.execute("BEGIN")
+            latest = int(conn.execute("SELECT COALESCE(MAX(seq), 0) FROM change_log").fetchone()[0])
+            if latest == self.seq:
+                return True
+            if latest < self.seq:
+                return False  # database recreated
+            entries = conn.execute(f"""
+                SELECT table_name, row_id, op FROM change_log
+                WHERE seq > ? AND +table_name IN ({",".join("?" * len(DUE_INDEX_TABLES))})
+                ORDER BY seq
+                LIMIT ?
+            """, (self.seq, *DUE_INDEX_TABLES, DUE_INDEX_CATCH_UP_LIMIT + 1)).fetchall()
+            if len(entries) > DUE_INDEX_CATCH_UP_LIMIT:
+                return False
+            changed: Dict[str, List[int]] = {t: [] for t in DUE_INDEX_TABLES}
+            deleted: Dict[str, List[int]] = {t: [] for t in DUE_INDEX_TABLES}
+            for e in entries:
+                (changed if e[2] == "upsert" else deleted)[e[0]].append(int(e[1]))
+            assets: List[tuple] = []
+            tasks: List[tuple] = []
+            for chunk in _chunks(changed["assets"]):
+                assets += conn.execute(f"""
+                    SELECT id, name, usage_value, is_active FROM assets
+                    WHERE id IN ({",".join("?" * len(chunk))})
+                """, chunk).fetchall()
+            for chunk in _chunks(changed["maintenance_tasks"]):
+                tasks += conn.execute(f"""
+                    SELECT {self.TASK_COLUMNS} FROM maintenance_tasks
+                    WHERE id IN ({",".join("?" * len(chunk))})
+                """, chunk).fetchall()
+        finally:
+            conn.rollback()
+            conn.close()
+
+        with self.lock:
+            touched = set()
+            for asset_id in deleted["assets"]:
+                self.assets.pop(asset_id, None)
+                touched.update(self.asset_tasks.get(asset_id, ()))
+            for task_id in deleted["maintenance_tasks"]:
+                touched.add(self._drop_task(task_id))
+            for a in assets:
+                self._load_asset(a)
+                touched.update(self.asset_tasks.get(int(a[0]), ()))
+            for t in tasks:
+                touched.add(self._load_task(t))
+            for key in touched:
+                self._entry(key)
+            self.seq = latest
+        return True
+
+    def _load_asset(self, a) -> None:
+        self.assets[int(a[0])] = {"name": a[1], "usage_value": float(a[2]), "is_active": int(a[3])}
+
+    def _load_task(self, t) -> Tuple[int, str]:
+        key = (int(t[1]), str(t[2]))
+        if self.task_keys.get(int(t[0]), key) != key:
+            self._drop_task(int(t[0]))  # moved to another asset or renamed
+        self.task_keys[int(t[0])] = key
+        self.tasks[key] = {
+            "category": t[3], "interval_value": float(t[4]),
+            "last_done_value": float(t[5]), "unit": t[6], "next_due_date": t[7],
+        }
+        self.asset_tasks.setdefault(key[0], set()).add(key)
+        return key
+
+    def _drop_task(self, task_id: int) -> Optional[Tuple[int, str]]:
+        key = self.task_keys.pop(task_id, None)
+        if key is not None:
+            self.tasks.pop(key, None)
+            self.asset_tasks.get(key[0], set()).discard(key)
+        return key
+
+    def _entry(self, key: Optional[Tuple[int, str]], heap="push") -> None:
+        # heap=None appends for a later heapify (rebuild only)
+        task = self.tasks.get(key)
+        asset = self.assets.get(key[0]) if key else None
+        if task is None or asset is None or not asset["is_active"]:
+            self.live.pop(key, None)
+            return
+        if task["unit"] == DAY_UNIT:
+            if not task["next_due_date"]:
+                self.live.pop(key, None)
+                return
+            target, sort_key = self.day_heap, task["next_due_date"]
+        else:
+            interval = task["interval_value"]
+            remaining = task["last_done_value"] + interval - asset["usage_value"]
+            target, sort_key = self.usage_heap, (remaining / interval if interval > 0 else remaining)
+        entry_id = next(self.entry_ids)
+        self.live[key] = entry_id
+        if heap is None:
+            target.append((sort_key, entry_id, key))
+        else:
+            heapq.heappush(target, (sort_key, entry_id, key))
+            self._compact(target)
+
+    def _compact(self, heap: List[tuple]) -> None:
+        if len(heap) > 2 * len(self.live) + 64:
+            heap[:] = [e for e in heap if self.live.get(e[2]) == e[1]]
+            heapq.heapify(heap)
+
+    def top(self, heap: List[tuple], k: int, stop=None) -> List[tuple]:
+        # Best-first walk of the heap array: children are never smaller than
+        # their parent, so the frontier yields entries in sorted order.
+        out: List[tuple] = []
+        frontier = [(heap[0], 0)] if heap else []
+        while frontier and len(out) < k:
+            entry, i = heapq.heappop(frontier)
+            if stop is not None and entry[0] > stop:
+                break
+            if self.live.get(entry[2]) == entry[1]:
+                out.append(entry)
+            for j in (2 * i + 1, 2 * i + 2):
+                if j < len(heap):
+                    heapq.heappush(frontier, (heap[j], j))
+        return out
+
+    def describe(self, key: Tuple[int, str], today: str) -> Dict[str, Any]:
+        task = self.tasks[key]
+        asset = self.assets[key[0]]
+        interval = task["interval_value"]
+        item = {
+            "asset_id": key[0],
+            "asset_name": asset["name"],
+            "task": key[1],
+            "category": task["category"],
+            "unit": task["unit"],
+            "interval_value": interval,
+        }
+        if task["unit"] == DAY_UNIT:
+            remaining = float((date.fromisoformat(task["next_due_date"])
+                               - date.fromisoformat(today)).days)
+            item["next_due_date"] = task["next_due_date"]
+        else:
+            remaining = task["last_done_value"] + interval - asset["usage_value"]
+        item["remaining"] = round(remaining, 2)
+        item["remaining_ratio"] = round(remaining / interval, 4) if interval > 0 else None
+        return item
+
+
+_DUE_INDEX = _DueIndex()
+
+
+def rebuild_due_index() -> None:
+    _DUE_INDEX.rebuild()
+
+
+def refresh_due_index() -> None:
+    _DUE_INDEX.ensure_fresh()
+
+
+def upcoming_due(limit: int = 50, trigger: str = "usage") -> List[Dict[str, Any]]:
+    """
+    Next `limit` maintenance events on active assets, overdue first.
+    trigger="usage": ordered by the fraction of the interval remaining;
+    trigger="days": day-based tasks ordered by next_due_date.
+    """
+    index = _DUE_INDEX
+    index.ensure_fresh()
+    today = today_iso()
+    with index.lock:
+        heap = index.day_heap if trigger == DAY_UNIT else index.usage_heap
+        return [index.describe(e[2], today) for e in index.top(heap, int(limit))]
+
+
+def top_overdue_tasks(limit: int = 10) -> List[Dict[str, Any]]:
+    """
+    Most overdue tasks fleet-wide by overshoot (negative remaining_ratio).
+    Day-based candidates are the `limit` longest overdue by date, then
+    merged with usage tasks on the same ratio.
+    """
+    index = _DUE_INDEX
+    index.ensure_fresh()
+    today = today_iso()
+    with index.lock:
+        items = [index.describe(e[2], today) for e in index.top(index.usage_heap, int(limit), stop=0.0)]
+        items += [index.describe(e[2], today) for e in index.top(index.day_heap, int(limit), stop=today)]
+    overdue = [i for i in items if i["remaining"] <= 0]
+    overdue.sort(key=lambda i: i["remaining_ratio"] if i["remaining_ratio"] is not None else i["remaining"])
+    return overdue[:int(limit)]
 
 
 # ===========================
 # HEALTH / AI (simple versions)
 # ===========================
+OVERDUE_PENALTY = 15
+DUE_SOON_PENALTY = 5
+USAGE_RATE_WINDOW_DAYS = 30
+SQL_IN_CHUNK = 500  # stays under SQLite's default 999 bound parameters
+
+
+def _health_score(overdue: int, warnings: int) -> Tuple[int, str]:
+    score = 100 - overdue * OVERDUE_PENALTY - warnings * DUE_SOON_PENALTY
+    score = max(0, min(100, score))
+    risk = "GREEN" if score >= 80 else "YELLOW" if score >= 50 else "RED"
+    return score, risk
+
+
 def calculate_asset_health(asset_id: int):
     asset = get_asset(asset_id)
     if not asset:
@@ -766,21 +2597,17 @@ def calculate_asset_health(asset_id: int):
     tasks = list_maintenance_tasks(asset_id)
     overdue = 0
     warnings = 0
-    current = float(asset.get("usage_value", asset.get("engine_hours", 0.0)))
+    current = float(asset.get("usage_value", 0.0))
+    today = today_iso()
 
     for t in tasks:
-        interval = float(t["interval_value"])
-        last_done = float(t["last_done_value"])
-        since = current - last_done
-        if since >= interval:
+        state = task_state(t, current, today)
+        if state == "overdue":
             overdue += 1
-        elif since >= interval * 0.9:
+        elif state == "due_soon":
             warnings += 1
 
-    score = 100 - overdue * 15 - warnings * 5
-    score = max(0, min(100, score))
-    risk = "GREEN" if score >= 80 else "YELLOW" if score >= 50 else "RED"
-
+    score, risk = _health_score(overdue, warnings)
     return {"score": score, "risk_level": risk, "overdue_tasks": overdue, "warnings": warnings}
 
 
@@ -789,8 +2616,148 @@ def fleet_health_summary():
     return {"total_active_assets": len(assets)}
 
 
+def _chunks(ids: List[int]):
+    for i in range(0, len(ids), SQL_IN_CHUNK):
+        yield ids[i:i + SQL_IN_CHUNK]
+
+
+def _recent_usage_rates(conn, asset_ids: List[int]) -> Dict[int, float]:
+    """Mean usage per day over the last USAGE_RATE_WINDOW_DAYS of trips."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=USAGE_RATE_WINDOW_DAYS)
+              ).strftime("%Y-%m-%d %H:%M:%S")
+    rates: Dict[int, float] = {}
+    for chunk in _chunks(asset_ids):
+        marks = ",".join("?" * len(chunk))
+        for asset_id, total in conn.execute(f"""
+            SELECT asset_id, SUM(usage_added)
+            FROM trip_events
+            WHERE asset_id IN ({marks}) AND created_at >= ?
+            GROUP BY asset_id
+        """, (*chunk, cutoff)):
+            rates[int(asset_id)] = float(total) / USAGE_RATE_WINDOW_DAYS
+    return rates
+
+
+def _days_to_due(task, remaining: float, usage_rate: Optional[float]) -> Optional[float]:
+    # None: usage-based, not yet due, and no recent trips to project from
+    if task.get("unit") == DAY_UNIT:
+        return max(0.0, remaining)
+    if remaining <= 0:
+        return 0.0
+    return remaining / usage_rate if usage_rate else None
+
+
+def _explain(asset, tasks, usage_rate: Optional[float], top_n: int, today: str) -> Dict[str, Any]:
+    current = float(asset.get("usage_value", 0.0))
+    overdue = 0
+    warnings = 0
+    ranked = []
+    for i, t in enumerate(tasks):
+        state = task_state(t, current, today)
+        if state == "overdue":
+            overdue += 1
+            penalty = OVERDUE_PENALTY
+        elif state == "due_soon":
+            warnings += 1
+            penalty = DUE_SOON_PENALTY
+        else:
+            penalty = 0
+        interval = float(t["interval_value"])
+        since = task_since_last(t, current, today)
+        overshoot = (since - interval) / interval if interval > 0 else since
+        ranked.append((penalty, overshoot, -i, since, state))
+
+    factors = []
+    # Bounded heap: O(tasks log top_n), ties keep the listing order
+    for penalty, overshoot, neg_i, since, state in heapq.nlargest(top_n, ranked):
+        t = tasks[-neg_i]
+        interval = float(t["interval_value"])
+        days_to_due = _days_to_due(t, interval - since, usage_rate)
+        factors.append({
+            "task": t["task"],
+            "category": t.get("category") or "General",
+            "unit": t.get("unit"),
+            "state": state,
+            "score_impact": -penalty,
+            "interval_value": interval,
+            "since_last": round(since, 2),
+            "overshoot_ratio": round(overshoot, 4),
+            "past_due": round(max(0.0, since - interval), 2),
+            "projected_days_to_due": round(days_to_due, 1) if days_to_due is not None else None,
+        })
+
+    score, risk = _health_score(overdue, warnings)
+    return {
+        "asset_id": int(asset["id"]),
+        "score": score,
+        "risk_level": risk,
+        "overdue_tasks": overdue,
+        "warnings": warnings,
+        "usage_rate_per_day": round(usage_rate, 3) if usage_rate is not None else None,
+        "factors": factors,
+    }
+
+
+def _fleet_task_data(assets: List[Record]) -> Tuple[Dict[int, List[Record]], Dict[int, float]]:
+    """Tasks per asset and recent usage rates for `assets`, in one pass."""
+    ids = [int(a["id"]) for a in assets]
+    tasks: Dict[int, List[Record]] = {i: [] for i in ids}
+    conn = get_conn()
+    cur = _record_cursor(conn)
+    for chunk in _chunks(ids):
+        cur.execute(f"""
+            SELECT asset_id, task, interval_value, last_done_value, unit, category, last_done_date, next_due_date
+            FROM maintenance_tasks
+            WHERE asset_id IN ({",".join("?" * len(chunk))})
+            ORDER BY asset_id, category, task
+        """, chunk)
+        for t in _fetch_records(cur):
+            tasks[int(t["asset_id"])].append(t)
+    rates = _recent_usage_rates(conn, ids)
+    conn.close()
+    return tasks, rates
+
+
+def _explain_assets(assets: List[Record], top_n: int) -> Dict[int, Dict[str, Any]]:
+    tasks, rates = _fleet_task_data(assets)
+    today = today_iso()
+    top_n = max(0, int(top_n))
+    return {
+        int(a["id"]): _explain(a, tasks[int(a["id"])], rates.get(int(a["id"])), top_n, today)
+        for a in assets
+    }
+
+
+def explain_fleet_health(asset_ids: Optional[List[int]] = None, top_n: int = 5) -> Dict[int, Dict[str, Any]]:
+    """
+    explain_asset_health for many assets (default: every active one) with a
+    fixed number of queries instead of a few per asset. Unknown ids are left out.
+    """
+    if asset_ids is None:
+        assets = list_assets(True)
+    else:
+        assets = []
+        conn = get_conn()
+        cur = _record_cursor(conn)
+        for chunk in _chunks(sorted({int(i) for i in asset_ids})):
+            cur.execute(
+                f"SELECT * FROM assets WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            assets.extend(_fetch_records(cur))
+        conn.close()
+    return _explain_assets(assets, top_n)
+
+
 def explain_asset_health(asset_id: int, top_n: int = 5):
-    return calculate_asset_health(asset_id)
+    """
+    calculate_asset_health plus the top_n tasks behind the score, worst
+    first: state, score impact, overshoot ratio (how far past the interval,
+    as a fraction of it), usage past due and projected days to due from the
+    recent usage rate.
+    """
+    explained = explain_fleet_health([asset_id], top_n).get(int(asset_id))
+    if explained is None:
+        return {"score": 0, "risk_level": "RED", "overdue_tasks": 0, "warnings": 0, "factors": []}
+    return explained
 
 
 def predict_maintenance_window(asset_id: int, horizon_hours: int = 50):
@@ -801,31 +2768,175 @@ def fleet_maintenance_forecast(horizon_hours: int = 50, limit: int = 10):
     return {"horizon_hours": horizon_hours, "count": 0, "top": []}
 
 
+BRIEF_TOP_TASKS = 10
+USAGE_TREND_DAYS = 7
+
+
+def _usage_trend(conn) -> Dict[str, Dict[str, Any]]:
+    """Usage logged per unit in the last USAGE_TREND_DAYS vs the window before."""
+    now = datetime.now(timezone.utc)
+    recent = (now - timedelta(days=USAGE_TREND_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    previous = (now - timedelta(days=2 * USAGE_TREND_DAYS)).strftime("%Y-%m-%d %H:%M:%S")
+    trend = {}
+    for unit, last, prev in conn.execute("""
+        SELECT unit,
+               SUM(CASE WHEN created_at >= ? THEN usage_added ELSE 0 END),
+               SUM(CASE WHEN created_at < ? THEN usage_added ELSE 0 END)
+        FROM trip_events
+        WHERE created_at >= ?
+        GROUP BY unit
+    """, (recent, recent, previous)):
+        trend[unit] = {
+            "last_window": round(float(last), 2),
+            "previous_window": round(float(prev), 2),
+            "change_pct": round((last - prev) / prev * 100, 1) if prev else None,
+        }
+    return trend
+
+
 def fleet_ai_brief(horizon_hours: int = 50):
-    return {"horizon_hours": horizon_hours, "health_summary": fleet_health_summary()}
+    """
+    Full fleet brief; expensive (every active asset and task). The API serves
+    it from fleet_brief_snapshots, refreshed in the background.
+    A task counts as due within the horizon when its projected time to due
+    (recent usage rate, or the calendar for day-based tasks) is at most
+    horizon_hours of wall-clock time.
+    """
+    assets = list_assets(True)
+    tasks, rates = _fleet_task_data(assets)
+    today = today_iso()
+    horizon_days = float(horizon_hours) / 24.0
+
+    risk = {"GREEN": 0, "YELLOW": 0, "RED": 0}
+    forecast = {"overdue": 0, "due_within_horizon": 0, "unprojectable": 0, "by_category": {}}
+    for a in assets:
+        asset_id = int(a["id"])
+        current = float(a.get("usage_value", 0.0))
+        overdue = warnings = 0
+        for t in tasks[asset_id]:
+            state = task_state(t, current, today)
+            overdue += state == "overdue"
+            warnings += state == "due_soon"
+            remaining = float(t["interval_value"]) - task_since_last(t, current, today)
+            days = _days_to_due(t, remaining, rates.get(asset_id))
+            if state == "overdue":
+                forecast["overdue"] += 1
+            elif days is None:
+                forecast["unprojectable"] += 1
+                continue
+            elif days <= horizon_days:
+                forecast["due_within_horizon"] += 1
+            else:
+                continue
+            cat = t.get("category") or "General"
+            forecast["by_category"][cat] = forecast["by_category"].get(cat, 0) + 1
+        risk[_health_score(overdue, warnings)[1]] += 1
+
+    conn = get_conn()
+    alerts = {
+        severity: int(count) for severity, count in conn.execute(
+            "SELECT severity, COUNT(*) FROM alerts WHERE resolved = 0 GROUP BY severity")
+    }
+    trend = _usage_trend(conn)
+    conn.close()
+
+    return {
+        "horizon_hours": horizon_hours,
+        "health_summary": {"total_active_assets": len(assets)},
+        "risk_distribution": risk,
+        "top_overdue_tasks": top_overdue_tasks(BRIEF_TOP_TASKS),
+        "forecast": forecast,
+        "usage_trend": {"window_days": USAGE_TREND_DAYS, "by_unit": trend},
+        "open_alerts_by_severity": alerts,
+    }
+
+
+# ===========================
+# BRIEF SNAPSHOTS
+# ===========================
+BRIEF_FINGERPRINT_SCOPES = ["assets", "maintenance_tasks", "trip_events", "service_events", "alerts"]
+
+
+def brief_fingerprint() -> str:
+    """Fleet data state a brief depends on; shared by every process on the DB."""
+    counters = get_change_counters(BRIEF_FINGERPRINT_SCOPES)
+    return "p{}-{}-{}".format(PAYLOAD_VERSION, "-".join(str(v) for v in counters.values()), today_iso())
+
+
+@_write_op
+def save_brief_snapshot(horizon_hours: int, fingerprint: str, payload: Dict[str, Any],
+                        build_ms: float = 0.0) -> None:
+    conn = get_conn()
+    conn.execute("""
+        INSERT INTO fleet_brief_snapshots (horizon_hours, fingerprint, generated_at, build_ms, payload)
+        VALUES (?, ?, CURRENT_TIMESTAMP, ?, ?)
+        ON CONFLICT(horizon_hours) DO UPDATE SET
+            fingerprint = excluded.fingerprint,
+            generated_at = excluded.generated_at,
+            build_ms = excluded.build_ms,
+            payload = excluded.payload;
+    """, (int(horizon_hours), fingerprint, float(build_ms), json.dumps(payload)))
+    conn.commit()
+    conn.close()
+
+
+def get_brief_snapshot(horizon_hours: int) -> Optional[Dict[str, Any]]:
+    conn = get_conn()
+    row = conn.execute("""
+        SELECT fingerprint, generated_at, build_ms, payload
+        FROM fleet_brief_snapshots WHERE horizon_hours = ?
+    """, (int(horizon_hours),)).fetchone()
+    conn.close()
+    # Written by a build with another payload shape: as good as missing
+    if row is None or not row[0].startswith(f"p{PAYLOAD_VERSION}-"):
+        return None
+    return {
+        "horizon_hours": int(horizon_hours),
+        "fingerprint": row[0],
+        "generated_at": row[1],
+        "build_ms": row[2],
+        "data": json.loads(row[3]),
+    }
+
+
+def refresh_brief_snapshot(horizon_hours: int, fingerprint: Optional[str] = None) -> Dict[str, Any]:
+    fingerprint = fingerprint or brief_fingerprint()
+    # Read before the build, so the payload is never older than its stamp:
+    # the due index behind top_overdue_tasks catches up from change_log first
+    start = time.perf_counter()
+    payload = fleet_ai_brief(horizon_hours)
+    build_ms = (time.perf_counter() - start) * 1000
+    save_brief_snapshot(horizon_hours, fingerprint, payload, build_ms)
+    return get_brief_snapshot(horizon_hours)
+
+
+DASHBOARD_FACTORS = 3
 
 
 def fleet_dashboard(limit_assets: int = 5, limit_tasks: int = 10):
     assets = list_assets(True)
+    health = _explain_assets(assets, DASHBOARD_FACTORS)
     scored = []
     for a in assets:
-        h = calculate_asset_health(int(a["id"]))
+        h = health[int(a["id"])]
         scored.append({
             "id": a["id"],
             "name": a["name"],
             "type": a["type"],
-            "engine_hours": a["engine_hours"],
+            "usage_value": a["usage_value"],
+            "usage_unit": a["usage_unit"],
             "score": h["score"],
             "risk_level": h["risk_level"],
             "overdue_tasks": h["overdue_tasks"],
             "warnings": h["warnings"],
+            "top_factors": h["factors"],
         })
     scored.sort(key=lambda x: (
         x["score"], -x["overdue_tasks"], -x["warnings"]))
     return {
         "summary": {"active_assets": len(assets)},
         "top_risky_assets": scored[:int(limit_assets)],
-        "top_overdue_tasks": [],
+        "top_overdue_tasks": top_overdue_tasks(limit_tasks),
     }
 
 
@@ -844,6 +2955,28 @@ def _normalize_scope(scope: str, is_admin: bool = False) -> str:
     return s
 
 
+def default_feature_scopes(scope: str) -> Tuple[str, ...]:
+    if scope in {"write", ADMIN_SCOPE}:
+        return FEATURE_SCOPES
+    return tuple(f for f in FEATURE_SCOPES if f.endswith(":read"))
+
+
+def _insert_feature_scopes(conn, key_id: int, feature_scopes) -> None:
+    conn.executemany("""
+        INSERT OR IGNORE INTO api_key_feature_scopes (api_key_id, feature_scope)
+        VALUES (?, ?)
+    """, [(int(key_id), str(f)) for f in feature_scopes])
+
+
+def _load_feature_scopes(conn, key_id: int) -> frozenset:
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT feature_scope FROM api_key_feature_scopes WHERE api_key_id = ?",
+        (int(key_id),),
+    )
+    return frozenset(r[0] for r in cur.fetchall())
+
+
 def _active_admin_exists(conn) -> bool:
     cur = conn.cursor()
     cur.execute("""
@@ -855,6 +2988,7 @@ def _active_admin_exists(conn) -> bool:
     return cur.fetchone() is not None
 
 
+@_write_op
 def create_api_key(label: str = DEFAULT_LABEL, is_admin: bool = False, scope: str = DEFAULT_SCOPE) -> str:
     key = secrets.token_urlsafe(32)
     scope_norm = _normalize_scope(scope, is_admin=is_admin)
@@ -873,6 +3007,9 @@ def create_api_key(label: str = DEFAULT_LABEL, is_admin: bool = False, scope: st
         INSERT INTO api_keys (api_key, api_key_salt, label, is_active, is_admin, scope)
         VALUES (?, ?, ?, 1, ?, ?)
     """, (hashed, salt, label, 1 if is_admin else 0, scope_norm))
+    if not is_admin:
+        _insert_feature_scopes(conn, int(cur.lastrowid),
+                               default_feature_scopes(scope_norm))
     conn.commit()
     conn.close()
     return key
@@ -909,8 +3046,10 @@ def get_api_key_record(raw_key: str) -> Optional[Dict[str, Any]]:
             continue
         candidate = _hash_api_key(raw_key, str(salt))
         if hmac.compare_digest(candidate, str(row["api_key"])):
+            rec = dict(row)
+            rec["feature_scopes"] = _load_feature_scopes(conn, int(row["id"]))
             conn.close()
-            return dict(row)
+            return rec
     conn.close()
     return None
 
@@ -924,6 +3063,7 @@ def is_valid_api_key(raw_key: str) -> bool:
     return get_api_key_record(raw_key) is not None
 
 
+@_write_op
 def touch_api_key_last_used(key_id: int) -> None:
     conn = get_conn()
     cur = conn.cursor()
@@ -953,10 +3093,21 @@ def list_api_keys(include_inactive: bool = False) -> List[Dict[str, Any]]:
     sql += " ORDER BY id DESC"
     cur.execute(sql)
     rows = [dict(r) for r in cur.fetchall()]
+    cur.execute("""
+        SELECT api_key_id, feature_scope
+        FROM api_key_feature_scopes
+        ORDER BY feature_scope
+    """)
+    by_key: Dict[int, List[str]] = {}
+    for r in cur.fetchall():
+        by_key.setdefault(int(r["api_key_id"]), []).append(r["feature_scope"])
     conn.close()
+    for row in rows:
+        row["feature_scopes"] = by_key.get(int(row["id"]), [])
     return rows
 
 
+@_write_op
 def revoke_api_key(key_id: int) -> bool:
     conn = get_conn()
     cur = conn.cursor()
@@ -968,6 +3119,7 @@ def revoke_api_key(key_id: int) -> bool:
     return ok
 
 
+@_write_op
 def set_api_key_admin(key_id: int, is_admin: bool) -> Tuple[bool, str]:
     conn = get_conn()
     cur = conn.cursor()
@@ -996,6 +3148,7 @@ def set_api_key_admin(key_id: int, is_admin: bool) -> Tuple[bool, str]:
     return ok, "ok" if ok else "not_found"
 
 
+@_write_op
 def set_api_key_scope(key_id: int, scope: str) -> Tuple[bool, str]:
     scope_norm = _normalize_scope(scope, is_admin=False)
     conn = get_conn()
@@ -1011,6 +3164,9 @@ def set_api_key_scope(key_id: int, scope: str) -> Tuple[bool, str]:
         return False, "conflict"
     cur.execute("UPDATE api_keys SET scope = ? WHERE id = ?",
                 (scope_norm, int(key_id)))
+    # Upgrades pick up the new scope's defaults; explicit revocations of
+    # other feature scopes are left alone.
+    _insert_feature_scopes(conn, int(key_id), default_feature_scopes(scope_norm))
     conn.commit()
     ok = cur.rowcount > 0
     conn.close()
@@ -1025,24 +3181,68 @@ def is_admin_with_scope(raw_key: str, required_scope: str) -> bool:
     return get_api_key_scope(raw_key) == ADMIN_SCOPE
 
 
-def has_scope(raw_key: str, required: str) -> bool:
+def record_has_scope(rec: Optional[Dict[str, Any]], required: str) -> bool:
     """
-    Feature scope placeholder.
-    For now, we allow:
+    Feature scope check against an already-verified key record (no DB access).
       - admin scope => everything
-      - otherwise: feature scopes are NOT stored in DB yet, so return False unless you expand schema later.
+      - otherwise: membership in the frozenset loaded by get_api_key_record
     """
-    scope = get_api_key_scope(raw_key)
-    if scope == "admin":
+    if not rec:
+        return False
+    if rec.get("scope") == ADMIN_SCOPE:
         return True
+    return required in rec.get("feature_scopes", ())
 
-    # If you later store feature scopes in DB, implement lookup here.
-    return False
+
+def has_scope(raw_key: str, required: str) -> bool:
+    return record_has_scope(get_api_key_record(raw_key), required)
+
+
+def list_feature_scopes(key_id: int) -> Optional[List[str]]:
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT 1 FROM api_keys WHERE id = ?", (int(key_id),))
+    if cur.fetchone() is None:
+        conn.close()
+        return None
+    scopes = sorted(_load_feature_scopes(conn, int(key_id)))
+    conn.close()
+    return scopes
+
+
+@_write_op
+def update_feature_scopes(key_id: int, grant: List[str], revoke: List[str]) -> Tuple[bool, str]:
+    """
+    Grant/revoke feature scopes for a key. Records load their scopes at
+    verification, so changes apply from the key's next request.
+    """
+    unknown = [f for f in list(grant) + list(revoke) if f not in FEATURE_SCOPES]
+    if unknown:
+        return False, "invalid"
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("SELECT is_admin FROM api_keys WHERE id = ?", (int(key_id),))
+    row = cur.fetchone()
+    if not row:
+        conn.close()
+        return False, "not_found"
+    if int(row["is_admin"] or 0) == 1:
+        conn.close()
+        return False, "conflict"
+    _insert_feature_scopes(conn, int(key_id), grant)
+    cur.executemany("""
+        DELETE FROM api_key_feature_scopes
+        WHERE api_key_id = ? AND feature_scope = ?
+    """, [(int(key_id), str(f)) for f in revoke])
+    conn.commit()
+    conn.close()
+    return True, "ok"
 
 
 # ===========================
 # AUDIT LOG WRITER
 # ===========================
+@_write_op
 def write_audit_log(api_key_id: Optional[int], scope: Optional[str], method: str, path: str,
                     status_code: int, success: bool):
     conn = get_conn()
@@ -1055,20 +3255,36 @@ def write_audit_log(api_key_id: Optional[int], scope: Optional[str], method: str
     conn.close()
 
 
+@_write_op
+def write_audit_logs(entries: List[Dict[str, Any]]) -> None:
+    """write_audit_log for many entries (same keys as its arguments), one commit."""
+    if not entries:
+        return
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.executemany("""
+        INSERT INTO audit_logs (api_key_id, scope, method, path, status_code, success, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    """, [(e.get("api_key_id"), e.get("scope") or None, e["method"], e["path"],
+           int(e["status_code"]), 1 if e["success"] else 0) for e in entries])
+    conn.commit()
+    conn.close()
+
+
 def list_audit_logs(limit: int = 50, offset: int = 0) -> Dict[str, Any]:
     limit = max(1, min(int(limit), 200))
     offset = max(0, int(offset))
     conn = get_conn()
-    cur = conn.cursor()
+    cur = _record_cursor(conn)
     cur.execute("SELECT COUNT(1) AS total FROM audit_logs")
-    total = int(cur.fetchone()["total"])
+    total = int(cur.fetchone()[0])
     cur.execute("""
         SELECT id, api_key_id, scope, method, path, status_code, success, timestamp
         FROM audit_logs
-        ORDER BY datetime(timestamp) DESC, id DESC
+        ORDER BY timestamp DESC, id DESC
         LIMIT ? OFFSET ?
     """, (limit, offset))
-    rows = [dict(r) for r in cur.fetchall()]
+    rows = _fetch_records(cur)
     conn.close()
     return {
         "items": rows,
@@ -1081,6 +3297,298 @@ def list_audit_logs(limit: int = 50, offset: int = 0) -> Dict[str, Any]:
     }
 
 
+# ===========================
+# HOUSEKEEPING (scheduled jobs)
+# ===========================
+AUDIT_COMPACT_BATCH = 5000
+
+
+def compact_audit_logs(retention_days: int, batch_size: int = AUDIT_COMPACT_BATCH) -> int:
+    """
+    Delete audit_logs older than retention_days, oldest first, one short
+    write transaction per batch so request audit writes are not held off.
+    Returns rows deleted.
+    """
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=int(retention_days))).strftime("%Y-%m-%d %H:%M:%S")
+    deleted = 0
+    conn = get_conn()
+    while True:
+        cur = conn.execute("""
+            DELETE FROM audit_logs
+            WHERE id IN (
+                SELECT id FROM audit_logs
+                WHERE timestamp < ?
+                ORDER BY timestamp, id
+                LIMIT ?
+            )
+        """, (cutoff, int(batch_size)))
+        conn.commit()
+        deleted += cur.rowcount
+        if cur.rowcount < batch_size:
+            break
+    conn.close()
+    return deleted
+
+
+def prune_brief_snapshots(keep_horizons: List[int]) -> int:
+    """Drop snapshots for horizons nobody refreshes any more."""
+    conn = get_conn()
+    keep = [int(h) for h in keep_horizons] or [-1]
+    cur = conn.execute(
+        f"DELETE FROM fleet_brief_snapshots WHERE horizon_hours NOT IN ({','.join('?' * len(keep))})",
+        keep)
+    conn.commit()
+    conn.close()
+    return cur.rowcount
+
+
+OPTIMIZE_ANALYSIS_LIMIT = 400
+
+
+def optimize_db() -> List[str]:
+    """
+    PRAGMA optimize with a bounded ANALYZE sample (0x10002: consider every
+    table, not only ones this connection queried). Statistics only change
+    for tables whose row counts drifted, so plans stay stable run to run.
+    Returns the statements the optimizer would run, for the job log.
+    """
+    conn = get_conn()
+    conn.execute(f"PRAGMA analysis_limit = {int(OPTIMIZE_ANALYSIS_LIMIT)}")
+    planned = [r[0] for r in conn.execute("PRAGMA optimize(0x10003)").fetchall()]
+    conn.execute("PRAGMA optimize(0x10002)")
+    conn.close()
+    return planned
+
+
+# ===========================
+# JOB LEASES
+# ===========================
+def acquire_job_lease(name: str, owner: str, lease_seconds: float,
+                      due_only: bool = True) -> Tuple[bool, Optional[float]]:
+    """
+    Take the run lease for job `name` unless another owner holds an unexpired
+    one or (due_only) the shared next_run_at is still ahead. Returns
+    (acquired, next_run_at as stored).
+    """
+    now = time.time()
+    conn = get_conn()
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("INSERT OR IGNORE INTO job_leases (name) VALUES (?)", (name,))
+        row = conn.execute(
+            "SELECT owner, lease_until, next_run_at FROM job_leases WHERE name = ?", (name,)
+        ).fetchone()
+        held = row[1] > now and row[0] not in (None, owner)
+        if held or (due_only and row[2] > now):
+            conn.rollback()
+            return False, row[2]
+        conn.execute("""
+            UPDATE job_leases SET owner = ?, lease_until = ?, last_started_at = ?
+            WHERE name = ?
+        """, (owner, now + float(lease_seconds), now, name))
+        conn.commit()
+        return True, row[2]
+    finally:
+        conn.close()
+
+
+@_write_op
+def release_job_lease(name: str, owner: str, next_run_at: float, status: str) -> bool:
+    """Record the run and free the lease; a no-op if `owner` lost it meanwhile."""
+    conn = get_conn()
+    cur = conn.execute("""
+        UPDATE job_leases
+        SET owner = NULL, lease_until = 0, next_run_at = ?, last_finished_at = ?, last_status = ?
+        WHERE name = ? AND owner = ?
+    """, (float(next_run_at), time.time(), status, name, owner))
+    conn.commit()
+    conn.close()
+    return cur.rowcount == 1
+
+
+def list_job_leases() -> Dict[str, Dict[str, Any]]:
+    conn = get_conn()
+    rows = conn.execute("""
+        SELECT name, owner, lease_until, next_run_at, last_started_at, last_finished_at, last_status
+        FROM job_leases
+    """).fetchall()
+    conn.close()
+    return {r[0]: dict(r) for r in rows}
+
+
+# ===========================
+# WEBHOOK OUTBOX
+# ===========================
+# Writers call _enqueue_webhooks inside their own transaction, so an event
+# is queued for delivery if and only if it commits. webhooks.py delivers.
+OUTBOX_STATUSES = ("pending", "delivered", "dead")
+
+
+def _enqueue_webhooks(cur, event_type: str, data: Dict[str, Any]) -> None:
+    body = json.dumps({
+        "type": event_type,
+        "occurred_at": datetime.now(timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "data": data,
+    }, separators=(",", ":"))
+    cur.execute("""
+        INSERT INTO webhook_outbox (endpoint_id, event_type, payload, next_attempt_at)
+        SELECT id, ?, ?, ? FROM webhook_endpoints WHERE is_active = 1
+    """, (event_type, body, time.time()))
+
+
+@_write_op
+def create_webhook_endpoint(url: str, secret: Optional[str] = None) -> int:
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("INSERT INTO webhook_endpoints (url, secret) VALUES (?, ?)", (url, secret or None))
+    endpoint_id = int(cur.lastrowid)
+    conn.commit()
+    conn.close()
+    return endpoint_id
+
+
+def list_webhook_endpoints() -> List[Dict[str, Any]]:
+    conn = get_conn()
+    rows = conn.execute("""
+        SELECT id, url, secret IS NOT NULL AS signed, is_active, created_at
+        FROM webhook_endpoints ORDER BY id
+    """).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+@_write_op
+def set_webhook_endpoint_active(endpoint_id: int, active: bool) -> bool:
+    """
+    Deactivating dead-letters the endpoint's pending rows (delivery skips
+    inactive endpoints, so they would stay pending forever); they can be
+    requeued once it is active again.
+    """
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("UPDATE webhook_endpoints SET is_active = ? WHERE id = ?",
+                (1 if active else 0, int(endpoint_id)))
+    ok = cur.rowcount > 0
+    if ok and not active:
+        cur.execute("""
+            UPDATE webhook_outbox SET status = 'dead', last_error = 'endpoint deactivated'
+            WHERE endpoint_id = ? AND status = 'pending'
+        """, (int(endpoint_id),))
+    conn.commit()
+    conn.close()
+    return ok
+
+
+def due_webhook_deliveries(limit: int, now: Optional[float] = None) -> List[Dict[str, Any]]:
+    """Pending outbox rows whose next attempt is due, oldest first."""
+    conn = get_conn()
+    rows = conn.execute("""
+        SELECT o.id, o.endpoint_id, e.url, e.secret, o.event_type, o.payload, o.attempts
+        FROM webhook_outbox o
+        JOIN webhook_endpoints e ON e.id = o.endpoint_id
+        WHERE o.status = 'pending' AND o.next_attempt_at <= ? AND e.is_active = 1
+        ORDER BY o.next_attempt_at
+        LIMIT ?
+    """, (time.time() if now is None else now, int(limit))).fetchall()
+    conn.close()
+    return [dict(r) for r in rows]
+
+
+@_write_op
+def record_webhook_results(results: List[Dict[str, Any]]) -> None:
+    """
+    Apply one delivery round in a single transaction. Each result has id,
+    status, attempts, next_attempt_at, status_code and error.
+    """
+    if not results:
+        return
+    conn = get_conn()
+    conn.executemany("""
+        UPDATE webhook_outbox
+        SET status = :status,
+            attempts = :attempts,
+            next_attempt_at = :next_attempt_at,
+            last_status_code = :status_code,
+            last_error = :error,
+            delivered_at = CASE WHEN :status = 'delivered' THEN CURRENT_TIMESTAMP END
+        WHERE id = :id AND status = 'pending'
+    """, results)
+    conn.commit()
+    conn.close()
+
+
+def list_webhook_outbox(status: Optional[str] = None, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+    limit = max(1, min(int(limit), 200))
+    offset = max(0, int(offset))
+    where, params = ("WHERE status = ?", [status]) if status else ("", [])
+    conn = get_conn()
+    total = int(conn.execute(f"SELECT COUNT(1) FROM webhook_outbox {where}", params).fetchone()[0])
+    cur = _record_cursor(conn)
+    cur.execute(f"""
+        SELECT id, endpoint_id, event_type, status, attempts, next_attempt_at,
+               last_status_code, last_error, created_at, delivered_at, payload
+        FROM webhook_outbox {where}
+        ORDER BY id DESC
+        LIMIT ? OFFSET ?
+    """, params + [limit, offset])
+    rows = _fetch_records(cur)
+    conn.close()
+    return {
+        "items": rows,
+        "page": {"limit": limit, "offset": offset, "total": total,
+                 "has_more": (offset + limit) < total},
+    }
+
+
+@_write_op
+def retry_webhook_delivery(delivery_id: int) -> bool:
+    """Requeue a dead-lettered delivery with a fresh attempt budget (active endpoints only)."""
+    conn = get_conn()
+    cur = conn.cursor()
+    cur.execute("""
+        UPDATE webhook_outbox
+        SET status = 'pending', attempts = 0, next_attempt_at = ?, last_error = NULL
+        WHERE id = ? AND status = 'dead'
+          AND endpoint_id IN (SELECT id FROM webhook_endpoints WHERE is_active = 1)
+    """, (time.time(), int(delivery_id)))
+    conn.commit()
+    ok = cur.rowcount > 0
+    conn.close()
+    return ok
+
+
+def webhook_outbox_counts() -> Dict[str, int]:
+    conn = get_conn()
+    counts = {s: int(conn.execute(
+        "SELECT COUNT(1) FROM webhook_outbox WHERE status = ?", (s,)).fetchone()[0])
+        for s in OUTBOX_STATUSES}
+    conn.close()
+    return counts
+
+
+def purge_webhook_outbox(retention_days: int) -> int:
+    """Delete delivered rows older than retention_days; dead letters stay."""
+    cutoff = (datetime.now(timezone.utc) - timedelta(days=int(retention_days))).strftime("%Y-%m-%d %H:%M:%S")
+    deleted = 0
+    conn = get_conn()
+    while True:
+        cur = conn.execute("""
+            DELETE FROM webhook_outbox
+            WHERE id IN (
+                SELECT id FROM webhook_outbox
+                WHERE status = 'delivered' AND delivered_at < ?
+                ORDER BY id
+                LIMIT ?
+            )
+        """, (cutoff, AUDIT_COMPACT_BATCH))
+        conn.commit()
+        deleted += cur.rowcount
+        if cur.rowcount < AUDIT_COMPACT_BATCH:
+            break
+    conn.close()
+    return deleted
+
+
 # ===========================
 # MAINTENANCE TEMPLATE SEEDING
 # ===========================
@@ -1122,12 +3630,13 @@ def maintenance_template(asset_type: str):
     ]
 
 
+@_write_op
 def seed_maintenance_from_template(asset_id: int, asset_type: str, set_last_done_to_current: bool = True):
     asset = get_asset(asset_id)
     if not asset:
         return {"ok": False, "error": "Asset not found"}
 
-    current = float(asset.get("usage_value", asset.get("engine_hours", 0.0)))
+    current = float(asset.get("usage_value", 0.0))
     unit = asset.get("usage_unit") or default_usage_unit(
         asset.get("type", "unknown"))
 
@@ -1136,7 +3645,7 @@ def seed_maintenance_from_template(asset_id: int, asset_type: str, set_last_done
     seeded = 0
     for t in tasks:
         interval_value = float(
-            t.get("interval_value", t.get("interval_hours", 0)))
+            t.get("interval_value", 0))
         last_done_value = current if set_last_done_to_current else 0.0
 
         upsert_task(
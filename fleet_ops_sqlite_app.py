@@ -4,9 +4,11 @@ import shutil
 
 from fleet_db import (
     init_db,
-    list_assets_with_index,
     list_assets,
-    upsert_asset,
+    create_asset,
+    default_usage_unit,
+    task_since_last,
+    DAY_UNIT,
     upsert_task,
     log_trip,
     list_trip_events,
@@ -62,6 +64,10 @@ def normalize_asset_type(asset_type: str) -> str:
     return alias.get(asset_type, asset_type)
 
 
+def asset_unit(asset) -> str:
+    return asset.get("usage_unit") or default_usage_unit(asset["type"])
+
+
 def print_tabs():
     print("\n=== Fleet Ops (SQLite) ===")
     print("1) Trips")
@@ -71,7 +77,7 @@ def print_tabs():
 
 
 def choose_asset(include_archived: bool = False):
-    assets = list_assets_with_index(active_only=not include_archived)
+    assets = list_assets(active_only=not include_archived)
     if not assets:
         print("❌ No assets in DB. Add one first.")
         return None
@@ -80,7 +86,7 @@ def choose_asset(include_archived: bool = False):
     for i, a in enumerate(assets):
         status = "" if int(a.get("is_active", 1)) == 1 else " (ARCHIVED)"
         print(
-            f"{i} - {a['name']} [{a['type']}] | {float(a['engine_hours']):.1f} hrs{status}")
+            f"{i} - {a['name']} [{a['type']}] | {float(a['usage_value']):.1f} {asset_unit(a)}{status}")
 
     choice = input("Select asset number: ").strip()
     try:
@@ -92,28 +98,27 @@ def choose_asset(include_archived: bool = False):
 
 
 def refresh_asset(asset_id: int):
-    for a in list_assets_with_index(active_only=False):
+    for a in list_assets(active_only=False):
         if int(a["id"]) == int(asset_id):
             return a
     return None
 
 
 def compute_due_from_tasks(asset, tasks):
-    current = float(asset["engine_hours"])
+    current = float(asset["usage_value"])
     due = []
     for t in tasks:
-        interval = float(t["interval_hours"])
-        last_done = float(t["last_done_hours"])
-        since_last = current - last_done
+        interval = float(t["interval_value"])
+        since_last = task_since_last(t, current)
         if since_last >= interval:
             due.append({
                 "task": t["task"],
                 "category": t.get("category", "General"),
-                "interval_hours": interval,
+                "interval_value": interval,
                 "since_last": since_last,
             })
     due.sort(key=lambda x: (x["category"], -
-             (x["since_last"] - x["interval_hours"])))
+             (x["since_last"] - x["interval_value"])))
     return due
 
 
@@ -122,159 +127,159 @@ def maintenance_template(asset_type: str):
     if asset_type == "jet":
         # 7+ meaningful insights for jets
         return [
-            {"task": "Preflight Inspection", "interval_hours": 10,
-                "last_done_hours": 0.0, "category": "Inspection"},
-            {"task": "A-Check (basic systems)", "interval_hours": 50,
-             "last_done_hours": 0.0, "category": "Inspection"},
-            {"task": "Engine Oil Service", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Engine"},
-            {"task": "Hydraulic System Check", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Systems"},
-            {"task": "Avionics / NAV Database Update", "interval_hours": 60,
-                "last_done_hours": 0.0, "category": "Avionics"},
-            {"task": "Landing Gear Inspection", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Airframe"},
-            {"task": "Fuel System Inspection", "interval_hours": 150,
-                "last_done_hours": 0.0, "category": "Fuel"},
-            {"task": "Cabin Safety Equipment Check", "interval_hours": 50,
-                "last_done_hours": 0.0, "category": "Safety"},
+            {"task": "Preflight Inspection", "interval_value": 10,
+                "last_done_value": 0.0, "category": "Inspection"},
+            {"task": "A-Check (basic systems)", "interval_value": 50,
+             "last_done_value": 0.0, "category": "Inspection"},
+            {"task": "Engine Oil Service", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Engine"},
+            {"task": "Hydraulic System Check", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Systems"},
+            {"task": "Avionics / NAV Database Update", "interval_value": 60,
+                "last_done_value": 0.0, "category": "Avionics"},
+            {"task": "Landing Gear Inspection", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Airframe"},
+            {"task": "Fuel System Inspection", "interval_value": 150,
+                "last_done_value": 0.0, "category": "Fuel"},
+            {"task": "Cabin Safety Equipment Check", "interval_value": 50,
+                "last_done_value": 0.0, "category": "Safety"},
         ]
 
     if asset_type == "yacht":
         return [
-            {"task": "Engine Oil & Filter", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Engine"},
-            {"task": "Fuel Filters (Primary/Secondary)", "interval_hours": 150,
-             "last_done_hours": 0.0, "category": "Fuel"},
-            {"task": "Raw Water Impeller", "interval_hours": 200,
-                "last_done_hours": 0.0, "category": "Cooling"},
-            {"task": "Cooling System Check (hoses/clamps)", "interval_hours": 100,
-             "last_done_hours": 0.0, "category": "Cooling"},
-            {"task": "Generator Service", "interval_hours": 150,
-                "last_done_hours": 0.0, "category": "Engine"},
-            {"task": "Hull Inspection (blisters/damage)", "interval_hours": 100,
-             "last_done_hours": 0.0, "category": "Hull"},
-            {"task": "Through-Hull & Seacock Inspection", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Safety"},
-            {"task": "Zincs/Anodes Inspect & Replace", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Hull"},
-            {"task": "Bilge Pump & Float Switch Test", "interval_hours": 50,
-                "last_done_hours": 0.0, "category": "Safety"},
-            {"task": "Teak Deck Soft Wash", "interval_hours": 25,
-                "last_done_hours": 0.0, "category": "Exterior"},
-            {"task": "Teak Condition Check (caulk/wear)", "interval_hours": 50,
-             "last_done_hours": 0.0, "category": "Exterior"},
-            {"task": "Exterior Wash & Wax", "interval_hours": 50,
-                "last_done_hours": 0.0, "category": "Exterior"},
-            {"task": "Stainless Corrosion Check", "interval_hours": 75,
-                "last_done_hours": 0.0, "category": "Exterior"},
-            {"task": "Battery/Electrical Load Test", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Electrical"},
+            {"task": "Engine Oil & Filter", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Engine"},
+            {"task": "Fuel Filters (Primary/Secondary)", "interval_value": 150,
+             "last_done_value": 0.0, "category": "Fuel"},
+            {"task": "Raw Water Impeller", "interval_value": 200,
+                "last_done_value": 0.0, "category": "Cooling"},
+            {"task": "Cooling System Check (hoses/clamps)", "interval_value": 100,
+             "last_done_value": 0.0, "category": "Cooling"},
+            {"task": "Generator Service", "interval_value": 150,
+                "last_done_value": 0.0, "category": "Engine"},
+            {"task": "Hull Inspection (blisters/damage)", "interval_value": 100,
+             "last_done_value": 0.0, "category": "Hull"},
+            {"task": "Through-Hull & Seacock Inspection", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Safety"},
+            {"task": "Zincs/Anodes Inspect & Replace", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Hull"},
+            {"task": "Bilge Pump & Float Switch Test", "interval_value": 50,
+                "last_done_value": 0.0, "category": "Safety"},
+            {"task": "Teak Deck Soft Wash", "interval_value": 25,
+                "last_done_value": 0.0, "category": "Exterior"},
+            {"task": "Teak Condition Check (caulk/wear)", "interval_value": 50,
+             "last_done_value": 0.0, "category": "Exterior"},
+            {"task": "Exterior Wash & Wax", "interval_value": 50,
+                "last_done_value": 0.0, "category": "Exterior"},
+            {"task": "Stainless Corrosion Check", "interval_value": 75,
+                "last_done_value": 0.0, "category": "Exterior"},
+            {"task": "Battery/Electrical Load Test", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Electrical"},
         ]
 
     if asset_type == "center_console":
         return [
-            {"task": "Engine Oil & Filter", "interval_hours": 80,
-                "last_done_hours": 0.0, "category": "Engine"},
-            {"task": "Lower Unit Gear Oil", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Drive"},
-            {"task": "Fuel/Water Separator", "interval_hours": 120,
-                "last_done_hours": 0.0, "category": "Fuel"},
-            {"task": "Prop & Shaft Inspection", "interval_hours": 60,
-                "last_done_hours": 0.0, "category": "Drive"},
-            {"task": "Steering System Check (hydraulic)", "interval_hours": 75,
-             "last_done_hours": 0.0, "category": "Safety"},
-            {"task": "Hull Inspection (cracks/impact)", "interval_hours": 75,
-             "last_done_hours": 0.0, "category": "Hull"},
-            {"task": "Deck Hardware Tightness Check", "interval_hours": 75,
-                "last_done_hours": 0.0, "category": "Exterior"},
-            {"task": "T-Top/Console Fastener Inspection", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Exterior"},
-            {"task": "Exterior Wash & Protectant", "interval_hours": 40,
-                "last_done_hours": 0.0, "category": "Exterior"},
-            {"task": "Teak/SeaDeck Condition Check", "interval_hours": 75,
-                "last_done_hours": 0.0, "category": "Exterior"},
+            {"task": "Engine Oil & Filter", "interval_value": 80,
+                "last_done_value": 0.0, "category": "Engine"},
+            {"task": "Lower Unit Gear Oil", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Drive"},
+            {"task": "Fuel/Water Separator", "interval_value": 120,
+                "last_done_value": 0.0, "category": "Fuel"},
+            {"task": "Prop & Shaft Inspection", "interval_value": 60,
+                "last_done_value": 0.0, "category": "Drive"},
+            {"task": "Steering System Check (hydraulic)", "interval_value": 75,
+             "last_done_value": 0.0, "category": "Safety"},
+            {"task": "Hull Inspection (cracks/impact)", "interval_value": 75,
+             "last_done_value": 0.0, "category": "Hull"},
+            {"task": "Deck Hardware Tightness Check", "interval_value": 75,
+                "last_done_value": 0.0, "category": "Exterior"},
+            {"task": "T-Top/Console Fastener Inspection", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Exterior"},
+            {"task": "Exterior Wash & Protectant", "interval_value": 40,
+                "last_done_value": 0.0, "category": "Exterior"},
+            {"task": "Teak/SeaDeck Condition Check", "interval_value": 75,
+                "last_done_value": 0.0, "category": "Exterior"},
             {"task": "Saltwater Flush & Corrosion Inspection",
-                "interval_hours": 25, "last_done_hours": 0.0, "category": "Exterior"},
-            {"task": "Battery & Charging System Test", "interval_hours": 80,
-                "last_done_hours": 0.0, "category": "Electrical"},
+                "interval_value": 25, "last_done_value": 0.0, "category": "Exterior"},
+            {"task": "Battery & Charging System Test", "interval_value": 80,
+                "last_done_value": 0.0, "category": "Electrical"},
         ]
 
     if asset_type == "jet_ski":
         return [
-            {"task": "Engine Oil & Filter", "interval_hours": 50,
-                "last_done_hours": 0.0, "category": "Engine"},
-            {"task": "Spark Plugs", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Engine"},
-            {"task": "Jet Pump/Impeller Inspection", "interval_hours": 60,
-                "last_done_hours": 0.0, "category": "Drive"},
-            {"task": "Wear Ring Check", "interval_hours": 60,
-                "last_done_hours": 0.0, "category": "Drive"},
-            {"task": "Cooling Flush (post-salt)", "interval_hours": 15,
-             "last_done_hours": 0.0, "category": "Cooling"},
-            {"task": "Battery/Terminals Clean", "interval_hours": 40,
-                "last_done_hours": 0.0, "category": "Electrical"},
-            {"task": "Hull/Intake Grate Inspection", "interval_hours": 50,
-                "last_done_hours": 0.0, "category": "Hull"},
-            {"task": "Fuel Lines/Clamps Inspection", "interval_hours": 75,
-                "last_done_hours": 0.0, "category": "Fuel"},
+            {"task": "Engine Oil & Filter", "interval_value": 50,
+                "last_done_value": 0.0, "category": "Engine"},
+            {"task": "Spark Plugs", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Engine"},
+            {"task": "Jet Pump/Impeller Inspection", "interval_value": 60,
+                "last_done_value": 0.0, "category": "Drive"},
+            {"task": "Wear Ring Check", "interval_value": 60,
+                "last_done_value": 0.0, "category": "Drive"},
+            {"task": "Cooling Flush (post-salt)", "interval_value": 15,
+             "last_done_value": 0.0, "category": "Cooling"},
+            {"task": "Battery/Terminals Clean", "interval_value": 40,
+                "last_done_value": 0.0, "category": "Electrical"},
+            {"task": "Hull/Intake Grate Inspection", "interval_value": 50,
+                "last_done_value": 0.0, "category": "Hull"},
+            {"task": "Fuel Lines/Clamps Inspection", "interval_value": 75,
+                "last_done_value": 0.0, "category": "Fuel"},
         ]
 
     if asset_type == "helicopter":
         return [
-            {"task": "Preflight/Daily Inspection", "interval_hours": 10,
-                "last_done_hours": 0.0, "category": "Inspection"},
-            {"task": "25-hr Airframe Check", "interval_hours": 25,
-                "last_done_hours": 0.0, "category": "Inspection"},
-            {"task": "50-hr Inspection", "interval_hours": 50,
-                "last_done_hours": 0.0, "category": "Inspection"},
-            {"task": "100-hr Inspection", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Inspection"},
-            {"task": "Rotor Track & Balance", "interval_hours": 25,
-                "last_done_hours": 0.0, "category": "Transmission/Rotors"},
-            {"task": "Transmission/Gearbox Inspection", "interval_hours": 50,
-                "last_done_hours": 0.0, "category": "Transmission/Rotors"},
-            {"task": "Engine Oil Service", "interval_hours": 50,
-                "last_done_hours": 0.0, "category": "Engine"},
-            {"task": "Avionics/Electrical Systems Check", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Flight Systems"},
+            {"task": "Preflight/Daily Inspection", "interval_value": 10,
+                "last_done_value": 0.0, "category": "Inspection"},
+            {"task": "25-hr Airframe Check", "interval_value": 25,
+                "last_done_value": 0.0, "category": "Inspection"},
+            {"task": "50-hr Inspection", "interval_value": 50,
+                "last_done_value": 0.0, "category": "Inspection"},
+            {"task": "100-hr Inspection", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Inspection"},
+            {"task": "Rotor Track & Balance", "interval_value": 25,
+                "last_done_value": 0.0, "category": "Transmission/Rotors"},
+            {"task": "Transmission/Gearbox Inspection", "interval_value": 50,
+                "last_done_value": 0.0, "category": "Transmission/Rotors"},
+            {"task": "Engine Oil Service", "interval_value": 50,
+                "last_done_value": 0.0, "category": "Engine"},
+            {"task": "Avionics/Electrical Systems Check", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Flight Systems"},
         ]
 
     if asset_type == "car":
         return [
-            {"task": "Engine Oil & Filter", "interval_hours": 75,
-                "last_done_hours": 0.0, "category": "Engine"},
-            {"task": "Tire Rotation", "interval_hours": 100,
-                "last_done_hours": 0.0, "category": "Safety"},
-            {"task": "Brake Inspection (pads/rotors/fluid)", "interval_hours": 150,
-             "last_done_hours": 0.0, "category": "Safety"},
-            {"task": "Air/Cabin Filters", "interval_hours": 150,
-                "last_done_hours": 0.0, "category": "Engine"},
-            {"task": "Coolant Hoses/Level Check", "interval_hours": 120,
-                "last_done_hours": 0.0, "category": "Cooling"},
-            {"task": "Battery/Charging Test", "interval_hours": 200,
-                "last_done_hours": 0.0, "category": "Electrical"},
-            {"task": "Transmission Fluid Inspection", "interval_hours": 300,
-                "last_done_hours": 0.0, "category": "Drive"},
-            {"task": "Suspension/Alignment Check", "interval_hours": 250,
-                "last_done_hours": 0.0, "category": "Safety"},
+            {"task": "Engine Oil & Filter", "interval_value": 75,
+                "last_done_value": 0.0, "category": "Engine"},
+            {"task": "Tire Rotation", "interval_value": 100,
+                "last_done_value": 0.0, "category": "Safety"},
+            {"task": "Brake Inspection (pads/rotors/fluid)", "interval_value": 150,
+             "last_done_value": 0.0, "category": "Safety"},
+            {"task": "Air/Cabin Filters", "interval_value": 150,
+                "last_done_value": 0.0, "category": "Engine"},
+            {"task": "Coolant Hoses/Level Check", "interval_value": 120,
+                "last_done_value": 0.0, "category": "Cooling"},
+            {"task": "Battery/Charging Test", "interval_value": 200,
+                "last_done_value": 0.0, "category": "Electrical"},
+            {"task": "Transmission Fluid Inspection", "interval_value": 300,
+                "last_done_value": 0.0, "category": "Drive"},
+            {"task": "Suspension/Alignment Check", "interval_value": 250,
+                "last_done_value": 0.0, "category": "Safety"},
         ]
 
     return [
-        {"task": "General Inspection", "interval_hours": 100,
-            "last_done_hours": 0.0, "category": "General"},
-        {"task": "Safety Check", "interval_hours": 50,
-            "last_done_hours": 0.0, "category": "Safety"},
-        {"task": "Electrical Check", "interval_hours": 100,
-            "last_done_hours": 0.0, "category": "Electrical"},
-        {"task": "Fluids & Leaks Check", "interval_hours": 50,
-            "last_done_hours": 0.0, "category": "Engine"},
-        {"task": "Hardware/Fasteners Check", "interval_hours": 100,
-            "last_done_hours": 0.0, "category": "Exterior"},
-        {"task": "Filter Check", "interval_hours": 150,
-            "last_done_hours": 0.0, "category": "Engine"},
-        {"task": "Lubrication Check", "interval_hours": 100,
-            "last_done_hours": 0.0, "category": "Engine"},
+        {"task": "General Inspection", "interval_value": 100,
+            "last_done_value": 0.0, "category": "General"},
+        {"task": "Safety Check", "interval_value": 50,
+            "last_done_value": 0.0, "category": "Safety"},
+        {"task": "Electrical Check", "interval_value": 100,
+            "last_done_value": 0.0, "category": "Electrical"},
+        {"task": "Fluids & Leaks Check", "interval_value": 50,
+            "last_done_value": 0.0, "category": "Engine"},
+        {"task": "Hardware/Fasteners Check", "interval_value": 100,
+            "last_done_value": 0.0, "category": "Exterior"},
+        {"task": "Filter Check", "interval_value": 150,
+            "last_done_value": 0.0, "category": "Engine"},
+        {"task": "Lubrication Check", "interval_value": 100,
+            "last_done_value": 0.0, "category": "Engine"},
     ]
 
 
@@ -283,9 +288,10 @@ def ensure_template_tasks(asset):
         upsert_task(
             asset["id"],
             t["task"],
-            float(t["interval_hours"]),
-            float(t["last_done_hours"]),
+            float(t["interval_value"]),
+            float(t["last_done_value"]),
             t["category"],
+            asset_unit(asset),
         )
 
 
@@ -303,14 +309,14 @@ def trips_log_trip():
         return
 
     try:
-        hrs = float(input("Trip hours: "))
-        if hrs <= 0:
+        usage = float(input(f"Trip usage ({asset_unit(asset)}): "))
+        if usage <= 0:
             raise ValueError
     except ValueError:
-        print("❌ Trip hours must be a positive number.")
+        print("❌ Trip usage must be a positive number.")
         return
 
-    ok = log_trip(asset["id"], hrs)
+    ok = log_trip(asset["id"], usage)
     if not ok:
         print("❌ Failed to log trip. Asset may be inactive.")
         return
@@ -319,7 +325,7 @@ def trips_log_trip():
     tasks = list_maintenance_tasks(asset["id"])
     due = compute_due_from_tasks(asset, tasks)
 
-    print(f"✅ Logged {hrs:.1f} hrs for {asset['name']}")
+    print(f"✅ Logged {usage:.1f} {asset_unit(asset)} for {asset['name']}")
     if due:
         print("⚠️ Maintenance due:")
         current_cat = None
@@ -328,7 +334,7 @@ def trips_log_trip():
                 current_cat = d["category"]
                 print(f"\n[{current_cat}]")
             print(
-                f"- {d['task']}: {d['since_last']:.1f} since last (interval {d['interval_hours']:.0f})")
+                f"- {d['task']}: {d['since_last']:.1f} since last (interval {d['interval_value']:.0f})")
     else:
         print("✅ No maintenance due")
 
@@ -346,7 +352,7 @@ def trips_view_trips():
 
     print(f"\nTrip history for {asset['name']}:")
     for e in events[:25]:
-        print(f"- {float(e['hours_added']):.1f} hrs @ {e['created_at']}")
+        print(f"- {float(e['usage_added']):.1f} {e['unit']} @ {e['created_at']}")
 
 
 def trips_tab():
@@ -375,14 +381,14 @@ def print_fleet_menu():
 
 
 def fleet_view_status():
-    assets = list_assets_with_index(active_only=True)
+    assets = list_assets(active_only=True)
     if not assets:
         print("No assets yet.")
         return
     print("\nFleet status:")
     for i, a in enumerate(assets):
         print(
-            f"{i} - {a['name']} [{a['type']}] | {float(a['engine_hours']):.1f} hrs")
+            f"{i} - {a['name']} [{a['type']}] | {float(a['usage_value']):.1f} {asset_unit(a)}")
 
 
 def fleet_add_asset():
@@ -401,19 +407,20 @@ def fleet_add_asset():
         print("❌ Invalid asset type.")
         return
 
+    unit = default_usage_unit(asset_type)
     try:
-        starting_hours = float(input("Starting hours: "))
-        if starting_hours < 0:
+        starting_usage = float(input(f"Starting usage ({unit}): "))
+        if starting_usage < 0:
             raise ValueError
     except ValueError:
-        print("❌ Starting hours must be 0 or greater.")
+        print("❌ Starting usage must be 0 or greater.")
         return
 
-    asset_id = upsert_asset(name, asset_type, starting_hours)
-    asset = {"id": asset_id, "type": asset_type}
+    asset_id = create_asset(name, asset_type, starting_usage)
+    asset = {"id": asset_id, "type": asset_type, "usage_unit": unit}
     ensure_template_tasks(asset)
 
-    print(f"✅ Added {name} [{asset_type}] with {starting_hours:.1f} hrs.")
+    print(f"✅ Added {name} [{asset_type}] with {starting_usage:.1f} {unit}.")
 
 
 def fleet_view_asset_detail():
@@ -429,7 +436,7 @@ def fleet_view_asset_detail():
 
     archived = " (ARCHIVED)" if int(asset.get("is_active", 1)) == 0 else ""
     print(f"\nAsset detail: {asset['name']} [{asset['type']}] {archived}")
-    print(f"Engine hours: {float(asset['engine_hours']):.1f}")
+    print(f"Usage: {float(asset['usage_value']):.1f} {asset_unit(asset)}")
 
     if due:
         print("\nMaintenance due (grouped):")
@@ -439,7 +446,7 @@ def fleet_view_asset_detail():
                 current_cat = d["category"]
                 print(f"\n[{current_cat}]")
             print(
-                f"- {d['task']}: {d['since_last']:.1f} since last (interval {d['interval_hours']:.0f})")
+                f"- {d['task']}: {d['since_last']:.1f} since last (interval {d['interval_value']:.0f})")
     else:
         print("No maintenance due.")
 
@@ -486,11 +493,11 @@ def maintenance_view_all(asset):
         print("No maintenance tasks found.")
         return
 
-    current = float(asset["engine_hours"])
+    current = float(asset["usage_value"])
     tasks_sorted = sorted(tasks, key=lambda t: (
         t.get("category", "General"), t["task"].lower()))
 
-    print(f"\nAll tasks for {asset['name']} (hrs: {current:.1f})")
+    print(f"\nAll tasks for {asset['name']} ({asset_unit(asset)}: {current:.1f})")
     current_cat = None
     for t in tasks_sorted:
         cat = t.get("category", "General")
@@ -498,10 +505,13 @@ def maintenance_view_all(asset):
             current_cat = cat
             print(f"\n[{current_cat}]")
 
-        interval = float(t["interval_hours"])
-        last_done = float(t["last_done_hours"])
-        since_last = current - last_done
+        interval = float(t["interval_value"])
+        last_done = float(t["last_done_value"])
+        since_last = task_since_last(t, current)
         remaining = interval - since_last
+        if t.get("unit") == DAY_UNIT:
+            print(f"- {t['task']} | every {interval:.0f} days | last {t.get('last_done_date') or '-'} | due {t.get('next_due_date') or '-'} | remaining {remaining:.0f} days")
+            continue
         print(f"- {t['task']} | interval {interval:.0f} | last {last_done:.1f} | since {since_last:.1f} | remaining {remaining:.1f}")
 
 
@@ -513,14 +523,14 @@ def maintenance_view_due(asset):
         return
 
     print(
-        f"\n⚠️ Due for {asset['name']} (hrs: {float(asset['engine_hours']):.1f})")
+        f"\n⚠️ Due for {asset['name']} ({asset_unit(asset)}: {float(asset['usage_value']):.1f})")
     current_cat = None
     for d in due:
         if d["category"] != current_cat:
             current_cat = d["category"]
             print(f"\n[{current_cat}]")
         print(
-            f"- {d['task']}: {d['since_last']:.1f} since last (interval {d['interval_hours']:.0f})")
+            f"- {d['task']}: {d['since_last']:.1f} since last (interval {d['interval_value']:.0f})")
 
 
 def maintenance_add_task(asset):
@@ -534,7 +544,7 @@ def maintenance_add_task(asset):
         return
 
     try:
-        interval = float(input("Interval hours: "))
+        interval = float(input(f"Interval ({asset_unit(asset)}): "))
         if interval <= 0:
             raise ValueError
     except ValueError:
@@ -542,15 +552,17 @@ def maintenance_add_task(asset):
         return
 
     try:
-        last_done_raw = input("Last done hours (Enter for 0): ").strip()
+        last_done_raw = input(
+            f"Last done at ({asset_unit(asset)}, Enter for 0): ").strip()
         last_done = float(last_done_raw) if last_done_raw else 0.0
         if last_done < 0:
             raise ValueError
     except ValueError:
-        print("❌ Last done hours must be 0 or greater.")
+        print("❌ Last done must be 0 or greater.")
         return
 
-    upsert_task(asset["id"], task, interval, last_done, category)
+    upsert_task(asset["id"], task, interval, last_done,
+                category, asset_unit(asset))
     print(
         f"✅ Saved: [{category}] {task} (interval {interval:.0f}, last done {last_done:.1f})")
 
@@ -565,7 +577,7 @@ def maintenance_complete_task(asset):
     print("\nDue tasks:")
     for i, d in enumerate(due):
         print(
-            f"{i} - [{d['category']}] {d['task']} (since last: {d['since_last']:.1f} hrs)")
+            f"{i} - [{d['category']}] {d['task']} (since last: {d['since_last']:.1f} {asset_unit(asset)})")
 
     choice = input("Select task number to mark completed: ").strip()
     try:
@@ -591,7 +603,7 @@ def maintenance_view_service_history(asset):
     print(f"\nService history for {asset['name']}:")
     for e in events[:25]:
         print(
-            f"- {e['task']} @ {float(e['service_hours']):.1f} hrs on {e['created_at']}")
+            f"- {e['task']} @ {float(e['service_value']):.1f} {e['unit']} on {e['created_at']}")
 
 
 def maintenance_tab():
@@ -717,10 +729,10 @@ def docs_view_files():
 
 
 def docs_export_fleet_report(filename="fleet_summary.csv"):
-    assets = list_assets_with_index(active_only=True)
+    assets = list_assets(active_only=True)
     with open(filename, "w", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(["Asset Name", "Type", "Engine Hours",
+        writer.writerow(["Asset Name", "Type", "Usage", "Unit",
                         "Maintenance Due (count)"])
 
         for a in assets:
@@ -729,7 +741,8 @@ def docs_export_fleet_report(filename="fleet_summary.csv"):
             writer.writerow([
                 a["name"],
                 a["type"],
-                f"{float(a['engine_hours']):.1f}",
+                f"{float(a['usage_value']):.1f}",
+                asset_unit(a),
                 str(len(due)),
             ])
 
@@ -0,0 +1,327 @@
+# ---------------------------
+# loadtest.py
+# Closed-loop load generator for api.py on one machine.
+#
+#   python loadtest.py                                # 200 telematics + 50 pollers, 30 s
+#   python loadtest.py --telematics 50 --pollers 10 --duration 10
+#   python loadtest.py --workers 4 --resolvers 5 --downloaders 10 --output run.json
+#
+# Seeds a synthetic fleet (bench.generate_fleet) in a temp dir, launches
+# uvicorn there, then runs one thread per virtual client over a keep-alive
+# connection. Prints one JSON report: per-operation throughput, p50/p99
+# latency, error rates, plus "database is locked" errors scraped from
+# /v1/admin/metrics before shutdown.
+# ---------------------------
+import argparse
+import http.client
+import json
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Tuple
+
+import bench
+import fleet_db
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+METRICS_TOKEN = uuid.uuid4().hex
+
+# (op, latency seconds, HTTP status | TIMEOUT | CONN_ERROR)
+Sample = Tuple[str, float, int]
+TIMEOUT = -1
+CONN_ERROR = 0
+STATUS_NAMES = {TIMEOUT: "timeout", CONN_ERROR: "conn_error"}
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))]
+
+
+# ---------------------------
+# Setup: fleet + server
+# ---------------------------
+def seed(workdir: str, args) -> Dict[str, Any]:
+    # api.py opens "fleet.db" relative to its cwd, which will be workdir
+    fleet_db.DB_FILE = os.path.join(workdir, "fleet.db")
+    fleet_db.init_db()
+    fleet = bench.generate_fleet(
+        assets=args.assets, trips_per_asset=args.trips, services_per_asset=5,
+        keys=1, seed=args.seed)
+    fleet["write_key"] = fleet_db.create_api_key(label="load-write", scope="write")
+    fleet["read_key"] = fleet_db.create_api_key(label="load-read", scope="read")
+    fleet["alert_ids"] = [int(a["id"]) for a in fleet_db.list_alerts()]
+    return fleet
+
+
+def start_server(workdir: str, port: int, args) -> Tuple[subprocess.Popen, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = REPO_DIR + os.pathsep + env.get("PYTHONPATH", "")
+    env["RATE_LIMIT_ENABLED"] = "1" if args.rate_limit else "0"
+    env["METRICS_TOKEN"] = METRICS_TOKEN
+    log_path = os.path.join(workdir, "server.log")
+    log = open(log_path, "w")
+    proc = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "api:app", "--host", "127.0.0.1",
+         "--port", str(port), "--workers", str(args.workers), "--no-access-log"],
+        cwd=workdir, env=env, stdout=log, stderr=subprocess.STDOUT,
+    )
+    log.close()
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"uvicorn exited early; see {log_path}")
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+            conn.request("GET", "/v1/health")
+            if conn.getresponse().status == 200:
+                conn.close()
+                return proc, log_path
+        except OSError:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError(f"uvicorn did not become healthy; see {log_path}")
+
+
+def upload_documents(port: int, admin_key: str, count: int, size: int) -> List[int]:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    for i in range(count):
+        boundary = uuid.uuid4().hex
+        body = (
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"title\"\r\n\r\nload-{i}\r\n"
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"load-{i}.bin\"\r\n"
+            f"Content-Type: application/octet-stream\r\n\r\n"
+        ).encode() + os.urandom(size) + f"\r\n--{boundary}--\r\n".encode()
+        conn.request("POST", "/v1/documents", body=body, headers={
+            "X-API-Key": admin_key,
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+        })
+        resp = conn.getresponse()
+        resp.read()
+        if resp.status != 200:
+            raise RuntimeError(f"document upload failed: {resp.status}")
+    conn.request("GET", "/v1/documents?limit=200", headers={"X-API-Key": admin_key})
+    docs = json.loads(conn.getresponse().read())["data"]
+    conn.close()
+    return [int(d["id"]) for d in docs]
+
+
+# ---------------------------
+# Virtual clients
+# ---------------------------
+def client_loop(kind: str, port: int, fleet: Dict[str, Any], args, deadline: float,
+                samples: List[Sample], rng: random.Random) -> None:
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=args.timeout)
+    assets = fleet["asset_ids"]
+    alert_ids = fleet["alert_ids"] or [0]
+    doc_ids = fleet["doc_ids"] or [0]
+    etag = None
+    think = args.think_ms / 1000.0
+
+    while time.monotonic() < deadline:
+        headers = {"X-API-Key": fleet["write_key"]}
+        body = None
+        if kind == "trip":
+            method, path = "POST", f"/v1/assets/{rng.choice(assets)}/trips"
+            body = json.dumps({"usage_added": round(rng.uniform(0.1, 5.0), 2)})
+            headers["Content-Type"] = "application/json"
+        elif kind == "dashboard":
+            method, path = "GET", "/v1/fleet/dashboard"
+            headers = {"X-API-Key": fleet["read_key"]}
+            if args.conditional and etag:
+                headers["If-None-Match"] = etag
+        elif kind == "resolve":
+            method, path = "POST", f"/v1/alerts/{rng.choice(alert_ids)}/resolve"
+        else:
+            method, path = "GET", f"/v1/documents/{rng.choice(doc_ids)}/download"
+            headers = {"X-API-Key": fleet["read_key"]}
+
+        start = time.perf_counter()
+        try:
+            conn.request(method, path, body=body, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            status = resp.status
+            if kind == "dashboard" and status == 200:
+                etag = resp.getheader("ETag")
+        except (OSError, http.client.HTTPException) as exc:
+            status = TIMEOUT if isinstance(exc, TimeoutError) else CONN_ERROR
+            conn.close()
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=args.timeout)
+        samples.append((kind, time.perf_counter() - start, status))
+
+        if think:
+            time.sleep(rng.uniform(0, 2 * think))
+    conn.close()
+
+
+def run_clients(port: int, fleet: Dict[str, Any], args) -> Tuple[List[Sample], float]:
+    mix = [("trip", args.telematics), ("dashboard", args.pollers),
+           ("resolve", args.resolvers), ("download", args.downloaders)]
+    per_thread: List[List[Sample]] = []
+    threads = []
+    start = time.monotonic()
+    deadline = start + args.duration
+    for kind, count in mix:
+        for i in range(count):
+            samples: List[Sample] = []
+            per_thread.append(samples)
+            rng = random.Random(f"{args.seed}-{kind}-{i}")
+            threads.append(threading.Thread(
+                target=client_loop, daemon=True,
+                args=(kind, port, fleet, args, deadline, samples, rng)))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return [s for samples in per_thread for s in samples], time.monotonic() - start
+
+
+# ---------------------------
+# Report
+# ---------------------------
+def summarize(samples: List[Sample], elapsed: float) -> Dict[str, Any]:
+    by_op: Dict[str, List[Sample]] = {}
+    for s in samples:
+        by_op.setdefault(s[0], []).append(s)
+    by_op["total"] = samples
+
+    out = {}
+    for op, items in by_op.items():
+        latencies = sorted(s[1] for s in items)
+        statuses: Dict[str, int] = {}
+        for s in items:
+            name = STATUS_NAMES.get(s[2], str(s[2]))
+            statuses[name] = statuses.get(name, 0) + 1
+        # Transport failures and 4xx/5xx count as errors; 429s are reported apart
+        limited = statuses.get("429", 0)
+        errors = sum(1 for s in items if s[2] <= CONN_ERROR or s[2] >= 400) - limited
+        out[op] = {
+            "requests": len(items),
+            "throughput_rps": round(len(items) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+            "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+            "errors": errors,
+            "error_rate": round(errors / len(items), 4) if items else 0.0,
+            "rate_limited": limited,
+            "statuses": statuses,
+        }
+    return out
+
+
+def scrape_locked_errors(port: int, workers: int) -> Dict[str, int]:
+    # The count lives in each worker process, including errors the app swallowed
+    # (the audit writer), so scrape until every worker has answered once. Each
+    # scrape opens a fresh connection; which worker takes it is up to the kernel.
+    per_worker: Dict[str, int] = {}
+    for _ in range(workers * 20):
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        try:
+            conn.request("GET", "/v1/admin/metrics",
+                         headers={"Authorization": f"Bearer {METRICS_TOKEN}"})
+            text = conn.getresponse().read().decode()
+        except OSError:
+            continue
+        finally:
+            conn.close()
+        pid, locked = None, 0
+        for line in text.splitlines():
+            if line.startswith("fleet_worker_info{"):
+                pid = line.split('"')[1]
+            elif line.startswith("fleet_db_locked_errors_total "):
+                locked = int(float(line.split()[1]))
+        if pid is not None:
+            per_worker[pid] = locked
+        if len(per_worker) >= workers:
+            break
+    return {"database_locked": sum(per_worker.values()), "workers_scraped": len(per_worker)}
+
+
+def server_errors(log_path: str) -> Dict[str, int]:
+    with open(log_path, errors="replace") as f:
+        text = f.read()
+    return {"tracebacks": text.count("Traceback (most recent call last)")}
+
+
+def main(argv: List[str]) -> int:
+    parser = argparse.ArgumentParser(description="Fleet Ops API load test")
+    parser.add_argument("--telematics", type=int, default=200, help="clients posting trips")
+    parser.add_argument("--pollers", type=int, default=50, help="clients reading the dashboard")
+    parser.add_argument("--resolvers", type=int, default=0, help="clients resolving alerts")
+    parser.add_argument("--downloaders", type=int, default=0, help="clients downloading documents")
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--think-ms", type=float, default=0.0,
+                        help="mean pause between a client's requests")
+    parser.add_argument("--timeout", type=float, default=30.0, help="per-request timeout, seconds")
+    parser.add_argument("--conditional", action="store_true",
+                        help="pollers revalidate with If-None-Match")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--rate-limit", action="store_true",
+                        help="keep the API rate limiter on (off by default)")
+    parser.add_argument("--assets", type=int, default=200)
+    parser.add_argument("--trips", type=int, default=20, help="seeded trips per asset")
+    parser.add_argument("--documents", type=int, default=10)
+    parser.add_argument("--document-bytes", type=int, default=64 * 1024)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--keep", action="store_true", help="keep the temp dir (DB, server log)")
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="fleet-load-")
+    proc = None
+    try:
+        fleet = seed(workdir, args)
+        port = free_port()
+        try:
+            proc, log_path = start_server(workdir, port, args)
+            fleet["doc_ids"] = upload_documents(
+                port, fleet["keys"][0], args.documents if args.downloaders else 0, args.document_bytes)
+            samples, elapsed = run_clients(port, fleet, args)
+            locked = scrape_locked_errors(port, args.workers)
+        finally:
+            if proc is not None:
+                proc.terminate()
+                try:
+                    proc.wait(timeout=10)
+                except subprocess.TimeoutExpired:
+                    proc.kill()
+
+        report = {
+            "env": bench.run_env(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("output", "keep")},
+            "elapsed_s": round(elapsed, 2),
+            "ops": summarize(samples, elapsed),
+            "server": {**locked, **server_errors(log_path)},
+        }
+        if args.keep:
+            report["workdir"] = workdir
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(text + "\n")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,156 @@
+"""
+Maintenance task edits: POST /v1/assets/{id}/maintenance and
+fleet_db.upsert_task keep the stored last-done state unless it is given.
+The due index and response cache see writes made by other processes.
+
+    python maintenance_test.py        (or: python -m pytest maintenance_test.py)
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+os.environ.setdefault("SCHEDULER_ENABLED", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import api  # noqa: E402
+import fleet_db  # noqa: E402
+
+
+class TaskUpsertTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._old_db = fleet_db.DB_FILE
+        fleet_db.DB_FILE = os.path.join(self._tmp.name, "maintenance.db")
+        self.client = TestClient(api.app)
+        self.client.__enter__()
+        self.key = fleet_db.create_api_key("maintenance", scope="write")
+        self.asset_id = fleet_db.create_asset("Task Check", "yacht", 0)
+        fleet_db.upsert_task(self.asset_id, "Oil", 100, 40, "Engine", "engine_hours")
+        fleet_db.upsert_task(self.asset_id, "Liferaft Recert", 365, 0, "Safety",
+                             fleet_db.DAY_UNIT, last_done_date="2020-01-01")
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+        fleet_db.DB_FILE = self._old_db
+        self._tmp.cleanup()
+
+    def task(self, name):
+        return next(t for t in fleet_db.list_maintenance_tasks(self.asset_id) if t["task"] == name)
+
+    def upsert(self, body):
+        return self.client.post(f"/v1/assets/{self.asset_id}/maintenance", json=body,
+                                headers={"X-API-Key": self.key})
+
+    def test_day_task_edit_keeps_last_done_date(self):
+        self.assertEqual(self.task("Liferaft Recert")["next_due_date"], "2020-12-31")
+        resp = self.upsert({"task": "Liferaft Recert", "interval_value": 300,
+                            "category": "Safety", "trigger_unit": "days"})
+        self.assertEqual(resp.status_code, 200, resp.text)
+        task = self.task("Liferaft Recert")
+        self.assertEqual(task["last_done_date"], "2020-01-01")
+        self.assertEqual(task["next_due_date"], "2020-10-27")
+
+    def test_new_day_task_starts_today(self):
+        fleet_db.upsert_task(self.asset_id, "Flares", 30, None, "Safety", fleet_db.DAY_UNIT)
+        task = self.task("Flares")
+        self.assertEqual(task["last_done_date"], fleet_db.today_iso())
+        self.assertEqual(task["next_due_date"],
+                         fleet_db.next_due_date(fleet_db.DAY_UNIT, 30, fleet_db.today_iso()))
+
+    def test_due_date_alerts_skip_tasks_already_alerted(self):
+        self.assertEqual(fleet_db.generate_due_date_alerts(), 1)
+        with mock.patch.object(fleet_db, "_insert_due_alert") as insert:
+            self.assertEqual(fleet_db.generate_due_date_alerts(), 0)
+        insert.assert_not_called()
+        alert = fleet_db.list_alerts(self.asset_id)[0]
+        fleet_db.resolve_alert(int(alert["id"]))
+        # Resolved while still overdue: alerted again
+        self.assertEqual(fleet_db.generate_due_date_alerts(), 1)
+
+    def test_usage_task_requires_last_done_value(self):
+        resp = self.upsert({"task": "Oil", "interval_value": 150, "category": "Engine"})
+        self.assertEqual(resp.status_code, 422, resp.text)
+        self.assertEqual(float(self.task("Oil")["last_done_value"]), 40.0)
+
+    def test_omitted_last_done_value_is_kept(self):
+        fleet_db.upsert_task(self.asset_id, "Oil", 150, None, "Engine", "engine_hours")
+        task = self.task("Oil")
+        self.assertEqual((float(task["interval_value"]), float(task["last_done_value"])),
+                         (150.0, 40.0))
+
+
+class DueIndexFreshnessTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._old_db = fleet_db.DB_FILE
+        fleet_db.DB_FILE = os.path.join(self._tmp.name, "due.db")
+        self.client = TestClient(api.app)
+        self.client.__enter__()
+        self.key = fleet_db.create_api_key("due", scope="read")
+        self.asset_id = fleet_db.create_asset("Due Check", "yacht", 0)
+        fleet_db.upsert_task(self.asset_id, "Oil", 100, 0, "Engine", "engine_hours")
+        fleet_db.upsert_task(self.asset_id, "Impeller", 200, 0, "Engine", "engine_hours")
+        fleet_db.rebuild_due_index()
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+        fleet_db.DB_FILE = self._old_db
+        self._tmp.cleanup()
+
+    def other_process(self, sql, params=()):
+        # A separate connection and no fleet_db hooks, like a write on another worker
+        conn = fleet_db.get_conn()
+        conn.execute(sql, params)
+        conn.commit()
+        conn.close()
+
+    def test_index_catches_up_with_outside_writes(self):
+        self.other_process("UPDATE assets SET usage_value = 150 WHERE id = ?", (self.asset_id,))
+        self.assertEqual([t["task"] for t in fleet_db.top_overdue_tasks(10)], ["Oil"])
+
+        self.other_process("DELETE FROM maintenance_tasks WHERE task = 'Oil'")
+        self.other_process("UPDATE maintenance_tasks SET interval_value = 100 WHERE task = 'Impeller'")
+        self.assertEqual([t["task"] for t in fleet_db.top_overdue_tasks(10)], ["Impeller"])
+        self.assertEqual([t["task"] for t in fleet_db.upcoming_due(10)], ["Impeller"])
+
+    def test_cached_dashboard_follows_its_etag(self):
+        headers = {"X-API-Key": self.key}
+        first = self.client.get("/v1/fleet/dashboard", headers=headers)
+        self.other_process("UPDATE assets SET usage_value = 150 WHERE id = ?", (self.asset_id,))
+        second = self.client.get("/v1/fleet/dashboard", headers=headers)
+        self.assertNotEqual(first.headers["ETag"], second.headers["ETag"])
+        self.assertNotEqual(first.json()["data"], second.json()["data"])
+
+    def test_brief_snapshot_sees_outside_writes(self):
+        fleet_db.top_overdue_tasks(10)  # index built before the write
+        self.other_process("UPDATE assets SET usage_value = 150 WHERE id = ?", (self.asset_id,))
+        snapshot = fleet_db.refresh_brief_snapshot(50)
+        self.assertEqual([t["task"] for t in snapshot["data"]["top_overdue_tasks"]], ["Oil"])
+
+    def test_unscheduled_brief_horizon_is_served(self):
+        headers = {"X-API-Key": self.key}
+        first = self.client.get("/v1/fleet/ai_brief?horizon_hours=7", headers=headers)
+        self.assertEqual(first.status_code, 200, first.text)
+        again = self.client.get("/v1/fleet/ai_brief?horizon_hours=7",
+                                headers={**headers, "If-None-Match": first.headers["ETag"]})
+        self.assertEqual(again.status_code, 304)
+        self.other_process("UPDATE assets SET usage_value = 150 WHERE id = ?", (self.asset_id,))
+        changed = self.client.get("/v1/fleet/ai_brief?horizon_hours=7",
+                                  headers={**headers, "If-None-Match": first.headers["ETag"]})
+        self.assertEqual(changed.status_code, 200)
+        self.assertEqual([t["task"] for t in changed.json()["data"]["top_overdue_tasks"]], ["Oil"])
+
+    def test_etag_changes_with_payload_version(self):
+        headers = {"X-API-Key": self.key}
+        etag = self.client.get("/v1/fleet/dashboard", headers=headers).headers["ETag"]
+        self.assertEqual(self.client.get("/v1/fleet/dashboard",
+                                         headers={**headers, "If-None-Match": etag}).status_code, 304)
+        with mock.patch.object(api, "ETAG_BUILD", api.ETAG_BUILD + "-next"):
+            resp = self.client.get("/v1/fleet/dashboard", headers={**headers, "If-None-Match": etag})
+        self.assertEqual(resp.status_code, 200)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""
+EXPLAIN QUERY PLAN regression checks for the hot fleet_db read paths.
+
+Each check calls the real fleet_db function, captures the SELECTs it issues
+and fails if any plan falls back to a full table scan or a temp B-tree sort.
+
+    python query_plan_test.py        (or: python -m pytest query_plan_test.py)
+"""
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import fleet_db
+
+
+# A full listing may walk an index in order; it may never walk the table or sort,
+# unless the check names the table in allow_scan (an unfiltered read of every row).
+def plan_problems(conn, sql: str, allow_scan=()):
+    problems = []
+    for row in conn.execute("EXPLAIN QUERY PLAN " + sql):
+        detail = row[3]
+        if "TEMP B-TREE" in detail:
+            problems.append(detail)
+        elif detail.startswith("SCAN ") and "INDEX" not in detail:
+            if detail.split()[1] not in allow_scan:
+                problems.append(detail)
+    return problems
+
+
+class QueryPlanTest(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls._tmp = tempfile.TemporaryDirectory()
+        cls._old_db = fleet_db.DB_FILE
+        fleet_db.DB_FILE = os.path.join(cls._tmp.name, "plans.db")
+        fleet_db.init_db()
+
+        cls.asset_id = fleet_db.create_asset("Plan Check", "yacht", 0)
+        fleet_db.seed_maintenance_from_template(cls.asset_id, "yacht")
+        fleet_db.log_trip(cls.asset_id, 500)
+        fleet_db.generate_maintenance_alerts(cls.asset_id)
+        fleet_db.log_service(cls.asset_id, "Safety Check")
+        fleet_db.upsert_task(cls.asset_id, "Liferaft Recert", 365, 0, "Safety",
+                             fleet_db.DAY_UNIT, last_done_date="2020-01-01")
+        fleet_db.write_audit_log(None, None, "GET", "/v1/health", 200, True)
+        # No ANALYZE: the app never collects sqlite_stat1, so the planner uses
+        # the same default estimates here as in production.
+
+    @classmethod
+    def tearDownClass(cls):
+        fleet_db.DB_FILE = cls._old_db
+        cls._tmp.cleanup()
+
+    def captured_selects(self, fn, *args, **kwargs):
+        statements = []
+        get_conn = fleet_db.get_conn
+
+        def traced_conn():
+            conn = get_conn()
+            conn.set_trace_callback(statements.append)
+            return conn
+
+        with mock.patch.object(fleet_db, "get_conn", traced_conn):
+            fn(*args, **kwargs)
+        return [s for s in statements if s.lstrip().upper().startswith("SELECT")]
+
+    def assert_indexed(self, fn, *args, allow_scan=(), **kwargs):
+        selects = self.captured_selects(fn, *args, **kwargs)
+        self.assertTrue(selects, f"{fn.__name__} issued no SELECT")
+        conn = fleet_db.get_conn()
+        try:
+            for sql in selects:
+                problems = plan_problems(conn, sql, allow_scan)
+                self.assertFalse(
+                    problems, f"{fn.__name__}: {' '.join(sql.split())}\n  plan: {problems}")
+        finally:
+            conn.close()
+
+    def test_trip_history(self):
+        self.assert_indexed(fleet_db.list_trip_events, self.asset_id)
+
+    def test_service_history(self):
+        self.assert_indexed(fleet_db.list_service_events, self.asset_id)
+
+    def test_maintenance_tasks(self):
+        self.assert_indexed(fleet_db.list_maintenance_tasks, self.asset_id)
+
+    def test_open_alerts(self):
+        self.assert_indexed(fleet_db.list_alerts)
+
+    def test_all_alerts(self):
+        self.assert_indexed(fleet_db.list_alerts, include_resolved=True)
+
+    def test_asset_alerts(self):
+        self.assert_indexed(fleet_db.list_alerts, self.asset_id)
+        self.assert_indexed(fleet_db.list_alerts, self.asset_id, include_resolved=True)
+
+    def test_generate_alerts(self):
+        self.assert_indexed(fleet_db.generate_maintenance_alerts, self.asset_id)
+
+    def test_generate_fleet_alerts(self):
+        self.assert_indexed(fleet_db.generate_fleet_alerts)
+
+    def test_job_lease(self):
+        self.assert_indexed(fleet_db.acquire_job_lease, "plan-check", "owner", 60)
+
+    def test_webhook_outbox(self):
+        self.assert_indexed(fleet_db.due_webhook_deliveries, 100)
+        self.assert_indexed(fleet_db.list_webhook_outbox, status="dead")
+
+    def test_sync(self):
+        self.assert_indexed(fleet_db.sync_changes, 0)
+        self.assert_indexed(fleet_db.sync_changes, 3, limit=2)
+        self.assert_indexed(fleet_db.sync_changes, 0, tables=["trip_events", "service_events"])
+
+    def test_audit_logs(self):
+        self.assert_indexed(fleet_db.list_audit_logs, limit=50, offset=0)
+
+    def test_assets(self):
+        self.assert_indexed(fleet_db.list_assets, True)
+        # Every asset, active or not, in no particular order: reading the table
+        # is the cheapest plan, and there is nothing to sort.
+        self.assert_indexed(fleet_db.list_assets, False, allow_scan=("assets",))
+        self.assert_indexed(fleet_db.get_asset, self.asset_id)
+
+    def test_health_explain(self):
+        self.assert_indexed(fleet_db.explain_asset_health, self.asset_id)
+        self.assert_indexed(fleet_db.explain_fleet_health)
+
+    def test_dashboard(self):
+        # The due index is rebuilt at startup / on expiry with one full read;
+        # per-request dashboard work must stay indexed.
+        fleet_db.rebuild_due_index()
+        self.assert_indexed(fleet_db.fleet_dashboard)
+
+    def test_due_index_catch_up(self):
+        fleet_db.rebuild_due_index()
+        fleet_db.log_trip(self.asset_id, 1)
+        fleet_db.log_service(self.asset_id, "Safety Check")
+        self.assert_indexed(fleet_db.refresh_due_index)
+
+    def test_due_queue(self):
+        self.assert_indexed(fleet_db.list_due_by_date)
+        self.assert_indexed(fleet_db.list_due_by_date, through="2030-01-01", since="2020-01-01")
+        self.assert_indexed(fleet_db.generate_due_date_alerts)
+
+    def test_change_counters(self):
+        self.assert_indexed(fleet_db.get_change_counters, ["assets", f"asset:{self.asset_id}"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,268 @@
+# ---------------------------
+# scheduler.py
+# Lightweight in-process job scheduler for periodic fleet work, started and
+# stopped from the API lifespan.
+#
+#   sched = Scheduler()
+#   sched.add_interval("brief_refresh", refresh, seconds=5)
+#   sched.add_cron("sqlite_optimize", optimize, "17 3 * * *", jitter=60)
+#   sched.start() ... sched.stop()
+#
+# Every uvicorn worker runs its own Scheduler. Single-flight jobs coordinate
+# through a job_leases row in SQLite: the row holds the lease and the shared
+# next run time, so a job runs once per period across all workers, not once
+# per worker. local_only jobs (per-process state) skip the lease.
+# ---------------------------
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+import fleet_db
+
+DEFAULT_LEASE_SECONDS = 600.0
+MAX_TICK_SECONDS = 1.0
+
+# (min, max) for minute, hour, day of month, month, day of week (0 = Sunday)
+_CRON_RANGES = ((0, 59), (0, 23), (1, 31), (1, 12), (0, 6))
+
+
+def _parse_cron_field(field: str, lo: int, hi: int) -> Set[int]:
+    values: Set[int] = set()
+    for part in field.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step <= 0:
+                raise ValueError(f"Bad cron step: {field!r}")
+        if part == "*":
+            start, end = lo, hi
+        elif "-" in part:
+            start, end = (int(x) for x in part.split("-", 1))
+        else:
+            start = int(part)
+            end = hi if step > 1 else start
+        if not lo <= start <= end <= hi:
+            raise ValueError(f"Cron field {field!r} outside {lo}-{hi}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """Five-field cron expression ("m h dom mon dow") evaluated in UTC."""
+
+    def __init__(self, expr: str):
+        fields = expr.split()
+        if len(fields) != 5:
+            raise ValueError(f"Cron expression needs 5 fields: {expr!r}")
+        self.expr = expr
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_cron_field(f, lo, hi) for f, (lo, hi) in zip(fields, _CRON_RANGES))
+        # Standard cron: when both day fields are restricted, either may match
+        self.any_day = fields[2] == "*"
+        self.any_weekday = fields[4] == "*"
+
+    def _day_matches(self, dt: datetime) -> bool:
+        dom = dt.day in self.days
+        dow = (dt.weekday() + 1) % 7 in self.weekdays
+        if self.any_day or self.any_weekday:
+            return dom and dow
+        return dom or dow
+
+    def next_after(self, ts: float) -> float:
+        dt = datetime.fromtimestamp(ts, timezone.utc).replace(second=0, microsecond=0)
+        dt += timedelta(minutes=1)
+        limit = dt + timedelta(days=366 * 5)
+        while dt < limit:
+            if dt.month not in self.months:
+                dt = (dt.replace(day=1, hour=0, minute=0) + timedelta(days=32)).replace(day=1)
+            elif not self._day_matches(dt):
+                dt = dt.replace(hour=0, minute=0) + timedelta(days=1)
+            elif dt.hour not in self.hours:
+                dt = dt.replace(minute=0) + timedelta(hours=1)
+            elif dt.minute not in self.minutes:
+                dt += timedelta(minutes=1)
+            else:
+                return dt.timestamp()
+        raise ValueError(f"Cron expression never matches: {self.expr!r}")
+
+
+class Job:
+    def __init__(self, name: str, fn: Callable[[], Any], seconds: Optional[float] = None,
+                 cron: Optional[str] = None, jitter: float = 0.0,
+                 lease_seconds: float = DEFAULT_LEASE_SECONDS, local_only: bool = False,
+                 run_at_start: bool = False):
+        if (seconds is None) == (cron is None):
+            raise ValueError("A job needs exactly one of seconds or cron")
+        if seconds is not None and seconds <= 0:
+            raise ValueError("Interval must be positive")
+        self.name = name
+        self.fn = fn
+        self.seconds = seconds
+        self.cron = CronSchedule(cron) if cron else None
+        self.jitter = max(0.0, float(jitter))
+        self.lease_seconds = float(lease_seconds)
+        self.local_only = local_only
+        self.next_run = 0.0 if run_at_start else self.following(time.time())
+        self.running = False
+        self.stats: Dict[str, Any] = {
+            "runs": 0, "failures": 0, "skipped": 0,
+            "total_ms": 0.0, "max_ms": 0.0, "last_ms": None,
+            "last_started_at": None, "last_status": None, "last_error": None,
+        }
+
+    def following(self, ts: float) -> float:
+        """Next scheduled time after ts, before jitter."""
+        if self.cron is not None:
+            return self.cron.next_after(ts)
+        return ts + self.seconds
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "schedule": self.cron.expr if self.cron else f"every {self.seconds:g}s",
+            "jitter_seconds": self.jitter,
+            "local_only": self.local_only,
+            "running": self.running,
+            "next_run_at": format_ts(self.next_run),
+            **{k: format_ts(v) if k == "last_started_at" else v for k, v in self.stats.items()},
+        }
+
+
+def format_ts(ts: Optional[float]) -> Optional[str]:
+    if not ts:
+        return None
+    return datetime.fromtimestamp(ts, timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Scheduler:
+    def __init__(self, owner: Optional[str] = None):
+        self.owner = owner or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------- registration ----------
+    def add_interval(self, name: str, fn: Callable[[], Any], seconds: float, **kwargs) -> Job:
+        return self._add(Job(name, fn, seconds=seconds, **kwargs))
+
+    def add_cron(self, name: str, fn: Callable[[], Any], expr: str, **kwargs) -> Job:
+        return self._add(Job(name, fn, cron=expr, **kwargs))
+
+    def _add(self, job: Job) -> Job:
+        with self._lock:
+            if job.name in self.jobs:
+                raise ValueError(f"Duplicate job: {job.name}")
+            job.next_run += random.uniform(0, job.jitter)
+            self.jobs[job.name] = job
+        self._wake.set()
+        return job
+
+    # ---------- lifecycle ----------
+    def start(self) -> None:
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            now = time.time()
+            with self._lock:
+                due = [j for j in self.jobs.values() if not j.running and j.next_run <= now]
+                upcoming = [j.next_run for j in self.jobs.values() if not j.running]
+            for job in due:
+                self._start_run(job, scheduled=True)
+            wait = min(upcoming, default=now + MAX_TICK_SECONDS) - time.time()
+            self._wake.wait(max(0.01, min(wait, MAX_TICK_SECONDS)))
+            self._wake.clear()
+
+    # ---------- running ----------
+    def trigger(self, name: str) -> Tuple[bool, str]:
+        """Run a job now (admin). Still single-flight; skips the schedule check."""
+        job = self.jobs.get(name)
+        if job is None:
+            return False, "Job not found"
+        return self._start_run(job, scheduled=False)
+
+    def _start_run(self, job: Job, scheduled: bool) -> Tuple[bool, str]:
+        with self._lock:
+            if job.running:
+                return False, "Job already running in this process"
+            job.running = True
+
+        if not job.local_only:
+            try:
+                ok, shared_next = fleet_db.acquire_job_lease(
+                    job.name, self.owner, job.lease_seconds, due_only=scheduled)
+            except Exception as exc:
+                ok, shared_next = False, None
+                job.stats["last_error"] = repr(exc)
+            if not ok:
+                with self._lock:
+                    job.running = False
+                    if scheduled:
+                        job.stats["skipped"] += 1
+                        # Another worker ran it (or holds it): follow the shared schedule
+                        base = shared_next if shared_next and shared_next > time.time() \
+                            else job.following(time.time())
+                        job.next_run = base + random.uniform(0, job.jitter)
+                return False, "Job is running or not due on another worker"
+
+        threading.Thread(target=self._run, args=(job,), name=f"job-{job.name}",
+                         daemon=True).start()
+        return True, "started"
+
+    def _run(self, job: Job) -> None:
+        started = time.time()
+        status, error = "ok", None
+        try:
+            job.fn()
+        except Exception as exc:
+            status, error = "error", repr(exc)
+            print(f"scheduled job {job.name} failed:", error)
+        finished = time.time()
+        elapsed_ms = (finished - started) * 1000
+        base = job.following(finished)
+
+        if not job.local_only:
+            try:
+                fleet_db.release_job_lease(job.name, self.owner, base, status)
+            except Exception as exc:
+                # Lease expires on its own after lease_seconds
+                error = error or repr(exc)
+
+        with self._lock:
+            st = job.stats
+            st["runs"] += 1
+            st["failures"] += status != "ok"
+            st["total_ms"] += elapsed_ms
+            st["max_ms"] = max(st["max_ms"], elapsed_ms)
+            st["last_ms"] = round(elapsed_ms, 2)
+            st["last_started_at"] = started
+            st["last_status"] = status
+            st["last_error"] = error
+            job.next_run = base + random.uniform(0, job.jitter)
+            job.running = False
+        self._wake.set()
+
+    def describe(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [job.describe() for job in self.jobs.values()]
@@ -0,0 +1,70 @@
+"""
+GET /v1/sync honours the caller's feature scopes: a key only receives the
+tables (changes and deletions) it could read through their own routes.
+
+    python sync_test.py        (or: python -m pytest sync_test.py)
+"""
+import os
+import tempfile
+import unittest
+
+os.environ.setdefault("SCHEDULER_ENABLED", "0")
+
+from fastapi.testclient import TestClient  # noqa: E402
+
+import api  # noqa: E402
+import fleet_db  # noqa: E402
+
+
+class SyncScopeTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._old_db = fleet_db.DB_FILE
+        fleet_db.DB_FILE = os.path.join(self._tmp.name, "sync.db")
+        self.client = TestClient(api.app)
+        self.client.__enter__()
+        asset_id = fleet_db.create_asset("Sync Check", "yacht", 0)
+        fleet_db.upsert_task(asset_id, "Oil", 10, 0, "Engine", "engine_hours")
+        fleet_db.log_trip(asset_id, 25)
+        fleet_db.generate_maintenance_alerts(asset_id)
+        fleet_db.log_service(asset_id, "Oil")
+        conn = fleet_db.get_conn()
+        conn.execute("DELETE FROM alerts")  # leaves alert tombstones in the change log
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        self.client.__exit__(None, None, None)
+        fleet_db.DB_FILE = self._old_db
+        self._tmp.cleanup()
+
+    def sync(self, key):
+        resp = self.client.get("/v1/sync", headers={"X-API-Key": key})
+        self.assertEqual(resp.status_code, 200, resp.text)
+        return resp.json()["data"]
+
+    def test_full_read_key_gets_every_table(self):
+        data = self.sync(fleet_db.create_api_key("reader", scope="read"))
+        self.assertEqual(set(data["changes"]),
+                         {"assets", "maintenance_tasks", "trip_events", "service_events"})
+        self.assertEqual(set(data["deleted"]), {"alerts"})
+
+    def test_revoked_features_are_left_out(self):
+        key = fleet_db.create_api_key("trips only", scope="read")
+        key_id = int(fleet_db.get_api_key_record(key)["id"])
+        ok, reason = fleet_db.update_feature_scopes(
+            key_id, [], ["assets:read", "alerts:read", "maintenance:read", "documents:read"])
+        self.assertTrue(ok, reason)
+        self.assertEqual(self.client.get("/v1/alerts", headers={"X-API-Key": key}).status_code, 403)
+
+        data = self.sync(key)
+        self.assertEqual(set(data["changes"]), {"trip_events", "service_events"})
+        self.assertEqual(data["deleted"], {})
+
+        fleet_db.update_feature_scopes(key_id, [], ["trips:read"])
+        data = self.sync(key)
+        self.assertEqual((data["changes"], data["deleted"]), ({}, {}))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,214 @@
+# ---------------------------
+# webhooks.py
+# Delivers webhook_outbox rows (see fleet_db WEBHOOK OUTBOX) to their
+# endpoints. The API runs deliver_due() as a scheduled, single-flight job,
+# so requests that create alerts only ever pay for the outbox INSERT.
+#
+#   deliverer = WebhookDeliverer()
+#   deliverer.deliver_due()     # one round: due rows -> POST -> record results
+#   deliverer.close()
+#
+# Delivery is at-least-once: a crash between POST and recording the result
+# resends the row. Receivers dedupe on X-Fleet-Delivery. Failed attempts
+# back off exponentially (with jitter) and go to 'dead' after max_attempts
+# or on a non-retryable 4xx; dead rows can be requeued from the admin API.
+# ---------------------------
+import hashlib
+import hmac
+import http.client
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Tuple
+from urllib.parse import urlsplit
+
+import fleet_db
+
+DEFAULT_TIMEOUT_SECONDS = 5.0
+DEFAULT_CONCURRENCY = 8        # POSTs in flight per round
+DEFAULT_PER_ENDPOINT = 2       # ... of which to any one endpoint
+DEFAULT_BATCH = 100            # rows per round
+DEFAULT_MAX_ATTEMPTS = 8
+BACKOFF_BASE_SECONDS = 5.0
+BACKOFF_MAX_SECONDS = 3600.0
+MAX_IDLE_PER_HOST = 4
+# Non-2xx statuses worth retrying; any other 4xx is dead-lettered at once
+RETRYABLE_STATUSES = {408, 425, 429}
+USER_AGENT = "fleet-ops-webhooks/1"
+
+
+def backoff_seconds(attempts: int) -> float:
+    """Delay before attempt `attempts + 1`: exponential, capped, equal jitter."""
+    delay = min(BACKOFF_MAX_SECONDS, BACKOFF_BASE_SECONDS * 2 ** max(0, attempts - 1))
+    return random.uniform(delay / 2, delay)
+
+
+def sign(secret: str, body: bytes) -> str:
+    return "sha256=" + hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+
+
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port), shared by threads."""
+
+    def __init__(self, timeout: float, max_idle_per_host: int = MAX_IDLE_PER_HOST):
+        self.timeout = timeout
+        self.max_idle = max_idle_per_host
+        self._idle: Dict[Tuple[str, str, int], List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+        self.opened = 0
+
+    def _new(self, key):
+        scheme, host, port = key
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        self.opened += 1
+        return cls(host, port, timeout=self.timeout)
+
+    def post(self, url: str, body: bytes, headers: Dict[str, str]) -> int:
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower()
+        key = (scheme, parts.hostname or "", parts.port or (443 if scheme == "https" else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+
+        with self._lock:
+            idle = self._idle.get(key)
+            conn, reused = (idle.pop(), True) if idle else (None, False)
+        if conn is None:
+            conn = self._new(key)
+        try:
+            try:
+                conn.request("POST", path, body=body, headers=headers)
+                resp = conn.getresponse()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                # The server closed an idle keep-alive connection; retry once fresh
+                conn.close()
+                conn = self._new(key)
+                conn.request("POST", path, body=body, headers=headers)
+                resp = conn.getresponse()
+            resp.read()
+        except Exception:
+            conn.close()
+            raise
+
+        if resp.will_close:
+            conn.close()
+        else:
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle:
+                    idle.append(conn)
+                    conn = None
+            if conn is not None:
+                conn.close()
+        return resp.status
+
+    def close(self) -> None:
+        with self._lock:
+            conns = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for c in conns:
+            c.close()
+
+
+class WebhookDeliverer:
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY,
+                 per_endpoint: int = DEFAULT_PER_ENDPOINT,
+                 timeout: float = DEFAULT_TIMEOUT_SECONDS,
+                 batch: int = DEFAULT_BATCH,
+                 max_attempts: int = DEFAULT_MAX_ATTEMPTS):
+        self.concurrency = max(1, int(concurrency))
+        self.per_endpoint = max(1, int(per_endpoint))
+        self.batch = max(1, int(batch))
+        self.max_attempts = max(1, int(max_attempts))
+        self.pool = ConnectionPool(timeout)
+        self._executor = ThreadPoolExecutor(self.concurrency, thread_name_prefix="webhook")
+        self._stats_lock = threading.Lock()
+        self.stats: Dict[str, Any] = {
+            "rounds": 0, "delivered": 0, "retried": 0, "dead": 0, "last_error": None,
+        }
+
+    def _attempt(self, row: Dict[str, Any], gate: threading.Semaphore) -> Dict[str, Any]:
+        body = row["payload"].encode("utf-8")
+        headers = {
+            "Content-Type": "application/json",
+            "User-Agent": USER_AGENT,
+            "X-Fleet-Event": row["event_type"],
+            "X-Fleet-Delivery": str(row["id"]),
+        }
+        if row["secret"]:
+            headers["X-Fleet-Signature"] = sign(row["secret"], body)
+
+        status_code, error = None, None
+        with gate:
+            try:
+                status_code = self.pool.post(row["url"], body, headers)
+            except Exception as exc:
+                error = repr(exc)
+
+        attempts = int(row["attempts"]) + 1
+        result = {"id": row["id"], "attempts": attempts, "status_code": status_code,
+                  "error": error, "next_attempt_at": time.time()}
+        if status_code is not None and 200 <= status_code < 300:
+            result["status"] = "delivered"
+            return result
+        if error is None:
+            result["error"] = f"HTTP {status_code}"
+        retryable = error is not None or status_code >= 500 or status_code in RETRYABLE_STATUSES
+        if retryable and attempts < self.max_attempts:
+            result["status"] = "pending"
+            result["next_attempt_at"] += backoff_seconds(attempts)
+        else:
+            result["status"] = "dead"
+        return result
+
+    def round_limit_seconds(self) -> float:
+        """
+        Upper bound on one deliver_due round: a full batch to one endpoint
+        goes through per_endpoint slots, each POST may take a timeout to
+        connect and one to answer, and a reused connection retries once.
+        """
+        slots = min(self.per_endpoint, self.concurrency)
+        return math.ceil(self.batch / slots) * 2 * (2 * self.pool.timeout)
+
+    def deliver_due(self) -> Dict[str, int]:
+        """One round over due rows; returns counts by outcome."""
+        rows = fleet_db.due_webhook_deliveries(self.batch)
+        gates: Dict[int, threading.Semaphore] = {}
+        futures = []
+        for row in rows:
+            gate = gates.setdefault(row["endpoint_id"], threading.Semaphore(self.per_endpoint))
+            futures.append(self._executor.submit(self._attempt, row, gate))
+        results = [f.result() for f in futures]
+        fleet_db.record_webhook_results(results)
+
+        counts = {"delivered": 0, "retried": 0, "dead": 0}
+        for r in results:
+            counts["retried" if r["status"] == "pending" else r["status"]] += 1
+        with self._stats_lock:
+            self.stats["rounds"] += 1
+            for k, v in counts.items():
+                self.stats[k] += v
+            errors = [r["error"] for r in results if r["status"] != "delivered"]
+            if errors:
+                self.stats["last_error"] = errors[-1]
+        return counts
+
+    def describe(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "concurrency": self.concurrency,
+                "per_endpoint": self.per_endpoint,
+                "batch": self.batch,
+                "max_attempts": self.max_attempts,
+                "connections_opened": self.pool.opened,
+                **self.stats,
+            }
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+        self.pool.close()
@@ -0,0 +1,200 @@
+"""
+Webhook outbox + delivery checks against a local stand-in receiver.
+
+    python webhooks_test.py        (or: python -m pytest webhooks_test.py)
+"""
+import hashlib
+import hmac
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import mock
+
+import fleet_db
+import webhooks
+
+
+class Receiver(ThreadingHTTPServer):
+    """Records every POST; `statuses` maps path -> HTTP status to answer with."""
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), ReceiverHandler)
+        self.lock = threading.Lock()
+        self.requests = []
+        self.statuses = {}
+        self.connections = 0
+        self.delay = 0.0
+        self.active = 0
+        self.max_active = 0
+
+    def url(self, path: str) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}{path}"
+
+
+class ReceiverHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        srv = self.server
+        with srv.lock:
+            srv.active += 1
+            srv.max_active = max(srv.max_active, srv.active)
+        time.sleep(srv.delay)
+        with srv.lock:
+            srv.active -= 1
+            srv.requests.append((self.path, dict(self.headers), body))
+        self.send_response(srv.statuses.get(self.path, 200))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+class WebhookTest(unittest.TestCase):
+    def setUp(self):
+        self._tmp = tempfile.TemporaryDirectory()
+        self._old_db = fleet_db.DB_FILE
+        fleet_db.DB_FILE = os.path.join(self._tmp.name, "hooks.db")
+        fleet_db.init_db()
+        self.receiver = Receiver()
+        threading.Thread(target=self.receiver.serve_forever, daemon=True).start()
+        self.deliverer = webhooks.WebhookDeliverer(concurrency=4, per_endpoint=2, timeout=2,
+                                                   max_attempts=3)
+
+    def tearDown(self):
+        self.deliverer.close()
+        self.receiver.shutdown()
+        self.receiver.server_close()
+        fleet_db.DB_FILE = self._old_db
+        self._tmp.cleanup()
+
+    def overdue_asset(self, name="Hook Check") -> int:
+        asset_id = fleet_db.create_asset(name, "yacht", 0)
+        fleet_db.seed_maintenance_from_template(asset_id, "yacht")
+        fleet_db.log_trip(asset_id, 5000)
+        return asset_id
+
+    def outbox(self, status=None):
+        return fleet_db.list_webhook_outbox(status=status, limit=200)["items"]
+
+    def test_alerts_enqueue_only_for_active_endpoints(self):
+        self.overdue_asset("No Endpoints")
+        fleet_db.generate_fleet_alerts()
+        self.assertEqual(self.outbox(), [])
+
+        active = fleet_db.create_webhook_endpoint(self.receiver.url("/a"))
+        inactive = fleet_db.create_webhook_endpoint(self.receiver.url("/b"))
+        fleet_db.set_webhook_endpoint_active(inactive, False)
+        asset_id = self.overdue_asset()
+        fleet_db.generate_maintenance_alerts(asset_id)
+
+        alerts = fleet_db.list_alerts(asset_id)
+        rows = self.outbox()
+        self.assertEqual(len(rows), len(alerts))
+        self.assertEqual({r["endpoint_id"] for r in rows}, {active})
+        payload = json.loads(rows[0]["payload"])
+        self.assertEqual(payload["type"], "alert_created")
+        self.assertEqual(payload["data"]["asset_id"], asset_id)
+
+    def test_delivers_signed_over_reused_connections(self):
+        fleet_db.create_webhook_endpoint(self.receiver.url("/hook"), secret="s3cret")
+        fleet_db.generate_maintenance_alerts(self.overdue_asset())
+        queued = len(self.outbox("pending"))
+        self.assertGreater(queued, 2)
+
+        counts = self.deliverer.deliver_due()
+        self.assertEqual(counts, {"delivered": queued, "retried": 0, "dead": 0})
+        self.assertEqual(len(self.outbox("delivered")), queued)
+        self.assertEqual(len(self.receiver.requests), queued)
+        self.assertLessEqual(self.receiver.connections, self.deliverer.per_endpoint)
+        self.assertLessEqual(self.receiver.max_active, self.deliverer.per_endpoint)
+
+        path, headers, body = self.receiver.requests[0]
+        expected = hmac.new(b"s3cret", body, hashlib.sha256).hexdigest()
+        self.assertEqual(headers["X-Fleet-Signature"], "sha256=" + expected)
+        self.assertEqual(headers["X-Fleet-Event"], "alert_created")
+        # Nothing left to send
+        self.assertEqual(self.deliverer.deliver_due()["delivered"], 0)
+
+    def test_server_errors_back_off_then_dead_letter(self):
+        self.receiver.statuses["/down"] = 503
+        fleet_db.create_webhook_endpoint(self.receiver.url("/down"))
+        asset_id = fleet_db.create_asset("Retry Check", "yacht", 0)
+        fleet_db.upsert_task(asset_id, "Oil", 10, 0, "Engine", "engine_hours")
+        fleet_db.log_trip(asset_id, 50)
+        fleet_db.generate_maintenance_alerts(asset_id)
+
+        self.assertEqual(self.deliverer.deliver_due()["retried"], 1)
+        row = self.outbox()[0]
+        self.assertEqual((row["status"], row["attempts"], row["last_status_code"]), ("pending", 1, 503))
+        self.assertGreater(row["next_attempt_at"], time.time())
+        # Backing off: not due yet
+        self.assertEqual(self.deliverer.deliver_due()["retried"], 0)
+
+        with mock.patch.object(webhooks, "backoff_seconds", return_value=0.0):
+            fleet_db.record_webhook_results([{
+                "id": row["id"], "status": "pending", "attempts": 1, "next_attempt_at": 0,
+                "status_code": 503, "error": "HTTP 503"}])
+            self.assertEqual(self.deliverer.deliver_due()["retried"], 1)
+            self.assertEqual(self.deliverer.deliver_due()["dead"], 1)
+        self.assertEqual(self.outbox()[0]["status"], "dead")
+
+        # Requeued dead letters get a fresh budget and go out once the receiver recovers
+        self.receiver.statuses.clear()
+        self.assertTrue(fleet_db.retry_webhook_delivery(row["id"]))
+        self.assertFalse(fleet_db.retry_webhook_delivery(row["id"]))
+        self.assertEqual(self.deliverer.deliver_due()["delivered"], 1)
+
+    def test_client_errors_dead_letter_at_once(self):
+        self.receiver.statuses["/gone"] = 410
+        fleet_db.create_webhook_endpoint(self.receiver.url("/gone"))
+        fleet_db.generate_maintenance_alerts(self.overdue_asset())
+        counts = self.deliverer.deliver_due()
+        self.assertEqual(counts["delivered"] + counts["retried"], 0)
+        self.assertTrue(all(r["last_error"] == "HTTP 410" for r in self.outbox("dead")))
+
+    def test_unreachable_endpoint_is_retried(self):
+        fleet_db.create_webhook_endpoint("http://127.0.0.1:9/nothing-listens")
+        fleet_db.generate_maintenance_alerts(self.overdue_asset())
+        counts = self.deliverer.deliver_due()
+        self.assertGreater(counts["retried"], 0)
+        self.assertEqual(counts["delivered"] + counts["dead"], 0)
+
+    def test_deactivating_endpoint_dead_letters_its_pending_rows(self):
+        endpoint = fleet_db.create_webhook_endpoint(self.receiver.url("/off"))
+        fleet_db.generate_maintenance_alerts(self.overdue_asset())
+        queued = self.outbox("pending")
+        self.assertTrue(queued)
+
+        fleet_db.set_webhook_endpoint_active(endpoint, False)
+        self.assertEqual(fleet_db.webhook_outbox_counts()["pending"], 0)
+        self.assertTrue(all(r["last_error"] == "endpoint deactivated" for r in self.outbox("dead")))
+        # Not requeued while the endpoint is off
+        self.assertFalse(fleet_db.retry_webhook_delivery(queued[0]["id"]))
+        fleet_db.set_webhook_endpoint_active(endpoint, True)
+        self.assertTrue(fleet_db.retry_webhook_delivery(queued[0]["id"]))
+        self.assertEqual(self.deliverer.deliver_due()["delivered"], 1)
+
+    def test_round_limit_covers_a_full_batch_to_one_endpoint(self):
+        deliverer = webhooks.WebhookDeliverer(per_endpoint=2, timeout=5, batch=100)
+        try:
+            # 50 POSTs per slot, each up to connect + response timeouts, doubled by the retry
+            self.assertEqual(deliverer.round_limit_seconds(), 50 * 2 * 10)
+        finally:
+            deliverer.close()
+
+
+if __name__ == "__main__":
+    unittest.main()